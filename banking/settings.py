@@ -68,6 +68,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.common.CommonMiddleware',  
+    'bankingapp.middleware.QueryMetricsMiddleware',
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 ROOT_URLCONF = 'banking.urls'
@@ -101,6 +102,66 @@ DATABASES = {
     )
 }
 
+# Optional read replicas (comma-separated URLs), used by the account list and
+# history endpoints; see bankingapp/routers.py. Users are pinned to the primary
+# for REPLICA_PIN_SECONDS after moving money.
+DATABASE_REPLICA_URLS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+for number, url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    DATABASES[f'replica{number}'] = dj_database_url.parse(url.strip(), conn_max_age=600, conn_health_checks=True)
+    DATABASES[f'replica{number}']['TEST'] = {'MIRROR': 'default'}
+if DATABASE_REPLICA_URLS:
+    DATABASE_ROUTERS = ['bankingapp.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = float(os.environ.get('REPLICA_PIN_SECONDS', 10))
+
+# Shared cache (redis://host:port/db), required with read replicas so a pin
+# set by one worker is seen by all of them. Without it each process has its
+# own in-memory cache.
+CACHE_URL = os.environ.get('CACHE_URL', '')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+
+# Connection pooling for PostgreSQL (DATABASE_POOL):
+#   internal  - a per-process pool (bankingapp/db_pool.py); connections are
+#               borrowed per request instead of held by every idle thread.
+#   pgbouncer - DATABASE_URL points at PgBouncer with pool_mode = transaction.
+#               Atomic blocks (and the select_for_update locks in the money
+#               views) run on one server connection, which is all transaction
+#               pooling guarantees; server-side cursors span transactions, so
+#               they are disabled. Set the role's timezone to UTC so Django
+#               never issues a session-level SET TIME ZONE.
+DATABASE_POOL = os.environ.get('DATABASE_POOL', '')
+for database in DATABASES.values():
+    if database.get('ENGINE') != 'django.db.backends.postgresql':
+        continue
+    if DATABASE_POOL == 'internal':
+        database['ENGINE'] = 'bankingapp.pooled_postgresql'
+        database['CONN_MAX_AGE'] = 0
+        database['POOL'] = {
+            'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.environ.get('DATABASE_POOL_TIMEOUT', 5)),
+            'max_idle': float(os.environ.get('DATABASE_POOL_MAX_IDLE', 300)),
+        }
+    elif DATABASE_POOL == 'pgbouncer':
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# TRANSACTION_PARTITIONING=monthly partitions the Transaction table by month
+# on PostgreSQL (migration 0016 or `transaction_partitions --convert`); run
+# `transaction_partitions` monthly to create partitions ahead of time. See
+# bankingapp/partitions.py.
+TRANSACTION_PARTITIONING = os.environ.get('TRANSACTION_PARTITIONING', '')
+
+# Cold-tier archive of closed months written by archive_transactions; see
+# bankingapp/archive.py. Every web worker needs the files. The list of
+# archived months is cached per process for TRANSACTION_ARCHIVE_TTL seconds.
+TRANSACTION_ARCHIVE_DIR = os.environ.get('TRANSACTION_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
+TRANSACTION_ARCHIVE_TTL = float(os.environ.get('TRANSACTION_ARCHIVE_TTL', 60))
+
 
 # Password validation
 
@@ -150,6 +211,30 @@ REST_FRAMEWORK = {
     ],
 }
 
+# JWT_AUTH_MODE=stateless authenticates from token claims alone (no User or
+# blacklist query per request); see bankingapp/authentication.py.
+JWT_AUTH_MODE = os.environ.get('JWT_AUTH_MODE', 'database')
+JWT_REVOCATION_REFRESH_SECONDS = float(os.environ.get('JWT_REVOCATION_REFRESH_SECONDS', 5))
+JWT_REVOCATION_RESCAN_ROWS = int(os.environ.get('JWT_REVOCATION_RESCAN_ROWS', 1000))
+if JWT_AUTH_MODE == 'stateless':
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] = [
+        'bankingapp.authentication.StatelessJWTAuthentication',
+    ]
+
+# JSON_BACKEND=orjson renders and parses JSON with orjson (Decimals become
+# exact strings); see bankingapp/renderers.py.
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'stdlib')
+if JSON_BACKEND == 'orjson':
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'bankingapp.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'bankingapp.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -158,4 +243,27 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_BLACKLIST': 'rest_framework_simplejwt.token_blacklist.models.BlacklistedToken',
+    'TOKEN_OBTAIN_SERIALIZER': 'bankingapp.serializers.StaffClaimTokenObtainPairSerializer',
 }
+
+# Per-route SQL metrics served at /api/metrics/; see bankingapp/metrics.py
+QUERY_METRICS_SAMPLE_RATE = float(os.environ.get('QUERY_METRICS_SAMPLE_RATE', 1.0 if DEBUG else 0.1))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Ledger / money movement
+
+LEDGER_MAX_RETRIES = int(os.environ.get('LEDGER_MAX_RETRIES', 3))
+
+# Idempotency-Key replays for money-moving endpoints; see bankingapp/idempotency.py
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 5))
+# An unfinished request's claim on its key is abandoned after this long; keep
+# it above the longest a request can run (e.g. the gunicorn worker timeout).
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 120))
+
+# Account numbers reserved per process at a time; see bankingapp/account_numbers.py
+ACCOUNT_NUMBER_BLOCK_SIZE = int(os.environ.get('ACCOUNT_NUMBER_BLOCK_SIZE', 100))
+
+# Account number -> (id, owner, type) lookups cached per process; see bankingapp/account_cache.py
+ACCOUNT_CACHE_SIZE = int(os.environ.get('ACCOUNT_CACHE_SIZE', 10000))
+ACCOUNT_CACHE_TTL = float(os.environ.get('ACCOUNT_CACHE_TTL', 60))
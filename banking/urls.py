@@ -1,8 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from bankingapp import async_views
 from bankingapp.viewsets import CustomerViewSet, BankAccountViewSet, TransactionViewSet
-from bankingapp.views import SignUpView, SignOutView, SignInView,TransferView, UserBankAccountsView, SendMoneyView, UpdateBalanceView, WithdrawMoneyView, DepositMoneyView, CreateBankAccountView, UpdateBalanceView, DeleteBankAccountView
+from bankingapp.views import SignUpView, SignOutView, SignInView,TransferView, UserBankAccountsView, SendMoneyView, BatchTransferView, UpdateBalanceView, WithdrawMoneyView, DepositMoneyView, CreateBankAccountView, ExportTransactionsView, AccountSummaryView, TransactionSearchView, MetricsView, UpdateBalanceView, DeleteBankAccountView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.http import HttpResponse
 
@@ -25,13 +26,21 @@ urlpatterns = [
     path("api/signin/", SignInView.as_view(), name="signin"),  # Sign-in endpoint
     path("api/user-accounts/", UserBankAccountsView.as_view(), name="user-accounts"),  # User accounts
     path("api/send-money/", SendMoneyView.as_view(), name="send-money"),  # Send money
+    path("api/batch-transfer/", BatchTransferView.as_view(), name="batch-transfer"),  # Many transfers in one transaction
     path("api/withdraw-money/", WithdrawMoneyView.as_view(), name="withdraw-money"),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),  # JWT access and refresh token
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/deposit-money/", DepositMoneyView.as_view(), name="deposit-money"),
     path("api/create-bank-account/", CreateBankAccountView.as_view(), name="create-bank-account"),
     path('api/delete-bank-account/<str:account_id>/', DeleteBankAccountView.as_view(), name='delete-bank-account'),
+    path("api/search-transactions/", TransactionSearchView.as_view(), name="search-transactions"),  # Full-text search of descriptions
+    path('api/user-accounts/<str:accountNumber>/summary/', AccountSummaryView.as_view(), name='account-summary'),
+    path('api/user-accounts/<str:accountNumber>/export/', ExportTransactionsView.as_view(), name='account-transactions-export'),
     path('api/user-accounts/<str:accountNumber>/', TransactionViewSet.as_view({'get': 'list'}), name='account-transactions'),
     path('api/update-balance/<str:account_id>/', UpdateBalanceView.as_view(), name='update-balance'),
     path("api/signout/", SignOutView.as_view(), name="signout"),
+    path("api/metrics/", MetricsView.as_view(), name="metrics"),  # Prometheus scrape endpoint
+    # Async (ASGI) read endpoints; same responses as their sync counterparts
+    path("api/async/user-accounts/", async_views.user_bank_accounts, name="async-user-accounts"),
+    path("api/async/user-accounts/<str:accountNumber>/", async_views.account_transactions, name="async-account-transactions"),
 ]
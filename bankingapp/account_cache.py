@@ -0,0 +1,84 @@
+"""
+Process-wide cache of the immutable parts of a BankAccount.
+
+Money views resolve account numbers on every request, and a handful of
+merchant accounts are resolved thousands of times a minute. Only the id,
+owner and account type are cached; balances and balance slot counts change
+at runtime and are always read from the row by the ledger. Saves and deletes invalidate entries in this
+process through signals (see ``bankingapp.signals``); other processes converge
+within the TTL, and a stale id for a deleted account is caught when the
+ledger fails to lock it.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .models import BankAccount
+
+
+class AccountRef(NamedTuple):
+    id: int
+    user_id: int
+    account_type: str
+
+
+class AccountCache:
+    """A bounded LRU keyed by account number whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, max_size=10000, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, account_number):
+        """Return the AccountRef for ``account_number``; raises BankAccount.DoesNotExist."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(account_number)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(account_number)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        ref = AccountRef(*BankAccount.objects.filter(account_number=account_number)
+                         .values_list("pk", "user_id", "account_type").get())
+        with self._lock:
+            self._entries[account_number] = (ref, now + self.ttl)
+            self._entries.move_to_end(account_number)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return ref
+
+    def invalidate(self, account_number):
+        with self._lock:
+            self._entries.pop(account_number, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+account_cache = AccountCache(
+    max_size=getattr(settings, "ACCOUNT_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "ACCOUNT_CACHE_TTL", 60.0),
+)
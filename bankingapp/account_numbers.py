@@ -0,0 +1,135 @@
+"""
+Account number allocation.
+
+Each process reserves a block of ``ACCOUNT_NUMBER_BLOCK_SIZE`` numbers by
+advancing the AccountNumberCounter row once (hi/lo), then hands them out from
+memory, so signups do not query the accounts table at all. Numbers are nine
+digits of sequence followed by a Luhn check digit. Blocks are not shared
+between processes, so numbers are unique but not gap-free or strictly ordered.
+
+A block is reserved on a connection of its own and committed at once, so the
+counter row is locked only for that short transaction and a caller's rollback
+(a failed signup) cannot undo the reservation while the block stays in
+memory. SQLite allows one writer at a time, so a second connection would
+wait on the caller's own transaction; there, numbers taken inside a
+transaction advance the counter one at a time in that transaction instead
+and are returned with it on rollback.
+"""
+
+import os
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+
+from .models import AccountNumberCounter, BankAccount
+
+COUNTER_NAME = "account_number"
+# Start well above the legacy "<user id:06d><count:04d>" numbers.
+FIRST_VALUE = 100_000_000
+SEQUENCE_DIGITS = 9
+
+
+def luhn_check_digit(digits):
+    total = 0
+    for position, char in enumerate(reversed(digits)):
+        digit = int(char)
+        if position % 2 == 0:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return str((10 - total % 10) % 10)
+
+
+def is_valid(account_number):
+    """True if ``account_number`` is an allocator-issued number with a correct check digit."""
+    return (
+        len(account_number) == SEQUENCE_DIGITS + 1
+        and account_number.isdigit()
+        and luhn_check_digit(account_number[:-1]) == account_number[-1]
+    )
+
+
+class AccountNumberAllocator:
+    def __init__(self, block_size=100):
+        self.block_size = block_size
+        self._next = self._end = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def reserve_block(self):
+        """Advance the shared counter by one block, committed on its own, and return its ``(start, end)``."""
+        db = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            db.set_autocommit(False)
+            start = _advance(db, self.block_size)
+            db.commit()
+        finally:
+            db.close()
+        return start, start + self.block_size
+
+    def next(self):
+        caller = transaction.get_connection()
+        if caller.in_atomic_block and caller.vendor == "sqlite":
+            with transaction.atomic():
+                counter, _ = AccountNumberCounter.objects.select_for_update().get_or_create(
+                    name=COUNTER_NAME, defaults={"next_value": FIRST_VALUE}
+                )
+                value = counter.next_value
+                counter.next_value = value + 1
+                counter.save(update_fields=["next_value"])
+            return format_number(value)
+        with self._lock:
+            # A block reserved before a fork (gunicorn --preload) must not be
+            # handed out by every child.
+            if self._pid != os.getpid() or self._next >= self._end:
+                self._next, self._end = self.reserve_block()
+                self._pid = os.getpid()
+            value = self._next
+            self._next += 1
+        return format_number(value)
+
+
+def _advance(db, size):
+    """Advance the counter row by ``size`` in ``db``'s open transaction and return its old value."""
+    table = db.ops.quote_name(AccountNumberCounter._meta.db_table)
+    with db.cursor() as cursor:
+        while True:
+            # The UPDATE takes the row lock, so the SELECT reads our own value.
+            cursor.execute(f"UPDATE {table} SET next_value = next_value + %s WHERE name = %s", [size, COUNTER_NAME])
+            if cursor.rowcount:
+                cursor.execute(f"SELECT next_value FROM {table} WHERE name = %s", [COUNTER_NAME])
+                return cursor.fetchone()[0] - size
+            try:
+                cursor.execute(
+                    f"INSERT INTO {table} (name, next_value) VALUES (%s, %s)", [COUNTER_NAME, FIRST_VALUE + size]
+                )
+                return FIRST_VALUE
+            except IntegrityError:
+                # Another process created the row first; update it instead.
+                db.rollback()
+
+
+def format_number(value):
+    digits = f"{value:0{SEQUENCE_DIGITS}d}"
+    return digits + luhn_check_digit(digits)
+
+
+allocator = AccountNumberAllocator(block_size=getattr(settings, "ACCOUNT_NUMBER_BLOCK_SIZE", 100))
+
+
+def open_account(**fields):
+    """
+    Create a BankAccount with a freshly allocated number. A number that is
+    already taken (only possible against legacy numbers) is skipped.
+    """
+    for _ in range(5):
+        account_number = allocator.next()
+        try:
+            with transaction.atomic():
+                return BankAccount.objects.create(account_number=account_number, **fields)
+        except IntegrityError:
+            if not BankAccount.objects.filter(account_number=account_number).exists():
+                raise
+    raise IntegrityError("Could not allocate a free account number.")
@@ -1,6 +1,26 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
 
 
 class BankappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bankingapp'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .routers import check_pin_cache, replica_aliases
+
+        if replica_aliases():
+            check_pin_cache()
+        post_migrate.connect(install_search_triggers, sender=self)
+
+
+def install_search_triggers(using, plan=None, **kwargs):
+    # Migrations that rebuild the Transaction table on SQLite drop its FTS
+    # triggers; put them back (and reindex) after every migrate.
+    from . import search
+
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and search.FTS_TABLE in connection.introspection.table_names():
+        search.install_sqlite(connection)
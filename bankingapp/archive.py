@@ -0,0 +1,410 @@
+"""
+Cold-tier archive of closed months of the Transaction ledger.
+
+``archive_transactions`` moves whole calendar months, oldest first, out of the
+Transaction table into two files per month under ``TRANSACTION_ARCHIVE_DIR``:
+
+``transactions-YYYY-MM.dat``
+    One zlib-compressed block per account holding every leg of that account
+    in the month (as in statements: a transfer is a -1 leg for the sender and
+    a +1 leg for the receiver), sorted by ``(created_at, id)``. Inside a block
+    each column is stored contiguously: ids, timestamps and amounts (in
+    cents) as int64 arrays, signs and type codes as bytes, and the account
+    numbers and descriptions as length-prefixed strings. Rows with neither a
+    sender nor a receiver are kept under account 0.
+
+``transactions-YYYY-MM.idx``
+    Fixed-size ``(account id, offset, length, legs, net cents)`` records
+    sorted by account id, binary searched in place.
+
+Both files are memory-mapped, so reading one account's month touches only its
+own block. ArchivedMonth rows record which months are archived; since they
+form a contiguous prefix of history, readers split every query at
+``archived_through()``: rows before it come from the files, rows from it on
+from the database. Archived months keep counting towards opening balances
+through the net totals in the index.
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, IntegerField, Value
+
+from . import partitions
+from .models import ArchivedMonth, Transaction
+from .partitions import add_months
+
+MAGIC = b"BTXARC01"
+INDEX_RECORD = struct.Struct("<qqqqq")
+# Leg count, then the byte length of each of the 11 column segments.
+BLOCK_HEADER = struct.Struct("<12I")
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+COMPRESSION_LEVEL = 6
+TYPES = [code for code, _ in Transaction.TRANSACTION_TYPES]
+TYPE_CODES = {code: number for number, code in enumerate(TYPES)}
+# The columns of an archived leg, as decode_block() returns them.
+LEG_FIELDS = ("id", "created_at", "transaction_type", "amount", "sign", "sender", "receiver", "description")
+ORPHANS = 0
+
+
+def _int_array(typecode, values):
+    values = array(typecode, values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_int_array(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _encode_strings(values):
+    encoded = [None if value is None else value.encode() for value in values]
+    lengths = _int_array("i", (-1 if value is None else len(value) for value in encoded))
+    return [lengths, b"".join(value for value in encoded if value)]
+
+
+def _decode_strings(lengths, blob):
+    values, position = [], 0
+    for length in _read_int_array("i", lengths):
+        if length < 0:
+            values.append(None)
+        else:
+            values.append(blob[position:position + length].decode())
+            position += length
+    return values
+
+
+def encode_block(legs):
+    """Compress a list of ``LEG_FIELDS`` tuples into one columnar block."""
+    ids, created, types, amounts, signs, senders, receivers, descriptions = zip(*legs)
+    segments = [
+        _int_array("q", ids),
+        _int_array("q", ((moment - EPOCH) // timedelta(microseconds=1) for moment in created)),
+        bytes(TYPE_CODES[code] for code in types),
+        _int_array("q", (int(amount.scaleb(2)) for amount in amounts)),
+        bytes(sign & 0xFF for sign in signs),
+        *_encode_strings(senders),
+        *_encode_strings(receivers),
+        *_encode_strings(descriptions),
+    ]
+    header = BLOCK_HEADER.pack(len(legs), *map(len, segments))
+    return zlib.compress(header + b"".join(segments), COMPRESSION_LEVEL)
+
+
+def decode_block(data):
+    """The ``LEG_FIELDS`` tuples of one block, oldest first."""
+    raw = zlib.decompress(data)
+    _, *lengths = BLOCK_HEADER.unpack_from(raw)
+    segments, position = [], BLOCK_HEADER.size
+    for length in lengths:
+        segments.append(raw[position:position + length])
+        position += length
+    ids = _read_int_array("q", segments[0])
+    created = [EPOCH + timedelta(microseconds=micros) for micros in _read_int_array("q", segments[1])]
+    types = [TYPES[code] for code in segments[2]]
+    amounts = [Decimal(cents).scaleb(-2) for cents in _read_int_array("q", segments[3])]
+    signs = [sign - 256 if sign > 127 else sign for sign in segments[4]]
+    senders = _decode_strings(segments[5], segments[6])
+    receivers = _decode_strings(segments[7], segments[8])
+    descriptions = _decode_strings(segments[9], segments[10])
+    return list(zip(ids, created, types, amounts, signs, senders, receivers, descriptions))
+
+
+def is_duplicate(leg):
+    """The received leg of a transfer an account made to itself (history shows the sent one)."""
+    return leg[4] > 0 and leg[5] is not None and leg[5] == leg[6]
+
+
+def paths(month, directory=None):
+    base = os.path.join(directory or settings.TRANSACTION_ARCHIVE_DIR, f"transactions-{month:%Y-%m}")
+    return f"{base}.dat", f"{base}.idx"
+
+
+class _Keys:
+    """The account ids of an index, as a sequence ``bisect`` can search."""
+
+    def __init__(self, index, count):
+        self.index = index
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, position):
+        return struct.unpack_from("<q", self.index, len(MAGIC) + position * INDEX_RECORD.size)[0]
+
+
+class MonthArchive:
+    """Read access to one archived month."""
+
+    def __init__(self, month, directory=None):
+        self.month = month
+        data_path, index_path = paths(month, directory)
+        self._data = self._map(data_path)
+        self._index = self._map(index_path)
+        self.count = (len(self._index) - len(MAGIC)) // INDEX_RECORD.size
+        self._keys = _Keys(self._index, self.count)
+
+    @staticmethod
+    def _map(path):
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a transaction archive file.")
+        return mapped
+
+    def record(self, position):
+        """``(account id, offset, length, legs, net cents)`` of the index entry at ``position``."""
+        return INDEX_RECORD.unpack_from(self._index, len(MAGIC) + position * INDEX_RECORD.size)
+
+    def records(self, lo, hi):
+        """Index entries for account ids in ``[lo, hi)``."""
+        position = bisect.bisect_left(self._keys, lo)
+        while position < self.count:
+            entry = self.record(position)
+            if entry[0] >= hi:
+                break
+            yield entry
+            position += 1
+
+    def block(self, entry):
+        _, offset, length, _, _ = entry
+        return decode_block(self._data[offset:offset + length])
+
+    def legs(self, account_id):
+        """The account's legs for the month, oldest first."""
+        for entry in self.records(account_id, account_id + 1):
+            return self.block(entry)
+        return []
+
+
+class ArchiveWriter:
+    """
+    Write one month's files from legs fed in account order. Files are written
+    under temporary names and renamed by ``close()``.
+    """
+
+    def __init__(self, month, directory=None):
+        os.makedirs(directory or settings.TRANSACTION_ARCHIVE_DIR, exist_ok=True)
+        self.paths = paths(month, directory)
+        self._data = open(f"{self.paths[0]}.tmp", "wb")
+        self._index = open(f"{self.paths[1]}.tmp", "wb")
+        self._data.write(MAGIC)
+        self._index.write(MAGIC)
+        self._account = None
+        self._legs = []
+        self.legs = 0
+
+    def add(self, account_id, leg):
+        if account_id != self._account:
+            self._flush()
+            self._account = account_id
+        self._legs.append(leg)
+
+    def _flush(self):
+        if not self._legs:
+            return
+        block = encode_block(self._legs)
+        net = sum(leg[4] * int(leg[3].scaleb(2)) for leg in self._legs)
+        self._index.write(INDEX_RECORD.pack(self._account, self._data.tell(), len(block), len(self._legs), net))
+        self._data.write(block)
+        self.legs += len(self._legs)
+        self._legs = []
+
+    def close(self):
+        self._flush()
+        for f, path in ((self._data, self.paths[0]), (self._index, self.paths[1])):
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+            os.replace(f"{path}.tmp", path)
+        return self.legs
+
+
+def month_legs(start, end, chunk_size=2000):
+    """
+    Stream ``(account, *LEG_FIELDS)`` for every leg in ``[start, end)`` from
+    the database, grouped by account and oldest first.
+    """
+    period = Transaction.objects.filter(created_at__gte=start, created_at__lt=end)
+    fields = ("account", "id", "created_at", "transaction_type", "amount", "sign",
+              "sender__account_number", "receiver__account_number", "description")
+    sent = period.exclude(sender_id=None).annotate(account=F("sender_id"), sign=Value(-1, IntegerField()))
+    received = period.exclude(receiver_id=None).annotate(account=F("receiver_id"), sign=Value(1, IntegerField()))
+    orphans = period.filter(sender_id=None, receiver_id=None).annotate(
+        account=Value(ORPHANS, IntegerField()), sign=Value(0, IntegerField()),
+    )
+    rows = sent.values_list(*fields).order_by().union(
+        received.values_list(*fields).order_by(), orphans.values_list(*fields).order_by(), all=True
+    ).order_by("account", "created_at", "id")
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def expected_legs(start, end):
+    period = Transaction.objects.filter(created_at__gte=start, created_at__lt=end)
+    return (
+        period.exclude(sender_id=None).count()
+        + period.exclude(receiver_id=None).count()
+        + period.filter(sender_id=None, receiver_id=None).count()
+    )
+
+
+def write_month(start, directory=None):
+    """Archive the month starting at ``start``; returns ``(legs written, account ids)``."""
+    writer = ArchiveWriter(start, directory)
+    accounts = set()
+    for account_id, *leg in month_legs(start, add_months(start, 1)):
+        accounts.add(account_id)
+        writer.add(account_id, tuple(leg))
+    accounts.discard(ORPHANS)
+    return writer.close(), accounts
+
+
+def delete_month(start, batch_size=5000):
+    """Delete the month's rows from the Transaction table once it is archived; returns rows deleted."""
+    end = add_months(start, 1)
+    if partitions.is_partitioned(connection):
+        names = {name for name, _ in partitions.partitions(connection)}
+        if partitions.partition_name(start) in names:
+            # Earlier months are archived (and dropped) already.
+            partitions.drop_partitions(connection, end)
+            return 0
+    deleted = 0
+    rows = Transaction.objects.filter(created_at__gte=start, created_at__lt=end)
+    while True:
+        ids = list(rows.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Transaction.objects.filter(pk__in=ids).delete()[0]
+
+
+def _as_datetime(day):
+    return datetime(day.year, day.month, 1, tzinfo=timezone.utc)
+
+
+class Manifest:
+    """The archived months, re-read from ArchivedMonth at most every ``ttl`` seconds."""
+
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self._months = ()
+        self._expires = 0.0
+        self._archives = {}
+        self._lock = threading.Lock()
+
+    def months(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._expires:
+                return self._months
+        months = tuple(_as_datetime(day) for day in ArchivedMonth.objects.values_list("month", flat=True))
+        with self._lock:
+            self._months = months
+            self._expires = now + self.ttl
+        return months
+
+    def through(self):
+        """End of the last archived month, or ``None`` if nothing is archived."""
+        months = self.months()
+        return add_months(months[-1], 1) if months else None
+
+    def open(self, month):
+        with self._lock:
+            archive = self._archives.get(month)
+            if archive is None:
+                archive = self._archives[month] = MonthArchive(month)
+            return archive
+
+    def clear(self):
+        with self._lock:
+            self._months = ()
+            self._expires = 0.0
+            self._archives = {}
+
+
+manifest = Manifest(ttl=getattr(settings, "TRANSACTION_ARCHIVE_TTL", 60.0))
+
+
+def archived_through():
+    return manifest.through()
+
+
+def live(queryset, through):
+    """Restrict ``queryset`` to rows that have not been archived."""
+    return queryset if through is None else queryset.filter(created_at__gte=through)
+
+
+def history_rows(account_id, limit, cursor=None, filters=None):
+    """
+    Up to ``limit`` of the account's archived rows as ``history.ROW_FIELDS``
+    tuples, newest first, strictly older than the ``(created_at, id)`` cursor
+    and matching ``filters`` (a ``history.HistoryFilter``).
+    """
+    rows = []
+    for month in reversed(manifest.months()):
+        if cursor is not None and month > cursor[0]:
+            continue
+        if filters is not None and not filters.overlaps(month, add_months(month, 1)):
+            continue
+        for pk, created_at, transaction_type, amount, _, sender, receiver, _ in reversed(
+            [leg for leg in manifest.open(month).legs(account_id) if not is_duplicate(leg)]
+        ):
+            if cursor is not None and (created_at, pk) >= cursor:
+                continue
+            if filters is not None and not filters.matches(transaction_type, amount, created_at):
+                continue
+            rows.append((pk, transaction_type, amount, sender, receiver, created_at))
+            if len(rows) == limit:
+                return rows
+    return rows
+
+
+def export_rows(account_id, start=None, end=None):
+    """The account's archived rows in ``[start, end)`` as ``history.EXPORT_FIELDS`` tuples, oldest first."""
+    for month in manifest.months():
+        if (end is not None and month >= end) or (start is not None and add_months(month, 1) <= start):
+            continue
+        for leg in manifest.open(month).legs(account_id):
+            pk, created_at, transaction_type, amount, _, sender, receiver, description = leg
+            if is_duplicate(leg) or (start is not None and created_at < start) or (end is not None and created_at >= end):
+                continue
+            yield pk, created_at, transaction_type, amount, sender, receiver, description
+
+
+def net_before(lo, hi, start):
+    """Archived net amount (received minus sent) per account in ``[lo, hi)`` before ``start``."""
+    net = {}
+    for month in manifest.months():
+        if add_months(month, 1) > start:
+            break
+        for account_id, _, _, _, cents in manifest.open(month).records(max(lo, ORPHANS + 1), hi):
+            net[account_id] = net.get(account_id, 0) + cents
+    return {account_id: Decimal(cents).scaleb(-2) for account_id, cents in net.items()}
+
+
+def statement_rows(lo, hi, month):
+    """One archived month as ``statements.ROW_FIELDS`` tuples, grouped by account, oldest first."""
+    if month not in manifest.months():
+        # Older than anything archived, so there were no rows at all.
+        return
+    archive = manifest.open(month)
+    for entry in archive.records(max(lo, ORPHANS + 1), hi):
+        for pk, created_at, transaction_type, amount, sign, sender, receiver, description in archive.block(entry):
+            counterpart = receiver if sign < 0 else sender
+            yield entry[0], created_at, pk, transaction_type, amount, sign, counterpart, description
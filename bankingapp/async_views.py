@@ -0,0 +1,83 @@
+"""
+Async (ASGI) versions of the read-heavy endpoints.
+
+DRF's APIView is synchronous, so these are plain Django async views that
+authenticate with ``aauthenticate`` and read through the async ORM. Under
+an ASGI server a single worker keeps serving other requests while these wait
+on the database. Response bodies match their synchronous counterparts.
+"""
+
+from functools import wraps
+
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+
+from . import history
+from .authentication import aauthenticate
+from .models import BankAccount
+from .pagination import KeysetPagination
+from .serializers import transaction_rows
+
+
+def _json(data, status=status.HTTP_200_OK):
+    # The configured DRF renderer, so bodies match the sync views byte for byte.
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+
+
+def async_jwt_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return _json({"detail": f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+        try:
+            auth = await aauthenticate(request)
+        except APIException as e:
+            return _json(e.detail if isinstance(e.detail, dict) else {"detail": e.detail}, e.status_code)
+        if auth is None:
+            return _json({"detail": "Authentication credentials were not provided."}, status.HTTP_401_UNAUTHORIZED)
+        request.user, request.auth = auth
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@async_jwt_required
+async def user_bank_accounts(request):
+    account_data = [
+        {
+            "account_number": account_number,
+            "balance": balance,
+            "account_type": account_type,
+        }
+        async for account_number, balance, account_type in BankAccount.objects.filter(
+            user_id=request.user.id
+        ).with_total_balance().values_list("account_number", "total_balance", "account_type")
+    ]
+    return _json(account_data)
+
+
+@async_jwt_required
+async def account_transactions(request, accountNumber):
+    paginator = KeysetPagination()
+    try:
+        cursor, page_size = paginator.start(request)
+    except APIException as e:
+        return _json({"detail": e.detail}, e.status_code)
+
+    try:
+        filters = history.HistoryFilter.from_params(request.GET)
+    except ValueError as e:
+        return _json({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+
+    account_id = await history.aresolve_account(accountNumber, request.user)
+    if account_id is None:
+        return _json({"error": "Account not found"}, status.HTTP_404_NOT_FOUND)
+    rows = await history.apage_values(account_id, page_size + 1, cursor, filters=filters)
+    last = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = (rows[-1][-1], rows[-1][0])
+
+    return _json({"next": paginator.get_next_link(last), "results": transaction_rows(rows)})
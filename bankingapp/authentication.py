@@ -0,0 +1,141 @@
+"""
+Query-free JWT authentication.
+
+``StatelessJWTAuthentication`` trusts the signed claims of an access token and
+hands the view a ``TokenUser`` instead of loading the User row. Revocation is
+checked against ``revoked_tokens``, an in-process copy of the unexpired JTIs in
+``BlacklistedToken`` that is topped up incrementally every
+``JWT_REVOCATION_REFRESH_SECONDS``; a sign-out therefore takes effect on every
+worker within that delay.
+
+Tokens issued at sign-in carry an ``is_staff`` claim, which ``TokenUser``
+exposes as ``request.user.is_staff``. The claim is fixed when the user signs
+in, so a change to a user's staff flag applies from their next sign-in.
+
+Because ``request.user`` may be a ``TokenUser``, views filter on
+``user_id=request.user.id`` rather than passing the user object to the ORM.
+"""
+
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import AccessToken, BlacklistMixin, RefreshToken
+
+
+class RevocableAccessToken(BlacklistMixin, AccessToken):
+    """An access token that can be put on the blacklist, used by SignOutView."""
+
+
+class StaffClaimRefreshToken(RefreshToken):
+    """A refresh token whose access tokens carry the user's ``is_staff`` flag."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token["is_staff"] = user.is_staff
+        return token
+
+
+class RevokedTokens:
+    """
+    The set of blacklisted, unexpired JTIs, refreshed by BlacklistedToken id.
+
+    Ids are handed out when a row is inserted, not when it commits, so a row
+    can become visible after rows with higher ids. Each refresh therefore
+    re-reads the last ``rescan_rows`` ids below the highest one seen as well.
+    """
+
+    def __init__(self, refresh_interval=5.0, rescan_rows=1000):
+        self.refresh_interval = refresh_interval
+        self.rescan_rows = rescan_rows
+        self._expiry_by_jti = {}
+        self._last_id = 0
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        now = timezone.now()
+        rows = (
+            BlacklistedToken.objects.filter(
+                id__gt=self._last_id - self.rescan_rows, token__expires_at__gt=now
+            )
+            .order_by("id")
+            .values_list("id", "token__jti", "token__expires_at")
+        )
+        for row_id, jti, expires_at in rows:
+            self._expiry_by_jti[jti] = expires_at
+            self._last_id = max(self._last_id, row_id)
+        self._expiry_by_jti = {
+            jti: expires_at for jti, expires_at in self._expiry_by_jti.items() if expires_at > now
+        }
+
+    def __contains__(self, jti):
+        if time.monotonic() >= self._next_refresh:
+            with self._lock:
+                if time.monotonic() >= self._next_refresh:
+                    self.refresh()
+                    self._next_refresh = time.monotonic() + self.refresh_interval
+        return jti in self._expiry_by_jti
+
+    def reset(self):
+        with self._lock:
+            self._expiry_by_jti = {}
+            self._last_id = 0
+            self._next_refresh = 0.0
+
+
+revoked_tokens = RevokedTokens(
+    refresh_interval=getattr(settings, "JWT_REVOCATION_REFRESH_SECONDS", 5.0),
+    rescan_rows=getattr(settings, "JWT_REVOCATION_RESCAN_ROWS", 1000),
+)
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """JWT authentication that never touches the User table."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if token.get(api_settings.JTI_CLAIM) in revoked_tokens:
+            raise InvalidToken("Token is blacklisted")
+        return token
+
+
+async def aauthenticate(request):
+    """
+    Authenticate a plain Django request for the async views.
+
+    Returns ``(user, token)``, or ``None`` when no bearer token was sent, and
+    raises the same exceptions as the DRF authentication classes. Honours
+    ``JWT_AUTH_MODE`` the same way the synchronous views do.
+    """
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    token = authenticator.get_validated_token(raw_token)
+
+    if getattr(settings, "JWT_AUTH_MODE", "database") == "stateless":
+        if await sync_to_async(revoked_tokens.__contains__)(token.get(api_settings.JTI_CLAIM)):
+            raise InvalidToken("Token is blacklisted")
+        return api_settings.TOKEN_USER_CLASS(token), token
+
+    try:
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken("Token contained no recognizable user identification")
+    user = await get_user_model().objects.filter(
+        **{api_settings.USER_ID_FIELD: user_id}, is_active=True
+    ).afirst()
+    if user is None:
+        raise AuthenticationFailed("User not found", code="user_not_found")
+    return user, token
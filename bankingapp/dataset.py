@@ -0,0 +1,177 @@
+"""
+Synthetic dataset generation for load and query benchmarks.
+
+``generate_dataset`` builds a plan (id bases, counts, a reserved block of
+account numbers) and runs four phases, each split into index ranges across a
+process pool (bankingapp/parallel.py):
+
+1. users, sharing one password hash;
+2. accounts, one per user plus a long tail of extra accounts, each funded by
+   an opening DEPOSIT at the start of the time window;
+3. transactions: transfers from random accounts, half of them to a small set
+   of merchant accounts with Zipf-skewed popularity, plus deposits and
+   withdrawals, spread uniformly over the window;
+4. balances, set from the generated ledger so reconciliation finds nothing.
+
+Users and accounts get explicit primary keys, so workers never read back ids.
+Rows go in with ``COPY`` on PostgreSQL (psycopg2) and ``bulk_create`` elsewhere.
+Every range seeds its own RNG from ``--seed`` and its position, so a run is
+reproducible regardless of the number of workers.
+"""
+
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from .account_numbers import SEQUENCE_DIGITS, luhn_check_digit
+from .models import BankAccount, Transaction
+from .statements import opening_balances
+
+USER_FIELDS = ("id", "password", "is_superuser", "username", "first_name", "last_name",
+               "email", "is_staff", "is_active", "date_joined")
+ACCOUNT_FIELDS = ("id", "user_id", "account_number", "account_type", "balance", "balance_slots")
+TRANSACTION_FIELDS = ("sender_id", "receiver_id", "transaction_type", "amount", "description", "created_at")
+
+MERCHANT_SHARE = 0.5
+DEPOSIT_SHARE = 0.05
+WITHDRAWAL_SHARE = 0.05
+# Transfer amounts are uniform between these, in cents.
+MIN_AMOUNT, MAX_AMOUNT = 100, 10000
+
+
+def _rng(plan, phase, lo):
+    return random.Random(f"{plan['seed']}:{phase}:{lo}")
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+@contextmanager
+def explicit_timestamps(model):
+    """Let bulk_create keep the ``auto_now_add`` values we generated."""
+    fields = [field for field in model._meta.concrete_fields if getattr(field, "auto_now_add", False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def insert_rows(model, fields, rows):
+    """Insert tuples of ``fields`` values, with COPY when the driver supports it."""
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if connection.vendor == "postgresql" and hasattr(raw, "copy_expert"):
+            quote = connection.ops.quote_name
+            columns = ", ".join(quote(model._meta.get_field(name).column) for name in fields)
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write("\t".join(_copy_value(value) for value in row))
+                buffer.write("\n")
+            buffer.seek(0)
+            raw.copy_expert(f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN", buffer)
+            return
+    with explicit_timestamps(model):
+        model.objects.bulk_create((model(**dict(zip(fields, row))) for row in rows), batch_size=1000)
+
+
+def account_number(plan, index):
+    digits = f"{plan['number_start'] + index:0{SEQUENCE_DIGITS}d}"
+    return digits + luhn_check_digit(digits)
+
+
+def generate_users(lo, hi, plan):
+    joined = plan["start"]
+    rows = [
+        (plan["user_base"] + i, plan["password"], False, f"user{plan['user_base'] + i}", "", "",
+         f"user{plan['user_base'] + i}@example.com", False, True, joined)
+        for i in range(lo, hi)
+    ]
+    with transaction.atomic():
+        insert_rows(User, USER_FIELDS, rows)
+    return len(rows)
+
+
+def generate_accounts(lo, hi, plan):
+    rng = _rng(plan, "accounts", lo)
+    accounts, deposits = [], []
+    for j in range(lo, hi):
+        account_id = plan["account_base"] + j
+        # Every user gets one account; the rest go to random users (the long tail).
+        owner = j if j < plan["users"] else rng.randrange(plan["users"])
+        merchant = j < plan["merchants"]
+        account_type = "CHECKING" if merchant or rng.random() < 0.7 else "SAVINGS"
+        accounts.append((account_id, plan["user_base"] + owner, account_number(plan, j), account_type, Decimal("0.00"), 0))
+        if not merchant:
+            # Enough to cover the account's expected outflow a few times over.
+            cents = rng.randint(plan["opening_cents"], plan["opening_cents"] * 4)
+            deposits.append((None, account_id, "DEPOSIT", Decimal(cents) / 100, "Opening deposit", plan["start"]))
+    with transaction.atomic():
+        insert_rows(BankAccount, ACCOUNT_FIELDS, accounts)
+        insert_rows(Transaction, TRANSACTION_FIELDS, deposits)
+    return len(accounts)
+
+
+def generate_transactions(lo, hi, plan):
+    rng = _rng(plan, "transactions", lo)
+    base, accounts, merchants = plan["account_base"], plan["accounts"], plan["merchants"]
+    cum_weights = list(accumulate(1 / (rank + 1) ** 1.1 for rank in range(merchants)))
+    merchant_ids = range(base, base + merchants)
+    span = (plan["end"] - plan["start"]).total_seconds()
+
+    rows = []
+    for _ in range(lo, hi):
+        created_at = plan["start"] + timedelta(seconds=rng.uniform(1, span))
+        amount = Decimal(rng.randint(MIN_AMOUNT, MAX_AMOUNT)) / 100
+        account = base + rng.randrange(merchants, accounts) if accounts > merchants else base
+        roll = rng.random()
+        if roll < DEPOSIT_SHARE:
+            rows.append((None, account, "DEPOSIT", amount * 10, "Payroll", created_at))
+        elif roll < DEPOSIT_SHARE + WITHDRAWAL_SHARE:
+            rows.append((account, None, "WITHDRAWAL", amount, None, created_at))
+        elif merchants and roll < DEPOSIT_SHARE + WITHDRAWAL_SHARE + MERCHANT_SHARE:
+            merchant = rng.choices(merchant_ids, cum_weights=cum_weights)[0]
+            rows.append((account, merchant, "TRANSFER", amount, "Card purchase", created_at))
+        else:
+            receiver = base + rng.randrange(accounts)
+            if receiver == account:
+                receiver = base + (receiver - base + 1) % accounts
+            rows.append((account, receiver, "TRANSFER", amount, None, created_at))
+    with transaction.atomic():
+        insert_rows(Transaction, TRANSACTION_FIELDS, rows)
+    return len(rows)
+
+
+def settle_balances(lo, hi, plan):
+    """Set each generated account's balance to its ledger total."""
+    first, last = plan["account_base"] + lo, plan["account_base"] + hi
+    totals = opening_balances(first, last, plan["end"] + timedelta(days=1))
+    accounts = [BankAccount(pk=pk, balance=total.quantize(Decimal("0.01"))) for pk, total in totals.items()]
+    with transaction.atomic():
+        BankAccount.objects.bulk_update(accounts, ["balance"], batch_size=1000)
+    return len(accounts)
+
+
+def reset_sequences():
+    """Move the id sequences past the explicit primary keys we inserted (PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [User, BankAccount])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
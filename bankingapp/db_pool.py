@@ -0,0 +1,161 @@
+"""
+A per-process database connection pool.
+
+Django 4.2 opens one connection per thread and, with ``CONN_MAX_AGE``, keeps
+it open while the thread sits idle, so ``workers x threads`` connections stay
+open against Postgres. With ``DATABASE_POOL=internal`` the
+``bankingapp.pooled_postgresql`` backend instead takes a connection from a
+shared ``ConnectionPool`` when a thread first queries and returns it at the
+end of the request, so a process needs only as many connections as it has
+requests in flight, up to ``max_size``.
+
+Requests wait up to ``timeout`` seconds for a free connection and then fail
+with an OperationalError. Idle connections beyond ``min_size`` are closed
+after ``max_idle`` seconds. After a fork the child drops the parent's
+connections without closing them, since closing would end the parent's
+sessions.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, name, connect, close, check=None, min_size=0, max_size=10, timeout=5.0,
+                 max_idle=300.0, check_after=30.0):
+        self.name = name
+        self.connect = connect
+        self.close = close
+        self.check = check
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        # (connection, returned_at); the most recently returned is reused first.
+        self._idle = deque()
+        self._size = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.opened = 0
+        self.discarded = 0
+
+    def getconn(self):
+        """Return an open connection, waiting up to ``timeout`` seconds for one."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        while True:
+            conn = idle_for = None
+            with self._cond:
+                if self._pid != os.getpid():
+                    self._reset()
+                while True:
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        idle_for = time.monotonic() - returned_at
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f"No connection available in pool {self.name!r} "
+                            f"(max_size={self.max_size}) within {self.timeout}s."
+                        )
+                    if not waited:
+                        waited = True
+                        self.waits += 1
+                    self._cond.wait(remaining)
+                if waited:
+                    self.wait_seconds += time.monotonic() - start
+                self.checkouts += 1
+
+            if conn is None:
+                try:
+                    conn = self.connect()
+                except BaseException:
+                    self._forget()
+                    raise
+                with self._cond:
+                    self.opened += 1
+                return conn
+            if self.check is not None and idle_for >= self.check_after and not self.check(conn):
+                # Dropped by the server (restart, idle timeout); try the next one.
+                self.putconn(conn, discard=True)
+                continue
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Return ``conn`` to the pool, or close it if ``discard`` or it came from before a fork."""
+        stale = []
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            if discard:
+                self._size -= 1
+                self.discarded += 1
+                stale.append(conn)
+            else:
+                now = time.monotonic()
+                self._idle.append((conn, now))
+                # The least recently used sit at the left; trim them down to min_size.
+                while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle:
+                    stale.append(self._idle.popleft()[0])
+                    self._size -= 1
+            self._cond.notify()
+        for old in stale:
+            try:
+                self.close(old)
+            except Exception:
+                pass
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "wait_seconds": self.wait_seconds,
+                "opened": self.opened,
+                "discarded": self.discarded,
+            }
+
+
+pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, factory):
+    """The pool for database ``alias``, created by ``factory()`` on first use."""
+    pool = pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = pools.get(alias)
+            if pool is None:
+                pool = pools[alias] = factory()
+    return pool
@@ -0,0 +1,338 @@
+"""
+Queries over a single account's transaction history.
+
+An account's history is the UNION ALL of two branches, rows it sent and rows
+it received, each of which walks its own ``(sender|receiver, -created_at,
+-id)`` index. Pages are addressed by a ``(created_at, id)`` keyset rather than
+an offset, so fetching page N costs the same as fetching page 1.
+
+Months moved to the cold-tier archive (bankingapp/archive.py) are read from
+the archive files, after the live table, by ``page_values()`` and
+``export_rows()``.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import chain
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import archive
+from .account_cache import account_cache
+from .models import BankAccount, Transaction
+
+NEWEST_FIRST = ("-created_at", "-id")
+
+
+def resolve_account(account_number, user=None):
+    """
+    Return the primary key of ``account_number``, or ``None`` if it does not
+    exist or, when ``user`` is given, belongs to someone else (staff may read
+    any account).
+    """
+    try:
+        ref = account_cache.get(account_number)
+    except BankAccount.DoesNotExist:
+        return None
+    if user is not None and not user.is_staff and ref.user_id != user.id:
+        return None
+    return ref.id
+
+
+async def aresolve_account(account_number, user=None):
+    return await sync_to_async(resolve_account)(account_number, user)
+
+
+def before(created_at, pk):
+    """Rows strictly older than the ``(created_at, pk)`` keyset position."""
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+
+
+def after(created_at, pk):
+    """Rows strictly newer than the ``(created_at, pk)`` keyset position."""
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+
+
+def window(start, end):
+    """
+    Transactions after the ``start`` keyset position (``None`` means from the
+    beginning) up to and including ``end``.
+    """
+    rows = Transaction.objects.exclude(after(*end))
+    if start is not None:
+        rows = rows.filter(after(*start))
+    return rows
+
+
+def branches(account_id, queryset=None):
+    """
+    Split an account's history into its sent and received halves.
+
+    A transfer an account makes to itself is only returned by the sent branch
+    so UNION ALL never yields it twice.
+    """
+    if queryset is None:
+        queryset = Transaction.objects.all()
+    sent = queryset.filter(sender_id=account_id)
+    received = queryset.filter(receiver_id=account_id).exclude(sender_id=account_id)
+    return sent, received
+
+
+def page_keys_queryset(account_id, limit, cursor=None, queryset=None):
+    """
+    Build the UNION ALL query for up to ``limit`` ``(created_at, id)`` pairs,
+    newest first, of the account's history starting after ``cursor``.
+    """
+    sent, received = branches(account_id, queryset)
+    if cursor is not None:
+        sent = sent.filter(before(*cursor))
+        received = received.filter(before(*cursor))
+
+    sent = sent.values_list("created_at", "id")
+    received = received.values_list("created_at", "id")
+    if connections[sent.db].features.supports_slicing_ordering_in_compound:
+        # Each branch stops after ``limit`` rows of its own index.
+        sent = sent.order_by(*NEWEST_FIRST)[:limit]
+        received = received.order_by(*NEWEST_FIRST)[:limit]
+    else:
+        sent = sent.order_by()
+        received = received.order_by()
+
+    return sent.union(received, all=True).order_by(*NEWEST_FIRST)[:limit]
+
+
+def page_rows_queryset(keys):
+    return (
+        Transaction.objects.filter(pk__in=[pk for _, pk in keys])
+        .select_related("sender", "receiver")
+        .order_by(*NEWEST_FIRST)
+    )
+
+
+def page(account_id, limit, cursor=None, queryset=None):
+    """
+    Return the Transaction objects for one page of the account's history,
+    with sender and receiver loaded.
+    """
+    keys = list(page_keys_queryset(account_id, limit, cursor, queryset))
+    if not keys:
+        return []
+    return list(page_rows_queryset(keys))
+
+
+async def apage(account_id, limit, cursor=None, queryset=None):
+    """``page()`` for async views, using the async ORM."""
+    keys = [key async for key in page_keys_queryset(account_id, limit, cursor, queryset)]
+    if not keys:
+        return []
+    return [row async for row in page_rows_queryset(keys)]
+
+
+# The columns TransactionSerializer reads, with both counterpart account
+# numbers joined in; see serializers.transaction_rows().
+ROW_FIELDS = (
+    "id",
+    "transaction_type",
+    "amount",
+    "sender__account_number",
+    "receiver__account_number",
+    "created_at",
+)
+
+
+def page_values_queryset(keys):
+    return (
+        Transaction.objects.filter(pk__in=[pk for _, pk in keys])
+        .values_list(*ROW_FIELDS)
+        .order_by(*NEWEST_FIRST)
+    )
+
+
+def _reaches_live(cursor, through, filters):
+    if through is None:
+        return True
+    if filters is not None and filters.end is not None and filters.end <= through:
+        return False
+    return cursor is None or cursor[0] >= through
+
+
+def _live_queryset(queryset, through, filters):
+    queryset = Transaction.objects.all() if queryset is None else queryset
+    if filters is not None:
+        queryset = filters.apply(queryset)
+    return archive.live(queryset, through)
+
+
+def page_values(account_id, limit, cursor=None, queryset=None, filters=None):
+    """
+    ``page()`` as flat ``ROW_FIELDS`` tuples, without building Transaction or
+    BankAccount instances, optionally narrowed by a ``HistoryFilter``.
+    Archived rows follow once the live ones run out.
+    """
+    through = archive.archived_through()
+    rows = []
+    if _reaches_live(cursor, through, filters):
+        keys = list(page_keys_queryset(account_id, limit, cursor, _live_queryset(queryset, through, filters)))
+        if keys:
+            rows = list(page_values_queryset(keys))
+    if through is not None and len(rows) < limit:
+        rows += archive.history_rows(account_id, limit - len(rows), cursor, filters)
+    return rows
+
+
+async def apage_values(account_id, limit, cursor=None, queryset=None, filters=None):
+    through = await sync_to_async(archive.archived_through)()
+    rows = []
+    if _reaches_live(cursor, through, filters):
+        queryset = _live_queryset(queryset, through, filters)
+        keys = [key async for key in page_keys_queryset(account_id, limit, cursor, queryset)]
+        if keys:
+            rows = [row async for row in page_values_queryset(keys)]
+    if through is not None and len(rows) < limit:
+        rows += await sync_to_async(archive.history_rows)(account_id, limit - len(rows), cursor, filters)
+    return rows
+
+
+def in_period(queryset, start=None, end=None):
+    """Restrict ``queryset`` to ``start <= created_at < end``; either bound may be ``None``."""
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(created_at__lt=end)
+    return queryset
+
+
+def parse_bound(value, end=False):
+    """
+    Parse a ``start``/``end`` query parameter into an aware datetime.
+
+    Plain dates are whole days, so an ``end`` date includes that day. Raises
+    ``ValueError`` for anything that is neither a date nor a datetime.
+    """
+    if not value:
+        return None
+    # Dates first: parse_datetime() also accepts a bare date, as midnight.
+    day = parse_date(value)
+    if day is not None:
+        if end:
+            day += timedelta(days=1)
+        moment = datetime.combine(day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"Invalid date: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+TRANSACTION_TYPES = {code for code, _ in Transaction.TRANSACTION_TYPES}
+
+
+def parse_amount(value):
+    """Parse an amount query parameter; raises ``ValueError`` unless it is a non-negative number."""
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value}")
+    if not amount.is_finite() or amount < 0:
+        raise ValueError(f"Invalid amount: {value}")
+    return amount
+
+
+class HistoryFilter(NamedTuple):
+    """
+    Server-side filters for an account's history. Each combination is served
+    by one of the Transaction indexes: ``transaction_type`` (with or without
+    a date range) by ``(sender|receiver, transaction_type, -created_at,
+    -id)``, amount ranges by ``(sender|receiver, amount)``, and date ranges
+    alone by the keyset indexes themselves.
+    """
+    transaction_type: str = None
+    min_amount: Decimal = None
+    max_amount: Decimal = None
+    start: datetime = None
+    end: datetime = None
+
+    @classmethod
+    def from_params(cls, params):
+        """
+        Build a filter from the ``transaction_type``, ``min_amount``,
+        ``max_amount``, ``start`` and ``end`` query parameters; ``None`` when
+        none is given. Raises ``ValueError`` for invalid values.
+        """
+        transaction_type = params.get("transaction_type") or None
+        if transaction_type is not None:
+            transaction_type = transaction_type.upper()
+            if transaction_type not in TRANSACTION_TYPES:
+                raise ValueError(f"transaction_type must be one of {', '.join(sorted(TRANSACTION_TYPES))}.")
+        min_amount = parse_amount(params["min_amount"]) if params.get("min_amount") else None
+        max_amount = parse_amount(params["max_amount"]) if params.get("max_amount") else None
+        if min_amount is not None and max_amount is not None and min_amount > max_amount:
+            raise ValueError("min_amount must not be greater than max_amount.")
+        start = parse_bound(params.get("start"))
+        end = parse_bound(params.get("end"), end=True)
+        if start is not None and end is not None and start >= end:
+            raise ValueError("start must be before end.")
+        filters = cls(transaction_type, min_amount, max_amount, start, end)
+        return filters if any(value is not None for value in filters) else None
+
+    def apply(self, queryset):
+        if self.transaction_type is not None:
+            queryset = queryset.filter(transaction_type=self.transaction_type)
+        if self.min_amount is not None:
+            queryset = queryset.filter(amount__gte=self.min_amount)
+        if self.max_amount is not None:
+            queryset = queryset.filter(amount__lte=self.max_amount)
+        return in_period(queryset, self.start, self.end)
+
+    def matches(self, transaction_type, amount, created_at):
+        """``apply()`` for one row held in memory (archived rows)."""
+        return (
+            (self.transaction_type is None or transaction_type == self.transaction_type)
+            and (self.min_amount is None or amount >= self.min_amount)
+            and (self.max_amount is None or amount <= self.max_amount)
+            and (self.start is None or created_at >= self.start)
+            and (self.end is None or created_at < self.end)
+        )
+
+    def overlaps(self, start, end):
+        """Whether any row in ``[start, end)`` can match the date range."""
+        return (self.end is None or start < self.end) and (self.start is None or end > self.start)
+
+
+EXPORT_FIELDS = (
+    "id",
+    "created_at",
+    "transaction_type",
+    "amount",
+    "sender__account_number",
+    "receiver__account_number",
+    "description",
+)
+
+
+def export_rows(account_id, start=None, end=None, chunk_size=2000):
+    """
+    Yield the account's history as tuples of ``EXPORT_FIELDS``, oldest first.
+
+    Rows come from a server-side cursor in chunks of ``chunk_size`` so memory
+    stays flat regardless of how long the history is. Archived rows in the
+    range are read first, one account block per archived month.
+    """
+    through = archive.archived_through()
+    archived = through is not None and (start is None or start < through)
+    live = in_period(Transaction.objects.all(), through if archived else start, end)
+    sent, received = branches(account_id, live)
+    rows = sent.values_list(*EXPORT_FIELDS).order_by().union(
+        received.values_list(*EXPORT_FIELDS).order_by(), all=True
+    ).order_by("created_at", "id")
+    rows = rows.iterator(chunk_size=chunk_size)
+    if not archived:
+        return rows
+    return chain(archive.export_rows(account_id, start, through if end is None else min(end, through)), rows)
@@ -0,0 +1,156 @@
+"""
+``Idempotency-Key`` support for the money-moving views.
+
+The first request with a given key claims it by inserting an IdempotencyKey
+row (unique per user), runs, and stores its response. A replay is answered
+from that row without calling the view, so no balance locks are taken. A
+duplicate that arrives while the first request is still running waits for
+it to finish and replays its response rather than posting a second time.
+
+Keys are kept for ``IDEMPOTENCY_KEY_TTL`` seconds. Server errors (5xx) are not
+stored, so the client may retry them with the same key. A worker killed
+mid-request leaves its row in progress; once that row's ``started_at`` is
+more than ``IDEMPOTENCY_LEASE_SECONDS`` old (longer than any request may
+run), a retry takes the key over and runs the request itself.
+
+The stored body is what the view's JSON renderer produced, so a replay
+encodes values such as Decimals exactly as the first response did.
+"""
+
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+POLL_INTERVAL = 0.05
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def _lease_cutoff(now):
+    """In-progress rows started at or before this have been abandoned."""
+    return now - timedelta(seconds=getattr(settings, "IDEMPOTENCY_LEASE_SECONDS", 120))
+
+
+def _claim(user_id, key, request_fingerprint):
+    """Insert the in-progress row; returns it, or None if the key is already taken."""
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=getattr(settings, "IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user_id=user_id,
+                    key=key,
+                    fingerprint=request_fingerprint,
+                    started_at=now,
+                    expires_at=expires_at,
+                )
+        except IntegrityError:
+            # An expired key is free to reuse; drop it and try once more.
+            if IdempotencyKey.objects.filter(user_id=user_id, key=key, expires_at__lte=now).delete()[0]:
+                continue
+            # So is one whose first request died without finishing. Only one
+            # retry's UPDATE can match the old started_at.
+            reclaimed = IdempotencyKey.objects.filter(
+                user_id=user_id,
+                key=key,
+                fingerprint=request_fingerprint,
+                status_code__isnull=True,
+                started_at__lte=_lease_cutoff(now),
+            ).update(started_at=now, expires_at=expires_at)
+            if reclaimed:
+                return IdempotencyKey.objects.get(user_id=user_id, key=key)
+            return None
+    return None
+
+
+def _render(view, data):
+    """``data`` as the view's JSON renderer writes it, decoded back into plain JSON values."""
+    renderer = next((r for r in view.get_renderers() if r.format == "json"), JSONRenderer())
+    return json.loads(renderer.render(data, renderer.media_type))
+
+
+def _replay(user_id, key, request_fingerprint, record=None):
+    deadline = time.monotonic() + getattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 5)
+    while True:
+        if record is None:
+            record = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+        if record is None:
+            # The original failed with a server error and released the key.
+            return Response(
+                {"error": "The original request failed; retry it."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if record.fingerprint != request_fingerprint:
+            return Response(
+                {"error": f"{HEADER} was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if record.status_code is not None:
+            return Response(record.response_body, status=record.status_code, headers={REPLAY_HEADER: "true"})
+        if time.monotonic() >= deadline:
+            return Response(
+                {"error": f"A request with this {HEADER} is still being processed."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        time.sleep(POLL_INTERVAL)
+        record = None
+
+
+def idempotent(handler):
+    """Decorate an APIView handler so repeated ``Idempotency-Key`` requests replay the first response."""
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            return Response({"error": f"{HEADER} is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = request.user.id
+        request_fingerprint = fingerprint(request)
+        # Replays are answered with this one read; only new keys pay for the insert.
+        existing = IdempotencyKey.objects.filter(
+            user_id=user_id, key=key, expires_at__gt=timezone.now()
+        ).first()
+        abandoned = (
+            existing is not None
+            and existing.status_code is None
+            and existing.started_at <= _lease_cutoff(timezone.now())
+        )
+        if existing is not None and not abandoned:
+            return _replay(user_id, key, request_fingerprint, existing)
+        record = _claim(user_id, key, request_fingerprint)
+        if record is None:
+            return _replay(user_id, key, request_fingerprint)
+
+        # Matches nothing once a retry has reclaimed the key from this request.
+        claimed = IdempotencyKey.objects.filter(pk=record.pk, started_at=record.started_at)
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except Exception:
+            claimed.delete()
+            raise
+        if response.status_code >= 500:
+            claimed.delete()
+        else:
+            claimed.update(status_code=response.status_code, response_body=_render(self, response.data))
+        return response
+    return wrapper
@@ -0,0 +1,101 @@
+"""
+Index changes on the Transaction table that do not block writes.
+
+A plain ``AddIndex`` or ``RemoveIndex`` holds a lock that stops every insert
+into Transaction for as long as the statement takes. On PostgreSQL these
+helpers build and drop indexes CONCURRENTLY instead, so the migrations that
+call them set ``atomic = False`` and pair them with state-only operations
+through ``SeparateDatabaseAndState``. A partitioned table (see
+bankingapp/partitions.py) cannot be indexed concurrently as a whole: its index
+is created on the parent only, then built concurrently on each partition and
+attached. Other databases run the plain statements, which never rebuild the
+table.
+"""
+
+from . import partitions
+
+
+def _using(schema_editor, model, index):
+    quote = schema_editor.quote_name
+    columns = [
+        f"{quote(model._meta.get_field(field_name).column)} {order}".strip()
+        for field_name, order in index.fields_orders
+    ]
+    return f"btree ({', '.join(columns)})"
+
+
+def create(connection, table, name, using):
+    """``CREATE INDEX name ON table USING <using>`` on PostgreSQL without blocking writes."""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if not partitions.is_partitioned(connection):
+            cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(name)} ON {quote(table)} USING {using}")
+            return
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {quote(name)} ON ONLY {quote(table)} USING {using}")
+        for partition, _ in partitions.partitions(connection):
+            child = f"{name}_{partition.rsplit('_', 1)[1]}"
+            cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(child)} ON {quote(partition)} USING {using}")
+            cursor.execute(f"ALTER INDEX {quote(name)} ATTACH PARTITION {quote(child)}")
+
+
+def drop(connection, name):
+    quote = connection.ops.quote_name
+    # A partitioned index can only be dropped as a whole, with a brief lock.
+    concurrently = "" if partitions.is_partitioned(connection) else " CONCURRENTLY"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX{concurrently} IF EXISTS {quote(name)}")
+
+
+def add_index(schema_editor, model, index):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        create(connection, model._meta.db_table, index.name, _using(schema_editor, model, index))
+    else:
+        schema_editor.add_index(model, index)
+
+
+def remove_index(schema_editor, model, index):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        drop(connection, index.name)
+    else:
+        schema_editor.remove_index(model, index)
+
+
+def column_indexes(connection, table, column):
+    """Names of the plain single-column indexes on ``column``, such as a ForeignKey's own."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [
+        name for name, info in constraints.items()
+        if info["index"] and info["columns"] == [column]
+        and not (info["unique"] or info["primary_key"] or info["foreign_key"])
+    ]
+
+
+def drop_column_indexes(schema_editor, model, field_name):
+    """Drop the index Django created for a ``db_index=True`` field, without touching the table."""
+    connection = schema_editor.connection
+    table = model._meta.db_table
+    for name in column_indexes(connection, table, model._meta.get_field(field_name).column):
+        if connection.vendor == "postgresql":
+            drop(connection, name)
+        else:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(name)}")
+
+
+def create_column_index(schema_editor, model, field_name):
+    """Recreate the index Django makes for a ``db_index=True`` field (the reverse of the above)."""
+    connection = schema_editor.connection
+    column = model._meta.get_field(field_name).column
+    table = model._meta.db_table
+    if column_indexes(connection, table, column):
+        return
+    name = schema_editor._create_index_name(table, [column])
+    if connection.vendor == "postgresql":
+        create(connection, table, name, f"btree ({schema_editor.quote_name(column)})")
+    else:
+        schema_editor.execute(
+            f"CREATE INDEX {schema_editor.quote_name(name)} ON {schema_editor.quote_name(table)} "
+            f"({schema_editor.quote_name(column)})"
+        )
@@ -0,0 +1,361 @@
+"""
+Balance mutations shared by every money-moving view.
+
+Rows are locked in primary-key order so two transfers running in opposite
+directions always queue on the same row first instead of deadlocking, and
+balances are changed with a single conditional UPDATE (``balance = balance - x
+WHERE balance >= x``) rather than a read-modify-save of the whole row.
+
+Accounts with ``balance_slots`` set are sharded: credits go to one of their
+BalanceSlot rows, and the slots are swept into the main balance under the
+account lock before any debit.
+"""
+
+import random
+import time
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import OperationalError, transaction as db_transaction
+from django.db.models import F
+
+from .account_cache import account_cache
+from .models import BalanceSlot, BankAccount, Transaction
+
+# Postgres SQLSTATEs worth retrying: serialization_failure, deadlock_detected.
+RETRYABLE_PGCODES = {"40001", "40P01"}
+# The largest amount Transaction.amount (max_digits=12, decimal_places=2) holds.
+MAX_AMOUNT = Decimal("9999999999.99")
+
+
+class LedgerError(Exception):
+    """Base class for errors the views report back to the client as 400s."""
+
+
+class InvalidAmount(LedgerError):
+    pass
+
+
+class InsufficientFunds(LedgerError):
+    pass
+
+
+class Posting(NamedTuple):
+    transaction: Transaction
+    sender_balance: Optional[Decimal]
+    receiver_balance: Optional[Decimal]
+
+
+def to_amount(value):
+    """Parse a request amount into a positive two-place Decimal."""
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        raise InvalidAmount("Invalid amount.")
+    if not amount.is_finite() or amount <= 0:
+        raise InvalidAmount("Amount must be greater than zero.")
+    # Checked first: quantize() raises InvalidOperation past 28 digits ("1e30").
+    if amount > MAX_AMOUNT:
+        raise InvalidAmount(f"Amount cannot exceed {MAX_AMOUNT}.")
+    if amount != amount.quantize(Decimal("0.01")):
+        raise InvalidAmount("Amount cannot have more than two decimal places.")
+    return amount
+
+
+def resolve_account(account_number, user=None):
+    """Return the cached AccountRef for ``account_number``, optionally scoped to ``user``."""
+    ref = account_cache.get(account_number)
+    if user is not None and ref.user_id != user.pk:
+        raise BankAccount.DoesNotExist("Account not found")
+    return ref
+
+
+def resolve_account_id(account_number, user=None):
+    """Return the primary key for ``account_number``, optionally scoped to ``user``."""
+    return resolve_account(account_number, user).id
+
+
+def _is_retryable(exc):
+    cause = exc.__cause__
+    if getattr(cause, "pgcode", None) in RETRYABLE_PGCODES:
+        return True
+    # SQLite reports writer contention as "database is locked".
+    return "database is locked" in str(exc)
+
+
+def run_with_retry(func, *args, **kwargs):
+    """
+    Run ``func`` in its own atomic block, retrying on serialization failures
+    and deadlocks with jittered backoff.
+    """
+    attempts = getattr(settings, "LEDGER_MAX_RETRIES", 3)
+    for attempt in range(attempts + 1):
+        try:
+            with db_transaction.atomic():
+                return func(*args, **kwargs)
+        except OperationalError as exc:
+            if attempt >= attempts or not _is_retryable(exc):
+                raise
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+
+def lock_accounts(account_ids):
+    """
+    Lock the given accounts in ascending id order and return
+    ``{id: (balance, balance_slots)}``.
+
+    Must be called inside an atomic block.
+    """
+    rows = (
+        BankAccount.objects.select_for_update()
+        .filter(pk__in=set(account_ids))
+        .order_by("pk")
+        .values_list("pk", "balance", "balance_slots")
+    )
+    return {pk: (balance, slots) for pk, balance, slots in rows}
+
+
+def lock_balances(account_ids):
+    """Like ``lock_accounts`` but return just ``{id: balance}``."""
+    return {pk: balance for pk, (balance, _) in lock_accounts(account_ids).items()}
+
+
+def debit(account_id, amount):
+    """Conditionally subtract ``amount``; raises InsufficientFunds if it would overdraw."""
+    updated = BankAccount.objects.filter(pk=account_id, balance__gte=amount).update(
+        balance=F("balance") - amount
+    )
+    if not updated:
+        raise InsufficientFunds("Insufficient funds")
+
+
+def credit(account_id, amount):
+    if not BankAccount.objects.filter(pk=account_id).update(balance=F("balance") + amount):
+        raise BankAccount.DoesNotExist("Account not found")
+
+
+def credit_slot(account_id, slots, amount):
+    """
+    Credit one randomly chosen BalanceSlot of a sharded account without
+    touching (or locking) the account row. Returns False if that slot does
+    not exist, e.g. because the account was unsharded after ``slots`` was read.
+    """
+    slot = random.randrange(slots)
+    return bool(
+        BalanceSlot.objects.filter(account_id=account_id, slot=slot).update(balance=F("balance") + amount)
+    )
+
+
+def sweep_slots(account_id, lock_all=False):
+    """
+    Move everything held in the account's BalanceSlot rows into its main
+    balance and return the amount moved. The account row must already be
+    locked, which keeps this from racing another sweep.
+
+    Only slots holding money are locked, so credits keep landing in empty
+    ones meanwhile. ``lock_all`` locks every slot row until the transaction
+    ends instead, which is required before any of them are deleted.
+    """
+    slots = BalanceSlot.objects.select_for_update().filter(account_id=account_id)
+    if not lock_all:
+        slots = slots.filter(balance__gt=0)
+    slots = [(pk, balance) for pk, balance in slots.order_by("slot").values_list("pk", "balance") if balance]
+    total = sum((balance for _, balance in slots), Decimal("0.00"))
+    if total:
+        BalanceSlot.objects.filter(pk__in=[pk for pk, _ in slots]).update(balance=Decimal("0.00"))
+        credit(account_id, total)
+    return total
+
+
+def total_balance(account_id):
+    """The visible balance of an account: main balance plus its slots."""
+    return (
+        BankAccount.objects.with_total_balance()
+        .filter(pk=account_id)
+        .values_list("total_balance", flat=True)
+        .get()
+    )
+
+
+def _post(sender, receiver, amount, transaction_type, description):
+    sender_id = sender.id if sender else None
+    receiver_id = receiver.id if receiver else None
+    # Credits to a sharded account land in a slot row, so its account row is
+    # not locked at all; that is what lets hot accounts take parallel credits.
+    # The slot count is read without the lock: if the account is resharded
+    # meanwhile, credit_slot misses and the credit goes to the main balance.
+    receiver_slots = 0
+    if receiver is not None and receiver_id != sender_id:
+        receiver_slots = (
+            BankAccount.objects.filter(pk=receiver_id).values_list("balance_slots", flat=True).first() or 0
+        )
+    lock_ids = [pk for pk in (sender_id, None if receiver_slots else receiver_id) if pk is not None]
+    locked = lock_accounts(lock_ids)
+    if set(lock_ids) - set(locked):
+        raise BankAccount.DoesNotExist("Account not found")
+    balances = {pk: balance for pk, (balance, _) in locked.items()}
+
+    sender_balance = receiver_balance = None
+    if sender is not None:
+        # Read under the lock, so a debit always sees slots added by a reshard.
+        if locked[sender_id][1]:
+            balances[sender_id] += sweep_slots(sender_id)
+        debit(sender_id, amount)
+        sender_balance = balances[sender_id] - amount
+    if receiver is not None:
+        if not (receiver_slots and credit_slot(receiver_id, receiver_slots, amount)):
+            credit(receiver_id, amount)
+        if receiver_id in balances:
+            receiver_balance = balances[receiver_id] + amount
+    if sender_id == receiver_id:
+        sender_balance = receiver_balance = balances[sender_id]
+
+    record = Transaction.objects.create(
+        sender_id=sender_id,
+        receiver_id=receiver_id,
+        amount=amount,
+        transaction_type=transaction_type,
+        description=description,
+    )
+    return Posting(record, sender_balance, receiver_balance)
+
+
+def transfer(sender_number, receiver_number, amount, user=None, description=None):
+    """
+    Move ``amount`` from ``sender_number`` to ``receiver_number``.
+
+    When ``user`` is given the sender account must belong to them. Raises
+    ``BankAccount.DoesNotExist`` for unknown accounts and ``LedgerError``
+    subclasses for bad amounts or insufficient funds.
+    """
+    amount = to_amount(amount)
+    sender = resolve_account(sender_number, user)
+    receiver = resolve_account(receiver_number)
+    return run_with_retry(_post, sender, receiver, amount, "TRANSFER", description)
+
+
+def deposit(account_number, amount, user=None, description=None):
+    amount = to_amount(amount)
+    account = resolve_account(account_number, user)
+    posting = run_with_retry(_post, None, account, amount, "DEPOSIT", description)
+    if posting.receiver_balance is None:
+        posting = posting._replace(receiver_balance=total_balance(account.id))
+    return posting
+
+
+def withdraw(account_number, amount, user=None, description=None):
+    amount = to_amount(amount)
+    account = resolve_account(account_number, user)
+    return run_with_retry(_post, account, None, amount, "WITHDRAWAL", description)
+
+
+def _apply_batch(items, account_ids, sharded_ids, atomic):
+    balances = lock_balances(account_ids.values())
+    for account_id in sharded_ids & set(balances):
+        balances[account_id] += sweep_slots(account_id)
+    running = dict(balances)
+    results, records = [], []
+
+    for item in items:
+        if "error" in item:
+            results.append({"index": item["index"], "status": "failed", "error": item["error"]})
+            continue
+        sender_id = account_ids[item["sender_account"]]
+        receiver_id = account_ids[item["receiver_account"]]
+        amount = item["amount"]
+        if sender_id not in running or receiver_id not in running:
+            results.append({"index": item["index"], "status": "failed", "error": "Account not found"})
+            continue
+        if running[sender_id] < amount:
+            results.append({"index": item["index"], "status": "failed", "error": "Insufficient balance"})
+            continue
+        running[sender_id] -= amount
+        running[receiver_id] += amount
+        records.append(Transaction(
+            sender_id=sender_id,
+            receiver_id=receiver_id,
+            amount=amount,
+            transaction_type="TRANSFER",
+            description=item.get("description"),
+        ))
+        results.append({"index": item["index"], "status": "ok"})
+
+    failed = any(result["status"] == "failed" for result in results)
+    if atomic and failed:
+        for result in results:
+            if result["status"] == "ok":
+                result["status"] = "not_applied"
+        return False, results
+
+    for account_id, balance in running.items():
+        delta = balance - balances[account_id]
+        if delta < 0:
+            debit(account_id, -delta)
+        elif delta > 0:
+            credit(account_id, delta)
+
+    created = iter(Transaction.objects.bulk_create(records))
+    for result in results:
+        if result["status"] == "ok":
+            result["transaction_id"] = next(created).pk
+    return True, results
+
+
+def batch_transfer(transfers, user, atomic=True):
+    """
+    Apply many transfers in one database transaction.
+
+    Every account number is resolved in a single query, balances are changed
+    once per account with the net delta of the batch, and the Transaction rows
+    are written with one ``bulk_create``. Transfers are evaluated in order, so
+    money received earlier in the batch can be spent later in it.
+
+    With ``atomic`` any failed item rejects the whole batch; otherwise failed
+    items are skipped and the rest are applied. Returns ``(applied, results)``
+    with one result dict per input item.
+    """
+    items = []
+    numbers = set()
+    for index, transfer in enumerate(transfers):
+        item = {"index": index}
+        items.append(item)
+        if not isinstance(transfer, dict):
+            item["error"] = "Each transfer must be an object."
+            continue
+        sender_number = transfer.get("sender_account")
+        receiver_number = transfer.get("receiver_account")
+        if not sender_number or not receiver_number:
+            item["error"] = "sender_account and receiver_account are required."
+            continue
+        try:
+            item["amount"] = to_amount(transfer.get("amount"))
+        except InvalidAmount as e:
+            item["error"] = str(e)
+            continue
+        item.update(
+            sender_account=str(sender_number),
+            receiver_account=str(receiver_number),
+            description=transfer.get("description"),
+        )
+        numbers.update((item["sender_account"], item["receiver_account"]))
+
+    accounts = BankAccount.objects.filter(account_number__in=numbers).values_list(
+        "account_number", "pk", "user_id", "balance_slots"
+    )
+    account_ids, owners, sharded_ids = {}, {}, set()
+    for number, pk, user_id, balance_slots in accounts:
+        account_ids[number] = pk
+        owners[number] = user_id
+        if balance_slots:
+            sharded_ids.add(pk)
+
+    for item in items:
+        if "error" in item:
+            continue
+        if owners.get(item["sender_account"]) != user.pk:
+            item["error"] = "Invalid sender account."
+        elif item["receiver_account"] not in account_ids:
+            item["error"] = "Invalid receiver account."
+
+    return run_with_retry(_apply_batch, items, account_ids, sharded_ids, atomic)
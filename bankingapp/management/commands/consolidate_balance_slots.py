@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q, Sum
+
+from bankingapp import ledger
+from bankingapp.models import BalanceSlot, BankAccount
+
+
+class Command(BaseCommand):
+    help = "Sweep the credits held in balance slots back into each sharded account's main balance."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-amount", type=Decimal, default=Decimal("0.01"),
+                            help="Skip accounts whose slots hold less than this.")
+
+    def handle(self, *args, **options):
+        # Accounts that were unsharded may still have leftover slot rows.
+        account_ids = (
+            BankAccount.objects.filter(
+                Q(balance_slots__gt=0) | Q(pk__in=BalanceSlot.objects.filter(balance__gt=0).values("account"))
+            )
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+        accounts = 0
+        total = Decimal("0.00")
+        for account_id in account_ids.iterator():
+            pending = BalanceSlot.objects.filter(account_id=account_id).aggregate(total=Sum("balance"))["total"]
+            if not pending or pending < options["min_amount"]:
+                continue
+            # One short transaction per account keeps credits flowing meanwhile.
+            total += ledger.run_with_retry(self.consolidate, account_id)
+            accounts += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Consolidated {total} across {accounts} accounts."))
+
+    @staticmethod
+    def consolidate(account_id):
+        ledger.lock_balances([account_id])
+        return ledger.sweep_slots(account_id)
@@ -0,0 +1,84 @@
+import os
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from bankingapp import dataset
+from bankingapp.account_numbers import AccountNumberAllocator
+from bankingapp.models import BankAccount
+from bankingapp.parallel import run_ranges
+
+
+def index_ranges(count, size):
+    return [(lo, min(lo + size, count)) for lo in range(0, count, size)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large, internally consistent dataset of users, accounts and "
+        "transactions (skewed towards a few merchant accounts) for benchmarking."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--accounts", type=int, help="Total accounts (default: 2 per user).")
+        parser.add_argument("--transactions", type=int, help="Transactions besides opening deposits (default: 25 per account).")
+        parser.add_argument("--merchants", type=int, help="Hot merchant accounts (default: 1 per 10,000 accounts).")
+        parser.add_argument("--days", type=int, default=365, help="Spread transactions over this many days up to now.")
+        parser.add_argument("--workers", type=int,
+                            help="Worker processes (default: CPU count on PostgreSQL, 1 elsewhere).")
+        parser.add_argument("--batch-size", type=int, default=50000, help="Rows per work unit.")
+        parser.add_argument("--password", default="generated-password-1")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        users = options["users"]
+        accounts = options["accounts"] if options["accounts"] is not None else users * 2
+        transactions = options["transactions"] if options["transactions"] is not None else accounts * 25
+        merchants = options["merchants"] if options["merchants"] is not None else max(1, accounts // 10000)
+        if users < 1 or accounts < users or transactions < 0 or not 0 <= merchants < accounts:
+            raise CommandError("Need users >= 1, accounts >= users, transactions >= 0 and merchants < accounts.")
+        workers = options["workers"] or ((os.cpu_count() or 1) if connection.vendor == "postgresql" else 1)
+
+        end = timezone.now()
+        # Typical outflow per ordinary account, in cents, sizes the opening deposits.
+        average_cents = (dataset.MIN_AMOUNT + dataset.MAX_AMOUNT) // 2
+        outflow = transactions * (1 - dataset.DEPOSIT_SHARE) * average_cents / max(1, accounts - merchants)
+        number_start, _ = AccountNumberAllocator(block_size=accounts).reserve_block()
+        plan = {
+            "seed": options["seed"],
+            "users": users,
+            "accounts": accounts,
+            "merchants": merchants,
+            "user_base": (User.objects.aggregate(top=Max("pk"))["top"] or 0) + 1,
+            "account_base": (BankAccount.objects.aggregate(top=Max("pk"))["top"] or 0) + 1,
+            "number_start": number_start,
+            "password": make_password(options["password"]),
+            "start": end - timedelta(days=options["days"]),
+            "end": end,
+            "opening_cents": max(100_000, int(outflow * 2)),
+        }
+
+        size = options["batch_size"]
+        for label, func, count in (
+            ("users", dataset.generate_users, users),
+            ("accounts", dataset.generate_accounts, accounts),
+            ("transactions", dataset.generate_transactions, transactions),
+            ("balances", dataset.settle_balances, accounts),
+        ):
+            started = time.monotonic()
+            rows = sum(result for _, result in run_ranges(func, index_ranges(count, size), workers, plan))
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{label}: {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f}/s)")
+
+        dataset.reset_sequences()
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {users} users, {accounts} accounts ({merchants} merchants) and "
+            f"{transactions + accounts - merchants} transactions with {workers} workers."
+        ))
@@ -0,0 +1,59 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bankingapp import statements
+from bankingapp.models import BankAccount
+from bankingapp.parallel import Checkpoint, id_ranges, run_ranges
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a JSON statement for every account for one month, in parallel over "
+        "account id ranges. Rerunning with the same arguments resumes an interrupted run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("month", help="YYYY-MM")
+        parser.add_argument("--output-dir", default="statements")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--range-size", type=int, default=1000, help="Account ids per work unit.")
+        parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start over.")
+
+    def handle(self, *args, **options):
+        month = options["month"]
+        try:
+            statements.month_bounds(month)
+        except ValueError:
+            raise CommandError("month must be YYYY-MM.")
+        if options["range_size"] < 1:
+            raise CommandError("--range-size must be positive.")
+
+        output_dir = os.path.join(options["output_dir"], month)
+        os.makedirs(output_dir, exist_ok=True)
+        checkpoint = Checkpoint(
+            os.path.join(output_dir, ".checkpoint"), f"generate_statements {month} range-size={options['range_size']}"
+        )
+        if options["restart"] and os.path.exists(checkpoint.path):
+            os.remove(checkpoint.path)
+        done = checkpoint.load()
+
+        ranges = [r for r in id_ranges(BankAccount.objects.all(), options["range_size"]) if r not in done]
+        if done:
+            self.stdout.write(f"Resuming: {len(done)} ranges already written, {len(ranges)} to go.")
+
+        started = time.monotonic()
+        accounts = rows = 0
+        for (lo, hi), (written, count) in run_ranges(
+            statements.write_statements, ranges, options["workers"], month, output_dir
+        ):
+            checkpoint.mark(lo, hi)
+            accounts += written
+            rows += count
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  accounts {lo}-{hi - 1}: {written} statements, {count} rows")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {accounts} statements ({rows} rows) to {output_dir} in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,57 @@
+import csv
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bankingapp import reconciliation
+from bankingapp.models import BankAccount
+from bankingapp.parallel import id_ranges, run_ranges
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare every account's balance with its Transaction ledger, folding only "
+        "transactions newer than the stored high-water mark, and report discrepancies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--range-size", type=int, default=5000, help="Account ids per work unit.")
+        parser.add_argument("--lag", type=float, default=300,
+                            help="Only fold transactions at least this many seconds old.")
+        parser.add_argument("--report", help="Write discrepancies to this CSV file (default: stdout).")
+        parser.add_argument("--fail-on-discrepancy", action="store_true",
+                            help="Exit with status 1 if any account disagrees with the ledger.")
+
+    def handle(self, *args, **options):
+        if options["range_size"] < 1:
+            raise CommandError("--range-size must be positive.")
+
+        mark = reconciliation.new_mark(options["lag"])
+        ranges = id_ranges(BankAccount.objects.all(), options["range_size"])
+
+        folded = 0
+        found = []
+        for _, (count, mismatched) in run_ranges(reconciliation.reconcile_range, ranges, options["workers"], mark):
+            folded += count
+            found += mismatched
+        found.sort()
+
+        report = open(options["report"], "w", newline="") if options["report"] else self.stdout
+        try:
+            writer = csv.writer(report)
+            writer.writerow(["account_number", "balance", "ledger_balance", "difference"])
+            for account_number, balance, expected in found:
+                writer.writerow([account_number, balance, expected, balance - expected])
+        finally:
+            if options["report"]:
+                report.close()
+
+        summary = f"Folded {folded} accounts through transaction #{mark[1] if mark else '-'}; "
+        if found:
+            self.stderr.write(self.style.ERROR(summary + f"{len(found)} discrepancies."))
+            if options["fail_on_discrepancy"]:
+                sys.exit(1)
+        else:
+            self.stdout.write(self.style.SUCCESS(summary + "no discrepancies."))
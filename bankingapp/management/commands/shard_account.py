@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bankingapp import ledger
+from bankingapp.models import BalanceSlot, BankAccount
+
+
+class Command(BaseCommand):
+    help = (
+        "Split a hot account's incoming credits across N balance slot rows "
+        "(--slots 0 folds the slots back in and turns sharding off)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("account_number")
+        parser.add_argument("--slots", type=int, required=True)
+
+    def handle(self, *args, **options):
+        slots = options["slots"]
+        if not 0 <= slots <= 256:
+            raise CommandError("--slots must be between 0 and 256.")
+        try:
+            account = BankAccount.objects.get(account_number=options["account_number"])
+        except BankAccount.DoesNotExist:
+            raise CommandError("Account not found.")
+
+        with transaction.atomic():
+            ledger.lock_balances([account.pk])
+            # Every slot row stays locked until commit, so a credit cannot
+            # land in one after the sweep and be deleted along with it.
+            swept = ledger.sweep_slots(account.pk, lock_all=True)
+            BalanceSlot.objects.filter(account=account, slot__gte=slots).delete()
+            BalanceSlot.objects.bulk_create(
+                [BalanceSlot(account=account, slot=slot) for slot in range(slots)],
+                ignore_conflicts=True,
+            )
+            account.balance_slots = slots
+            account.save(update_fields=["balance_slots"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{account.account_number}: {slots} balance slots ({swept} consolidated)."
+        ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from bankingapp import partitions
+from bankingapp.statements import month_bounds
+
+
+class Command(BaseCommand):
+    help = (
+        "Create monthly Transaction partitions ahead of time (PostgreSQL, "
+        "TRANSACTION_PARTITIONING=monthly) and optionally drop old months."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=3,
+                            help="Months after the current one to have partitions for.")
+        parser.add_argument("--convert", action="store_true",
+                            help="Partition the table first if it is not partitioned yet.")
+        parser.add_argument("--drop-before", metavar="YYYY-MM",
+                            help="Detach and drop monthly partitions that end before this month.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Transaction partitioning needs PostgreSQL.")
+        if options["months_ahead"] < 0:
+            raise CommandError("--months-ahead must not be negative.")
+        drop_before = None
+        if options["drop_before"]:
+            try:
+                drop_before, _ = month_bounds(options["drop_before"])
+            except ValueError:
+                raise CommandError("--drop-before must be YYYY-MM.")
+
+        if options["convert"] and partitions.convert(connection, options["months_ahead"]):
+            self.stdout.write(f"Partitioned {partitions.TABLE}.")
+        if not partitions.is_partitioned(connection):
+            raise CommandError(f"{partitions.TABLE} is not partitioned; run with --convert.")
+
+        for name in partitions.create_partitions(connection, options["months_ahead"]):
+            self.stdout.write(f"Created {name}.")
+        if drop_before is not None:
+            for name in partitions.drop_partitions(connection, drop_before):
+                self.stdout.write(f"Dropped {name}.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{partitions.TABLE}: {len(partitions.partitions(connection))} partitions."
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bankingapp import rollups
+
+
+class Command(BaseCommand):
+    help = "Fold transactions newer than the rollup high-water mark into the daily and monthly TransactionRollup rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50000, help="Transactions folded per database transaction.")
+        parser.add_argument("--lag", type=float, default=60,
+                            help="Only fold transactions at least this many seconds old.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        batches = written = 0
+        while True:
+            rows = rollups.fold_batch(options["batch_size"], options["lag"])
+            if rows is None:
+                break
+            batches += 1
+            written += rows
+
+        mark = rollups.current_mark()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} rollup rows in {batches} batches; folded through transaction #{mark[1] if mark else '-'}."
+        ))
@@ -0,0 +1,182 @@
+"""
+In-process request and SQL metrics, rendered in the Prometheus text format.
+
+``QueryMetricsMiddleware`` (bankingapp/middleware.py) records, for a sampled
+fraction of requests, the wall time, number of SQL statements, total SQL time
+and slowest statement per resolved URL name. Requests that run the same SQL
+template ``N_PLUS_ONE_THRESHOLD`` or more times are counted and logged as
+likely N+1 patterns.
+
+Metrics are per process; scrape each worker or aggregate upstream.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class RouteStats:
+    def __init__(self):
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_time = Histogram(SECONDS_BUCKETS)
+        self.n_plus_one = 0
+        self.slowest_seconds = 0.0
+        self.slowest_sql = ""
+
+
+class QueryRecorder:
+    """An execute_wrapper that times every statement run during one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = ""
+        self.templates = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.total += elapsed
+            # ``sql`` is the parameterised template, so identical statements
+            # with different arguments collapse onto one key.
+            self.templates[sql] += 1
+            if elapsed > self.slowest:
+                self.slowest = elapsed
+                self.slowest_sql = sql
+
+
+class Registry:
+    N_PLUS_ONE_THRESHOLD = 5
+
+    def __init__(self):
+        self.routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, duration, recorder):
+        repeated = [
+            (sql, count) for sql, count in recorder.templates.items()
+            if count >= self.N_PLUS_ONE_THRESHOLD
+        ]
+        with self._lock:
+            stats = self.routes.setdefault(route, RouteStats())
+            stats.duration.observe(duration)
+            stats.queries.observe(recorder.count)
+            stats.sql_time.observe(recorder.total)
+            if recorder.slowest > stats.slowest_seconds:
+                stats.slowest_seconds = recorder.slowest
+                stats.slowest_sql = recorder.slowest_sql
+            if repeated:
+                stats.n_plus_one += 1
+        for sql, count in repeated:
+            logger.warning("Possible N+1 on %s: statement ran %d times: %s", route, count, sql)
+
+    def reset(self):
+        with self._lock:
+            self.routes = {}
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        from .account_cache import account_cache
+
+        with self._lock:
+            routes = sorted(self.routes.items())
+            lines = []
+            for name, attribute in (
+                ("bankingapp_request_seconds", "duration"),
+                ("bankingapp_db_queries_per_request", "queries"),
+                ("bankingapp_db_seconds_per_request", "sql_time"),
+            ):
+                lines.append(f"# TYPE {name} histogram")
+                for route, stats in routes:
+                    lines += getattr(stats, attribute).render(name, f'route="{_escape(route)}"')
+            lines.append("# TYPE bankingapp_n_plus_one_requests_total counter")
+            for route, stats in routes:
+                lines.append(f'bankingapp_n_plus_one_requests_total{{route="{_escape(route)}"}} {stats.n_plus_one}')
+            lines.append("# TYPE bankingapp_slowest_query_seconds gauge")
+            for route, stats in routes:
+                lines.append(
+                    f'bankingapp_slowest_query_seconds{{route="{_escape(route)}",'
+                    f'statement="{_escape(stats.slowest_sql[:200])}"}} {stats.slowest_seconds}'
+                )
+
+        lines += self.render_pools()
+
+        cache = account_cache.stats()
+        lines += [
+            "# TYPE bankingapp_account_cache_hits_total counter",
+            f"bankingapp_account_cache_hits_total {cache['hits']}",
+            "# TYPE bankingapp_account_cache_misses_total counter",
+            f"bankingapp_account_cache_misses_total {cache['misses']}",
+            "# TYPE bankingapp_account_cache_size gauge",
+            f"bankingapp_account_cache_size {cache['size']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def render_pools():
+        from .db_pool import pools
+
+        stats = sorted((alias, pool.stats()) for alias, pool in list(pools.items()))
+        if not stats:
+            return []
+        lines = []
+        for name, key, kind in (
+            ("bankingapp_db_pool_connections", "size", "gauge"),
+            ("bankingapp_db_pool_idle_connections", "idle", "gauge"),
+            ("bankingapp_db_pool_in_use_connections", "in_use", "gauge"),
+            ("bankingapp_db_pool_max_connections", "max_size", "gauge"),
+            ("bankingapp_db_pool_checkouts_total", "checkouts", "counter"),
+            ("bankingapp_db_pool_waits_total", "waits", "counter"),
+            ("bankingapp_db_pool_timeouts_total", "timeouts", "counter"),
+            ("bankingapp_db_pool_wait_seconds_total", "wait_seconds", "counter"),
+            ("bankingapp_db_pool_opened_total", "opened", "counter"),
+            ("bankingapp_db_pool_discarded_total", "discarded", "counter"),
+        ):
+            lines.append(f"# TYPE {name} {kind}")
+            for alias, values in stats:
+                lines.append(f'{name}{{alias="{_escape(alias)}"}} {values[key]}')
+        return lines
+
+
+registry = Registry()
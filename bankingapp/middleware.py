@@ -0,0 +1,88 @@
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import QueryRecorder, registry
+
+# The recorder of the sampled request being handled, if any. Context
+# variables follow a request into the threads sync_to_async runs the ORM in.
+current_recorder = ContextVar("current_recorder", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryMetricsMiddleware:
+    """
+    Record SQL query count and timing per URL name for a sampled fraction
+    (``QUERY_METRICS_SAMPLE_RATE``) of requests; see bankingapp/metrics.py.
+
+    Works in both sync and async chains. Queries are counted on every
+    database alias (replicas included) and in whichever thread runs them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "QUERY_METRICS_SAMPLE_RATE", 1.0)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(install_recorder, dispatch_uid="bankingapp.query_metrics")
+        for connection in connections.all(initialized_only=True):
+            install_recorder(connection=connection)
+
+    def sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, time.perf_counter() - start, recorder)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, time.perf_counter() - start, recorder)
+        return response
+
+    @staticmethod
+    def record(request, duration, recorder):
+        match = getattr(request, "resolver_match", None)
+        route = match.view_name if match and match.view_name else "unresolved"
+        registry.record(route, duration, recorder)
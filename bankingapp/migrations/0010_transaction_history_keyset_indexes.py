@@ -0,0 +1,90 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The history indexes replace both the Meta single-column indexes and the
+# ForeignKeys' own db_index ones.
+HISTORY_INDEXES = [
+    models.Index(fields=['sender', '-created_at', '-id'], name='bankingapp__sender__a94d8e_idx'),
+    models.Index(fields=['receiver', '-created_at', '-id'], name='bankingapp__receive_3c9257_idx'),
+]
+OLD_INDEXES = [
+    models.Index(fields=['sender'], name='bankingapp__sender__a4cdd9_idx'),
+    models.Index(fields=['receiver'], name='bankingapp__receive_83de89_idx'),
+]
+
+
+def replace_indexes(apps, schema_editor):
+    from bankingapp import indexes
+
+    Transaction = apps.get_model('bankingapp', 'Transaction')
+    for index in HISTORY_INDEXES:
+        indexes.add_index(schema_editor, Transaction, index)
+    for index in OLD_INDEXES:
+        indexes.remove_index(schema_editor, Transaction, index)
+    for field_name in ('sender', 'receiver'):
+        indexes.drop_column_indexes(schema_editor, Transaction, field_name)
+
+
+def restore_indexes(apps, schema_editor):
+    from bankingapp import indexes
+
+    Transaction = apps.get_model('bankingapp', 'Transaction')
+    for field_name in ('sender', 'receiver'):
+        indexes.create_column_index(schema_editor, Transaction, field_name)
+    for index in OLD_INDEXES:
+        indexes.add_index(schema_editor, Transaction, index)
+    for index in HISTORY_INDEXES:
+        indexes.remove_index(schema_editor, Transaction, index)
+
+
+class Migration(migrations.Migration):
+    # Indexes are built and dropped CONCURRENTLY on PostgreSQL; see
+    # bankingapp/indexes.py.
+    atomic = False
+
+    dependencies = [
+        ('bankingapp', '0009_alter_transaction_amount_alter_transaction_receiver_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='transaction',
+            options={},
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='description',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal'), ('TRANSFER', 'Transfer')], max_length=10),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                *[migrations.RemoveIndex(model_name='transaction', name=index.name) for index in OLD_INDEXES],
+                migrations.AlterField(
+                    model_name='transaction',
+                    name='receiver',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='received_transactions', to='bankingapp.bankaccount'),
+                ),
+                migrations.AlterField(
+                    model_name='transaction',
+                    name='sender',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sent_transactions', to='bankingapp.bankaccount'),
+                ),
+                *[migrations.AddIndex(model_name='transaction', index=index) for index in HISTORY_INDEXES],
+            ],
+            database_operations=[
+                migrations.RunPython(replace_indexes, restore_indexes),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankingapp', '0012_balance_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountNumberCounter',
+            fields=[
+                ('name', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField()),
+            ],
+        ),
+    ]
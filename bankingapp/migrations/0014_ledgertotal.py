@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:56
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankingapp', '0013_accountnumbercounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerTotal',
+            fields=[
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger_total', serialize=False, to='bankingapp.bankaccount')),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('through_created_at', models.DateTimeField(blank=True, null=True)),
+                ('through_id', models.BigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
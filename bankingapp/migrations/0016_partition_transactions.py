@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def partition_transactions(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or getattr(settings, 'TRANSACTION_PARTITIONING', '') != 'monthly':
+        return
+    from bankingapp import partitions
+
+    partitions.convert(connection)
+
+
+class Migration(migrations.Migration):
+    # The conversion builds indexes CONCURRENTLY and keeps its exclusive lock
+    # to one short transaction; see bankingapp/partitions.py.
+    atomic = False
+
+    dependencies = [
+        ('bankingapp', '0015_transaction_rollups'),
+    ]
+
+    operations = [
+        # Not reversible in place: a partitioned table stays partitioned.
+        migrations.RunPython(partition_transactions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from bankingapp import search
+
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        search.install_postgresql(connection)
+    elif connection.vendor == 'sqlite':
+        search.install_sqlite(connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from bankingapp import search
+
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        search.uninstall_postgresql(connection)
+    elif connection.vendor == 'sqlite':
+        search.uninstall_sqlite(connection)
+
+
+class Migration(migrations.Migration):
+    # The PostgreSQL index is built CONCURRENTLY; see bankingapp/search.py.
+    atomic = False
+
+    dependencies = [
+        ('bankingapp', '0017_archivedmonth'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+# The sender/receiver ForeignKeys' own indexes are gone since 0010, so only
+# the filter indexes are added here.
+FILTER_INDEXES = [
+    models.Index(fields=['sender', 'transaction_type', '-created_at', '-id'], name='bankingapp__sender__70f1a1_idx'),
+    models.Index(fields=['receiver', 'transaction_type', '-created_at', '-id'], name='bankingapp__receive_7b3617_idx'),
+    models.Index(fields=['sender', 'amount'], name='bankingapp__sender__1cc856_idx'),
+    models.Index(fields=['receiver', 'amount'], name='bankingapp__receive_001620_idx'),
+]
+
+
+def add_filter_indexes(apps, schema_editor):
+    from bankingapp import indexes
+
+    Transaction = apps.get_model('bankingapp', 'Transaction')
+    for index in FILTER_INDEXES:
+        indexes.add_index(schema_editor, Transaction, index)
+
+
+def remove_filter_indexes(apps, schema_editor):
+    from bankingapp import indexes
+
+    Transaction = apps.get_model('bankingapp', 'Transaction')
+    for index in FILTER_INDEXES:
+        indexes.remove_index(schema_editor, Transaction, index)
+
+
+class Migration(migrations.Migration):
+    # Indexes are built and dropped CONCURRENTLY on PostgreSQL; see
+    # bankingapp/indexes.py.
+    atomic = False
+
+    dependencies = [
+        ('bankingapp', '0018_transaction_search'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='transaction', index=index) for index in FILTER_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(add_filter_indexes, remove_filter_indexes),
+            ],
+        ),
+    ]
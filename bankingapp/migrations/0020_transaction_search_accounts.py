@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def reinstall_search_table(apps, schema_editor):
+    # The SQLite FTS table gained an accounts column, so searches are scoped
+    # to the caller inside the index; rebuild it. PostgreSQL only changed
+    # its query. See bankingapp/search.py.
+    from bankingapp import search
+
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        search.uninstall_sqlite(connection)
+        search.install_sqlite(connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bankingapp', '0019_transaction_history_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstall_search_table, reinstall_search_table),
+    ]
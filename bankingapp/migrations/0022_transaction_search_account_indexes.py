@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_account_search_indexes(apps, schema_editor):
+    # Searches are scoped to the caller's accounts inside the index: replace
+    # the whole-table GIN index with ones that lead with sender_id and
+    # receiver_id. SQLite already scopes inside its FTS table (0020). See
+    # bankingapp/search.py.
+    from bankingapp import indexes, search
+
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        search.install_postgresql(connection)
+        indexes.drop(connection, search.INDEX)
+
+
+def restore_search_index(apps, schema_editor):
+    from bankingapp import indexes, search
+
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        indexes.create(connection, search.TABLE, search.INDEX, f"gin ({search.VECTOR})")
+        for name in search.ACCOUNT_INDEXES:
+            indexes.drop(connection, name)
+
+
+class Migration(migrations.Migration):
+    # The PostgreSQL indexes are built and dropped CONCURRENTLY; see
+    # bankingapp/indexes.py.
+    atomic = False
+
+    dependencies = [
+        ('bankingapp', '0021_idempotencykey_started_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_account_search_indexes, restore_search_index),
+    ]
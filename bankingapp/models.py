@@ -1,16 +1,62 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
 from decimal import Decimal
 from django.core.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+class BankAccountQuerySet(models.QuerySet):
+    def with_total_balance(self):
+        """
+        Annotate ``total_balance``: ``balance`` plus any credits still sitting
+        in the account's BalanceSlot rows.
+        """
+        money = models.DecimalField(max_digits=12, decimal_places=2)
+        slots = (
+            BalanceSlot.objects.filter(account=models.OuterRef('pk'))
+            .values('account')
+            .annotate(total=models.Sum('balance'))
+            .values('total')
+        )
+        return self.annotate(total_balance=models.ExpressionWrapper(
+            models.F('balance') + Coalesce(models.Subquery(slots, output_field=money), Decimal('0.00')),
+            output_field=money,
+        ))
+
 
 class BankAccount(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     account_number = models.CharField(max_length=20, unique=True)
     account_type = models.CharField(max_length=10, choices=[("CHECKING", "Checking"), ("SAVINGS", "Savings")])
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    # Hot accounts (merchants, payroll) take credits into this many BalanceSlot
+    # rows instead of locking this row; 0 means the account is not sharded.
+    balance_slots = models.PositiveSmallIntegerField(default=0)
+
+    objects = BankAccountQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.account_number} - {self.user.username}"
+
+
+class BalanceSlot(models.Model):
+    """
+    One shard of a hot account's pending credits. The account's visible
+    balance is ``BankAccount.balance`` plus the sum of its slots; slots are
+    swept back into ``balance`` before debits and by consolidate_balance_slots.
+    """
+    account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name='slots')
+    slot = models.PositiveSmallIntegerField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'slot'], name='unique_balance_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id}[{self.slot}] {self.balance}"
     
 class Transaction(models.Model):
     TRANSACTION_TYPES = [
@@ -19,11 +65,13 @@ class Transaction(models.Model):
         ("TRANSFER", "Transfer"),
     ]
 
+    # No single-column indexes: every index below starts with the account.
     sender = models.ForeignKey(
         'BankAccount',
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
+        db_index=False,
         related_name="sent_transactions"
     )
     receiver = models.ForeignKey(
@@ -31,6 +79,7 @@ class Transaction(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
+        db_index=False,
         related_name="received_transactions"
     )
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
@@ -41,8 +90,15 @@ class Transaction(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['created_at']),
-            models.Index(fields=['sender']),
-            models.Index(fields=['receiver']),
+            # Keyset pagination of an account's history walks one of these
+            # per direction; see bankingapp/history.py.
+            models.Index(fields=['sender', '-created_at', '-id']),
+            models.Index(fields=['receiver', '-created_at', '-id']),
+            # History filters; see history.HistoryFilter.
+            models.Index(fields=['sender', 'transaction_type', '-created_at', '-id']),
+            models.Index(fields=['receiver', 'transaction_type', '-created_at', '-id']),
+            models.Index(fields=['sender', 'amount']),
+            models.Index(fields=['receiver', 'amount']),
         ]
 
     def clean(self):
@@ -61,3 +117,110 @@ class Customer(models.Model):
 
     def __str__(self):
         return self.full_name
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored outcome of a money-moving request sent with an Idempotency-Key
+    header. ``status_code`` is null while the first request is still running;
+    ``started_at`` is when that request claimed the key.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code or 'in progress'})"
+
+
+class AccountNumberCounter(models.Model):
+    """
+    High-water mark for account number allocation. Workers reserve blocks of
+    numbers by advancing ``next_value``; see bankingapp/account_numbers.py.
+    """
+    name = models.CharField(max_length=30, primary_key=True)
+    next_value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+class LedgerTotal(models.Model):
+    """
+    An account's ledger balance (received minus sent Transaction amounts) for
+    every transaction up to and including the ``(through_created_at,
+    through_id)`` high-water mark. Maintained by reconcile_balances; see
+    bankingapp/reconciliation.py.
+    """
+    account = models.OneToOneField(BankAccount, on_delete=models.CASCADE, primary_key=True, related_name='ledger_total')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    through_created_at = models.DateTimeField(null=True, blank=True)
+    through_id = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.account_id}: {self.total} through #{self.through_id}"
+
+
+class TransactionRollup(models.Model):
+    """
+    Per-account inflow, outflow and transaction count for one day or month and
+    transaction type. Kept up to date by update_rollups; see bankingapp/rollups.py.
+    """
+    DAY = 'day'
+    MONTH = 'month'
+    PERIODS = [(DAY, 'Day'), (MONTH, 'Month')]
+
+    account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name='rollups')
+    period = models.CharField(max_length=5, choices=PERIODS)
+    period_start = models.DateField()
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    inflow = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    outflow = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'period', 'period_start', 'transaction_type'], name='unique_transaction_rollup'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} {self.period} {self.period_start} {self.transaction_type}"
+
+
+class RollupMark(models.Model):
+    """The ``(created_at, id)`` of the last transaction folded into TransactionRollup."""
+    name = models.CharField(max_length=30, primary_key=True)
+    through_created_at = models.DateTimeField(null=True, blank=True)
+    through_id = models.BigIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: #{self.through_id}"
+
+
+class ArchivedMonth(models.Model):
+    """
+    A calendar month of Transaction rows moved to the cold-tier archive files
+    by archive_transactions; see bankingapp/archive.py.
+    """
+    month = models.DateField(primary_key=True)
+    rows = models.BigIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['month']
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.rows} rows"
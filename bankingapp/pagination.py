@@ -0,0 +1,116 @@
+import base64
+import binascii
+from collections import OrderedDict
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination over a ``(created_at, id)`` keyset.
+
+    The view fetches the page itself (see ``bankingapp.history``); this class
+    only decodes the incoming cursor, sizes the page and builds the response.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    @staticmethod
+    def params(request):
+        # Plain Django requests (the async views) have no query_params.
+        return getattr(request, "query_params", request.GET)
+
+    def get_page_size(self, request):
+        try:
+            size = int(self.params(request)[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = self.params(request).get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = base64.urlsafe_b64decode(encoded.encode()).decode().rsplit("|", 1)
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def encode_cursor(self, created_at, pk):
+        return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{pk}".encode()).decode()
+
+    def start(self, request):
+        """Return ``(cursor, page_size)`` for the request and remember it for the links."""
+        self.request = request
+        self.page_size_for_request = self.get_page_size(request)
+        return self.decode_cursor(request), self.page_size_for_request
+
+    def get_next_link(self, last):
+        if last is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*last))
+
+    def get_paginated_response(self, data, last=None):
+        """``last`` is the ``(created_at, id)`` of the final row when another page may follow."""
+        return Response(OrderedDict([
+            ("next", self.get_next_link(last)),
+            ("results", data),
+        ]))
+
+
+class PagePagination(BasePagination):
+    """
+    Numbered pages for results that have no stable keyset, such as search
+    results in rank order. The view fetches ``page_size + 1`` rows from
+    ``offset`` to learn whether another page follows.
+    """
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    page_query_param = "page"
+    invalid_page_message = "Invalid page"
+
+    params = staticmethod(KeysetPagination.params)
+
+    def get_page_size(self, request):
+        try:
+            size = int(self.params(request)[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def start(self, request):
+        """Return ``(offset, page_size)`` for the request and remember the page for the links."""
+        self.request = request
+        try:
+            self.page = int(self.params(request).get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        if self.page < 1:
+            raise NotFound(self.invalid_page_message)
+        page_size = self.get_page_size(request)
+        return (self.page - 1) * page_size, page_size
+
+    def get_link(self, page):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, page)
+
+    def get_paginated_response(self, data, has_next=False):
+        return Response(OrderedDict([
+            ("next", self.get_link(self.page + 1) if has_next else None),
+            ("previous", self.get_link(self.page - 1) if self.page > 1 else None),
+            ("results", data),
+        ]))
@@ -0,0 +1,81 @@
+"""
+Fan-out helpers for batch management commands.
+
+Work is split into fixed-width primary key ranges, so the same ``--range-size``
+always yields the same ranges and a checkpoint written by one run is valid for
+the next. Ranges run in a pool of forked worker processes, each with its own
+database connection.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import connections
+from django.db.models import Max, Min
+
+
+def id_ranges(queryset, size):
+    """Yield half-open ``(lo, hi)`` primary key ranges of width ``size`` covering ``queryset``."""
+    bounds = queryset.aggregate(lo=Min("pk"), hi=Max("pk"))
+    if bounds["lo"] is None:
+        return
+    lo = bounds["lo"] - bounds["lo"] % size
+    while lo <= bounds["hi"]:
+        yield lo, lo + size
+        lo += size
+
+
+def run_ranges(func, ranges, workers, *args):
+    """
+    Call ``func(lo, hi, *args)`` for every range and yield ``((lo, hi), result)``
+    as each finishes, in completion order. ``workers <= 1`` runs in-process.
+    """
+    ranges = list(ranges)
+    if workers <= 1:
+        for lo, hi in ranges:
+            yield (lo, hi), func(lo, hi, *args)
+        return
+
+    # Children must open their own connections rather than share the parent's socket.
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(func, lo, hi, *args): (lo, hi) for lo, hi in ranges}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+class Checkpoint:
+    """
+    An append-only file of completed ``lo-hi`` ranges. The first line records
+    the run parameters; a checkpoint written with different ones is ignored.
+    """
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.done = set()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+        if lines and lines[0] == self.header:
+            self.done = set()
+            for line in lines[1:]:
+                lo, _, hi = line.partition("-")
+                # A crash can leave the last line half written.
+                if lo.isdigit() and hi.isdigit():
+                    self.done.add((int(lo), int(hi)))
+        else:
+            with open(self.path, "w") as f:
+                f.write(self.header + "\n")
+            self.done = set()
+        return self.done
+
+    def mark(self, lo, hi):
+        with open(self.path, "a") as f:
+            f.write(f"{lo}-{hi}\n")
+        self.done.add((lo, hi))
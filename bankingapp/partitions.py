@@ -0,0 +1,254 @@
+"""
+Monthly range partitioning of the Transaction table on PostgreSQL.
+
+With ``TRANSACTION_PARTITIONING=monthly`` the 0016 migration (or
+``transaction_partitions --convert``) turns ``bankingapp_transaction`` into a
+table partitioned by ``created_at`` without copying any rows:
+
+1. a ``CHECK (created_at < <boundary>)`` constraint is added ``NOT VALID`` and
+   validated, and a unique ``(id, created_at)`` index is built concurrently;
+   neither blocks reads or writes;
+2. in one short transaction the table is renamed to
+   ``bankingapp_transaction_legacy``, a partitioned parent is created under
+   the old name, and the legacy table is attached as the partition for
+   everything before the boundary. The validated constraint lets ATTACH skip
+   its scan, and the legacy indexes are adopted by the parent's;
+3. monthly partitions ``bankingapp_transaction_pYYYYMM`` are created from the
+   boundary onwards.
+
+The parent's primary key is ``(id, created_at)``, since every unique index on
+a partitioned table has to include the partition key; ids still come from one
+sequence, so Django keeps treating ``id`` as the primary key. Nothing has a
+foreign key to Transaction. The sender/receiver foreign keys are declared on
+each partition, because adding them to the parent would scan the legacy rows.
+
+Queries with a ``created_at`` bound (history pages after the first, exports,
+statements, rollup windows) only touch the partitions that can match. Monthly
+partitions are dropped with DETACH + DROP TABLE instead of a DELETE; the
+legacy partition holds everything from before the conversion and is only
+ever dropped as a whole. Inserts fail once they run past the last partition,
+so ``transaction_partitions`` has to run (from cron) ahead of time.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+from django.db import transaction
+
+from .models import Transaction
+
+TABLE = Transaction._meta.db_table
+LEGACY = f"{TABLE}_legacy"
+BOUND_CONSTRAINT = f"{TABLE}_partition_bound"
+UNIQUE_INDEX = f"{TABLE}_id_created_at_uniq"
+PARTITION_NAME = re.compile(rf"^{TABLE}_p(\d{{4}})(\d{{2}})$")
+FOREIGN_KEYS = ("sender_id", "receiver_id")
+LOCK_TIMEOUT = "5s"
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(start, months):
+    index = start.year * 12 + start.month - 1 + months
+    return start.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(start):
+    return f"{TABLE}_p{start:%Y%m}"
+
+
+def is_partitioned(connection):
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def partitions(connection):
+    """``[(name, upper bound or None)]`` of every partition, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    bounds = []
+    for name, expression in rows:
+        # "FOR VALUES FROM (...) TO ('2024-06-01 00:00:00+00')"
+        match = re.search(r"TO \('([^']+)'\)", expression)
+        upper = datetime.fromisoformat(match.group(1)) if match else None
+        bounds.append((name, upper))
+    return sorted(bounds, key=lambda bound: bound[1] or datetime.max.replace(tzinfo=timezone.utc))
+
+
+def _quote(connection, name):
+    return connection.ops.quote_name(name)
+
+
+def _create_partition(cursor, connection, start):
+    end = add_months(start, 1)
+    name = partition_name(start)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {_quote(connection, name)} PARTITION OF {_quote(connection, TABLE)} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        [start, end],
+    )
+    account_table = _quote(connection, Transaction._meta.get_field("sender").related_model._meta.db_table)
+    for column in FOREIGN_KEYS:
+        constraint = f"{name}_{column}_fk"
+        cursor.execute(
+            "SELECT 1 FROM pg_constraint WHERE conname = %s AND conrelid = to_regclass(%s)",
+            [constraint, name],
+        )
+        if cursor.fetchone() is None:
+            # Same as Django's own: enforced at commit, deletes handled by the ORM.
+            cursor.execute(
+                f"ALTER TABLE {_quote(connection, name)} ADD CONSTRAINT {_quote(connection, constraint)} "
+                f"FOREIGN KEY ({_quote(connection, column)}) REFERENCES {account_table} (id) "
+                f"DEFERRABLE INITIALLY DEFERRED"
+            )
+    return name
+
+
+def create_partitions(connection, months_ahead=3, now=None):
+    """
+    Make sure monthly partitions exist from the end of the last one through
+    ``months_ahead`` months after the current month. Returns the names created.
+    """
+    current = month_start(now or datetime.now(timezone.utc))
+    covered = max((upper for _, upper in partitions(connection) if upper is not None), default=None)
+    # Starting from the old upper bound also fills any gap left by missed runs.
+    start = covered or current
+    last = add_months(current, months_ahead + 1)
+    created = []
+    with connection.cursor() as cursor:
+        while start < last:
+            created.append(_create_partition(cursor, connection, start))
+            start = add_months(start, 1)
+    return created
+
+
+def drop_partitions(connection, before):
+    """
+    Detach and drop every monthly partition that ends on or before ``before``
+    (an aware datetime). The legacy partition is never dropped here.
+    """
+    concurrently = " CONCURRENTLY" if connection.pg_version >= 140000 else ""
+    dropped = []
+    for name, upper in partitions(connection):
+        if not PARTITION_NAME.match(name) or upper is None or upper > before:
+            continue
+        with connection.cursor() as cursor:
+            # DETACH ... CONCURRENTLY cannot run inside a transaction block.
+            cursor.execute(
+                f"ALTER TABLE {_quote(connection, TABLE)} DETACH PARTITION {_quote(connection, name)}{concurrently}"
+            )
+            cursor.execute(f"DROP TABLE {_quote(connection, name)}")
+        dropped.append(name)
+    return dropped
+
+
+def _indexes(cursor, table, exclude):
+    cursor.execute(
+        """
+        SELECT index_class.relname, pg_get_indexdef(pg_index.indexrelid)
+        FROM pg_index
+        JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+        WHERE pg_index.indrelid = to_regclass(%s) AND NOT pg_index.indisprimary
+        """,
+        [table],
+    )
+    return [(name, definition) for name, definition in cursor.fetchall() if name not in exclude]
+
+
+def convert(connection, months_ahead=3, now=None):
+    """
+    Partition the existing Transaction table as described in the module
+    docstring. Must be called outside a transaction (in autocommit mode).
+    Does nothing if the table is already partitioned.
+    """
+    if is_partitioned(connection):
+        return False
+
+    quote = connection.ops.quote_name
+    now = now or datetime.now(timezone.utc)
+    boundary = add_months(month_start(now), 1)
+    if boundary - now < timedelta(days=1):
+        # Leave time for the swap before new rows cross the boundary.
+        boundary = add_months(boundary, 1)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_constraint WHERE conname = %s AND conrelid = to_regclass(%s)",
+            [BOUND_CONSTRAINT, TABLE],
+        )
+        if cursor.fetchone() is not None:
+            # Left over from an interrupted run; its boundary may be stale.
+            cursor.execute(f"ALTER TABLE {quote(TABLE)} DROP CONSTRAINT {quote(BOUND_CONSTRAINT)}")
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(BOUND_CONSTRAINT)} "
+            f"CHECK (created_at < %s) NOT VALID",
+            [boundary],
+        )
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} VALIDATE CONSTRAINT {quote(BOUND_CONSTRAINT)}")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {quote(UNIQUE_INDEX)}")
+        cursor.execute(f"CREATE UNIQUE INDEX CONCURRENTLY {quote(UNIQUE_INDEX)} ON {quote(TABLE)} (id, created_at)")
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        cursor.execute(f"LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {quote(TABLE)}")
+        next_id = cursor.fetchone()[0]
+        indexes = _indexes(cursor, TABLE, exclude={UNIQUE_INDEX})
+
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} RENAME TO {quote(LEGACY)}")
+        cursor.execute(f"ALTER INDEX {quote(TABLE + '_pkey')} RENAME TO {quote(LEGACY + '_pkey')}")
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'id'", [LEGACY]
+        )
+        identity = cursor.fetchone()[0] != ""
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [LEGACY])
+        sequence = cursor.fetchone()[0]
+        if identity:
+            # Partitions cannot have identity columns (before PostgreSQL 17),
+            # so ids move to a plain sequence owned by the parent.
+            cursor.execute(f"ALTER TABLE {quote(LEGACY)} ALTER COLUMN id DROP IDENTITY")
+            sequence = quote(f"{TABLE}_id_seq")
+            cursor.execute(f"CREATE SEQUENCE {sequence} START WITH {int(next_id)}")
+        else:
+            cursor.execute(f"ALTER TABLE {quote(LEGACY)} ALTER COLUMN id DROP DEFAULT")
+
+        cursor.execute(
+            f"CREATE TABLE {quote(TABLE)} (LIKE {quote(LEGACY)} INCLUDING DEFAULTS INCLUDING STORAGE) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {quote(TABLE)}.id")
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(TABLE + '_pkey')} PRIMARY KEY (id, created_at)")
+
+        # Keep Django's index names on the parent so later migrations find them.
+        for name, definition in indexes:
+            legacy_name = f"{name[:56]}_legacy"
+            cursor.execute(f"ALTER INDEX {quote(name)} RENAME TO {quote(legacy_name)}")
+            cursor.execute(
+                f"CREATE INDEX {quote(name)} ON ONLY {quote(TABLE)} USING {definition.split(' USING ', 1)[1]}"
+            )
+
+        # Matching legacy indexes are attached to the parent's, not rebuilt.
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(LEGACY)} FOR VALUES FROM (MINVALUE) TO (%s)",
+            [boundary],
+        )
+        cursor.execute(f"ALTER TABLE {quote(LEGACY)} DROP CONSTRAINT {quote(BOUND_CONSTRAINT)}")
+
+    create_partitions(connection, months_ahead, now)
+    return True
@@ -0,0 +1,64 @@
+"""
+PostgreSQL backend that borrows connections from ``bankingapp.db_pool``.
+
+Selected by ``DATABASE_POOL=internal``; settings also set ``CONN_MAX_AGE = 0``
+so Django "closes", i.e. returns, the connection at the end of every request.
+Pool sizing comes from the ``POOL`` key of the database settings.
+"""
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from bankingapp.db_pool import ConnectionPool, PoolTimeout, get_pool, pools
+
+
+def _check(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return True
+    except base.Database.Error:
+        return False
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def pool(self, conn_params):
+        options = self.settings_dict.get("POOL", {})
+        return get_pool(self.alias, lambda: ConnectionPool(
+            self.alias,
+            connect=lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            close=lambda connection: connection.close(),
+            check=_check,
+            **options,
+        ))
+
+    def get_new_connection(self, conn_params):
+        # Normally set while connecting; a pooled connection skips that step.
+        self.isolation_level = base.IsolationLevel(
+            self.settings_dict["OPTIONS"].get("isolation_level", base.IsolationLevel.READ_COMMITTED)
+        )
+        try:
+            return self.pool(conn_params).getconn()
+        except PoolTimeout as e:
+            raise base.Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = pools[self.alias]
+        with self.wrap_database_errors:
+            pool.putconn(self.connection, discard=not self._reset_for_reuse(self.connection))
+
+    @staticmethod
+    def _reset_for_reuse(connection):
+        """Roll back anything left open; returns False if the connection cannot be reused."""
+        if connection.closed:
+            return False
+        status = connection.info.transaction_status
+        if status in (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR):
+            try:
+                connection.rollback()
+            except base.Database.Error:
+                return False
+            status = connection.info.transaction_status
+        return status == extensions.TRANSACTION_STATUS_IDLE
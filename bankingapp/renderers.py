@@ -0,0 +1,42 @@
+"""
+orjson-backed JSON renderer, enabled with ``JSON_BACKEND=orjson``.
+
+orjson encodes large pages several times faster than the stdlib encoder DRF
+uses. Decimals are written as exact strings ("70.00") rather than floats, and
+datetimes are encoded natively in RFC 3339 with a ``Z`` suffix for UTC. Types
+orjson does not know (lazy translation strings, timedeltas, querysets, ...)
+fall back to DRF's encoder.
+"""
+
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    raise ImproperlyConfigured("JSON_BACKEND=orjson requires the orjson package (pip install orjson).")
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_fallback = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    return _fallback.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        option = OPTIONS
+        # orjson only pretty-prints with two spaces; any requested indent gets that.
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
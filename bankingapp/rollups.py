@@ -0,0 +1,182 @@
+"""
+Daily and monthly per-account rollups of the Transaction ledger.
+
+``update_rollups`` folds transactions into TransactionRollup in batches,
+oldest first, advancing the RollupMark high-water mark in the same database
+transaction as the rollup rows it wrote, so an interrupted run resumes without
+double counting. The money-moving views are not touched: a rollup row per
+account and day would be a second hot row for every transfer.
+
+``summary()`` reads the rollup rows for the requested periods plus the tail of
+the account's transactions newer than the mark, so results are current while
+costing O(periods + tail) rather than O(history).
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import history, ledger
+from .models import RollupMark, Transaction, TransactionRollup
+
+MARK_NAME = "transaction_rollup"
+ZERO = Decimal("0.00")
+
+
+def _flows(rows, account_id=None):
+    """
+    Aggregate ``rows`` into ``{(account_id, period, period_start, type):
+    [inflow, outflow, count]}`` for both day and month periods.
+    """
+    received = rows.filter(receiver_id__isnull=False)
+    sent = rows.filter(sender_id__isnull=False)
+    if account_id is not None:
+        received = received.filter(receiver_id=account_id)
+        sent = sent.filter(sender_id=account_id)
+
+    flows = defaultdict(lambda: [ZERO, ZERO, 0])
+
+    def add(account, day, transaction_type, inflow, outflow, count):
+        for period, period_start in ((TransactionRollup.DAY, day), (TransactionRollup.MONTH, day.replace(day=1))):
+            flow = flows[account, period, period_start, transaction_type]
+            flow[0] += inflow
+            flow[1] += outflow
+            flow[2] += count
+
+    # A transfer to oneself is both an inflow and an outflow but one transaction.
+    not_to_self = Q(sender_id__isnull=True) | ~Q(sender_id=F("receiver_id"))
+    for account, day, transaction_type, total, count in (
+        received.annotate(day=TruncDate("created_at"))
+        .values_list("receiver_id", "day", "transaction_type")
+        .annotate(total=Sum("amount"), count=Count("id", filter=not_to_self))
+        .order_by()
+    ):
+        add(account, day, transaction_type, total, ZERO, count)
+    for account, day, transaction_type, total, count in (
+        sent.annotate(day=TruncDate("created_at"))
+        .values_list("sender_id", "day", "transaction_type")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by()
+    ):
+        add(account, day, transaction_type, ZERO, total, count)
+    return flows
+
+
+def _mark(row):
+    return (row.through_created_at, row.through_id) if row and row.through_id is not None else None
+
+
+def current_mark():
+    return _mark(RollupMark.objects.filter(name=MARK_NAME).first())
+
+
+def fold_batch(batch_size, lag):
+    """
+    Fold up to ``batch_size`` more transactions. Returns how many rollup rows
+    were written, or ``None`` once there is nothing left to fold.
+    """
+    return ledger.run_with_retry(_fold_batch, batch_size, lag)
+
+
+def _fold_batch(batch_size, lag):
+    mark_row, _ = RollupMark.objects.select_for_update().get_or_create(name=MARK_NAME)
+    start = _mark(mark_row)
+
+    # Rows younger than ``lag`` may still be committing with an older created_at.
+    pending = Transaction.objects.filter(created_at__lte=timezone.now() - timedelta(seconds=lag))
+    if start is not None:
+        pending = pending.filter(history.after(*start))
+    oldest_first = pending.order_by("created_at", "id").values_list("created_at", "id")
+    end = oldest_first[batch_size - 1:batch_size].first() or pending.order_by(
+        *history.NEWEST_FIRST
+    ).values_list("created_at", "id").first()
+    if end is None:
+        return None
+
+    flows = _flows(history.window(start, end))
+    existing = {
+        (row.account_id, row.period, row.period_start, row.transaction_type): row
+        for row in TransactionRollup.objects.select_for_update().filter(
+            account_id__in={key[0] for key in flows},
+            period_start__in={key[2] for key in flows},
+        )
+    }
+    updated = []
+    for key, (inflow, outflow, count) in flows.items():
+        row = existing.get(key) or TransactionRollup(
+            account_id=key[0], period=key[1], period_start=key[2], transaction_type=key[3]
+        )
+        row.inflow = (row.inflow + inflow).quantize(ZERO)
+        row.outflow = (row.outflow + outflow).quantize(ZERO)
+        row.count += count
+        updated.append(row)
+    TransactionRollup.objects.bulk_create(
+        updated,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["account", "period", "period_start", "transaction_type"],
+        update_fields=["inflow", "outflow", "count"],
+    )
+
+    mark_row.through_created_at, mark_row.through_id = end
+    mark_row.save(update_fields=["through_created_at", "through_id"])
+    return len(updated)
+
+
+def _period_start(day, period):
+    return day.replace(day=1) if period == TransactionRollup.MONTH else day
+
+
+def summary(account_id, period, start=None, end=None):
+    """
+    Return ``[{"period_start", "transaction_type", "inflow", "outflow",
+    "count"}]`` for ``start <= day < end`` (dates; either may be ``None``),
+    oldest first.
+    """
+    if start is not None:
+        start = _period_start(start, period)
+    for _ in range(3):
+        mark = current_mark()
+        rows = TransactionRollup.objects.filter(account_id=account_id, period=period)
+        if start is not None:
+            rows = rows.filter(period_start__gte=start)
+        if end is not None:
+            rows = rows.filter(period_start__lt=end)
+        totals = {
+            (period_start, transaction_type): [inflow, outflow, count]
+            for period_start, transaction_type, inflow, outflow, count in rows.values_list(
+                "period_start", "transaction_type", "inflow", "outflow", "count"
+            )
+        }
+        tail = Transaction.objects.all()
+        if mark is not None:
+            tail = tail.filter(history.after(*mark))
+        flows = _flows(tail, account_id)
+        # The mark moved while we read: the tail may overlap the rollups.
+        if current_mark() == mark:
+            break
+
+    for (_, flow_period, period_start, transaction_type), (inflow, outflow, count) in flows.items():
+        if flow_period != period:
+            continue
+        if (start is not None and period_start < start) or (end is not None and period_start >= end):
+            continue
+        total = totals.setdefault((period_start, transaction_type), [ZERO, ZERO, 0])
+        total[0] += inflow
+        total[1] += outflow
+        total[2] += count
+
+    return [
+        {
+            "period_start": period_start,
+            "transaction_type": transaction_type,
+            "inflow": str(inflow.quantize(ZERO)),
+            "outflow": str(outflow.quantize(ZERO)),
+            "count": count,
+        }
+        for (period_start, transaction_type), (inflow, outflow, count) in sorted(totals.items())
+    ]
@@ -0,0 +1,94 @@
+"""
+Read-replica routing.
+
+With ``DATABASE_REPLICA_URLS`` set, settings add ``replica1``, ``replica2``,
+... aliases and install ``ReplicaRouter``. Only handlers decorated with
+``@replica_reads`` (the account list and the viewset reads) send their queries
+to a replica; everything else, including ``select_for_update()`` reads, which
+Django routes as writes, stays on ``default``.
+
+A user who has just moved money is pinned to the primary for
+``REPLICA_PIN_SECONDS`` (``@pins_primary``) so they never read a balance
+older than their own write. Pins live in the default cache, which must be
+shared between workers for the pin to follow the user: with replicas
+configured, startup fails unless ``CACHE_URL`` points at one (e.g. Redis).
+"""
+
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+PIN_KEY = "replica-pin:{}"
+
+_use_replica = ContextVar("use_replica", default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+
+def check_pin_cache():
+    """Raise ImproperlyConfigured if pins would not be seen by other workers."""
+    if isinstance(caches["default"], (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            "DATABASE_REPLICA_URLS requires a cache shared between workers for primary pins; "
+            "set CACHE_URL (e.g. redis://localhost:6379/0)."
+        )
+
+
+def pin_to_primary(user_id):
+    cache.set(PIN_KEY.format(user_id), True, getattr(settings, "REPLICA_PIN_SECONDS", 10))
+
+
+def is_pinned(user_id):
+    return cache.get(PIN_KEY.format(user_id), False)
+
+
+def replica_reads(handler):
+    """Decorate a read-only view handler so its queries go to a replica unless the user is pinned."""
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        if not replica_aliases() or is_pinned(request.user.id):
+            return handler(self, request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            return handler(self, request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+def pins_primary(handler):
+    """Decorate a write handler so a successful request pins the user to the primary."""
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        response = handler(self, request, *args, **kwargs)
+        if response.status_code < 400 and request.user.is_authenticated:
+            pin_to_primary(request.user.id)
+        return response
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            aliases = replica_aliases()
+            if aliases:
+                return random.choice(aliases)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
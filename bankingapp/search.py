@@ -0,0 +1,188 @@
+"""
+Full-text search over Transaction descriptions.
+
+Searches are scoped to the caller's accounts before the text is matched, so
+one user's search never walks every matching row in the table, and a popular
+word costs no more than a rare one.
+
+PostgreSQL
+    Two multicolumn GIN indexes (btree_gin) on ``(sender_id, to_tsvector(
+    'english', coalesce(description, '')))`` and the same with
+    ``receiver_id``, built by ``install_postgresql``. The query is a UNION of
+    one branch per side, each matching the caller's account ids AND
+    ``websearch_to_tsquery`` (so quoted phrases, ``or`` and ``-word`` work)
+    in a single bitmap scan of its index, the way FTS5 intersects the two
+    columns below. Results are ranked with ``ts_rank``. The extension is
+    created by the migration; it is trusted, so the database owner may do
+    so without superuser rights.
+
+SQLite
+    A contentless FTS5 table, ``bankingapp_transaction_fts``, with porter
+    stemming, indexing the description and an ``accounts`` column holding
+    ``a<sender id> a<receiver id>``. Its insert, update and delete triggers
+    on the Transaction table keep it in sync, and they fire again when an
+    account deletion nulls a sender or receiver. The query matches the
+    caller's account tokens AND the words, so FTS5 intersects the two
+    posting lists inside the index. Results are ranked with ``bm25`` on the
+    description only. Rebuilding the Transaction table in a later migration
+    drops its triggers, so ``post_migrate`` recreates them and reindexes
+    (``install_sqlite``).
+
+Searches run on the database the router picks for Transaction reads, so
+they follow ``@replica_reads``; the matched rows are read from the same one.
+
+Months moved to the archive (bankingapp/archive.py) are not searched.
+"""
+
+import re
+
+from django.db import connections, router
+
+from . import indexes
+from .history import ROW_FIELDS
+from .models import Transaction
+
+TABLE = Transaction._meta.db_table
+FTS_TABLE = f"{TABLE}_fts"
+# The whole-table GIN index older databases have until migration 0022 drops it.
+INDEX = f"{TABLE}_search"
+# Index name -> the account column it leads with.
+ACCOUNT_INDEXES = {f"{TABLE}_sender_search": "sender_id", f"{TABLE}_receiver_search": "receiver_id"}
+VECTOR = "to_tsvector('english'::regconfig, COALESCE(description, ''::text))"
+MAX_TERMS = 16
+# ROW_FIELDS plus the description that matched.
+SEARCH_FIELDS = ROW_FIELDS + ("description",)
+
+# The ``accounts`` column of a Transaction row: one token per account.
+ACCOUNTS = "trim(coalesce('a' || {row}.sender_id, '') || ' ' || coalesce('a' || {row}.receiver_id, ''))"
+NEW_ACCOUNTS = ACCOUNTS.format(row="new")
+OLD_ACCOUNTS = ACCOUNTS.format(row="old")
+
+# A contentless table can only delete a row given the values it was indexed with.
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, description, accounts) VALUES (new.id, new.description, {NEW_ACCOUNTS});
+        END""",
+    f"{FTS_TABLE}_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, description, accounts)
+            VALUES ('delete', old.id, old.description, {OLD_ACCOUNTS});
+        END""",
+    f"{FTS_TABLE}_update": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+        AFTER UPDATE OF description, sender_id, receiver_id ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, description, accounts)
+            VALUES ('delete', old.id, old.description, {OLD_ACCOUNTS});
+            INSERT INTO {FTS_TABLE} (rowid, description, accounts) VALUES (new.id, new.description, {NEW_ACCOUNTS});
+        END""",
+}
+
+def terms(query):
+    """The words of ``query``, lowercased; punctuation and FTS syntax are dropped."""
+    return re.findall(r"\w+", query.lower())[:MAX_TERMS]
+
+
+def install_sqlite(db):
+    """Create the FTS5 table and its triggers if missing; reindex when any trigger was missing."""
+    with db.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"description, accounts, content='', tokenize='porter unicode61')"
+        )
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [TABLE]
+        )
+        existing = {name for name, in cursor.fetchall()}
+        if existing.issuperset(SQLITE_TRIGGERS):
+            return
+        for sql in SQLITE_TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('delete-all')")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, description, accounts) "
+            f"SELECT id, description, {ACCOUNTS.format(row=TABLE)} FROM {TABLE}"
+        )
+
+
+def uninstall_sqlite(db):
+    with db.cursor() as cursor:
+        for name in SQLITE_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def install_postgresql(db):
+    """Build the account search indexes without blocking writes; must run outside a transaction."""
+    with db.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    for name, column in ACCOUNT_INDEXES.items():
+        indexes.create(db, TABLE, name, f"gin ({db.ops.quote_name(column)}, ({VECTOR}))")
+
+
+def uninstall_postgresql(db):
+    for name in (INDEX, *ACCOUNT_INDEXES):
+        indexes.drop(db, name)
+
+
+def _postgresql_ids(cursor, account_ids, query, limit, offset):
+    branch = f"""
+        SELECT id, created_at, ts_rank({VECTOR}, query) AS rank
+        FROM {TABLE}, websearch_to_tsquery('english', %s) query
+        WHERE {{column}} = ANY(%s) AND {VECTOR} @@ query
+    """
+    cursor.execute(
+        f"""
+        SELECT id, rank FROM (
+            {branch.format(column="sender_id")}
+            UNION
+            {branch.format(column="receiver_id")}
+        ) matches
+        ORDER BY rank DESC, created_at DESC, id DESC
+        LIMIT %s OFFSET %s
+        """,
+        [query, account_ids, query, account_ids, limit, offset],
+    )
+    return [pk for pk, _ in cursor.fetchall()]
+
+
+def _sqlite_ids(cursor, account_ids, query, limit, offset):
+    words = terms(query)
+    if not words:
+        return []
+    # Every word and account quoted, so user input is never parsed as FTS5 syntax.
+    accounts = " OR ".join(f'"a{int(pk)}"' for pk in account_ids)
+    text = " ".join(f'"{word}"' for word in words)
+    match = f"accounts : ({accounts}) AND description : ({text})"
+    cursor.execute(
+        f"""
+        SELECT t.id
+        FROM {FTS_TABLE} JOIN {TABLE} t ON t.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s
+        ORDER BY bm25({FTS_TABLE}, 1.0, 0.0), t.created_at DESC, t.id DESC
+        LIMIT %s OFFSET %s
+        """,
+        [match, limit, offset],
+    )
+    return [pk for pk, in cursor.fetchall()]
+
+
+def search(account_ids, query, limit, offset=0):
+    """
+    Up to ``limit`` ``SEARCH_FIELDS`` tuples of the accounts' transactions
+    whose description matches ``query``, best match first, skipping ``offset``.
+    """
+    account_ids = list(account_ids)
+    if not account_ids or not terms(query):
+        return []
+    db = connections[router.db_for_read(Transaction)]
+    with db.cursor() as cursor:
+        if db.vendor == "postgresql":
+            ids = _postgresql_ids(cursor, account_ids, query, limit, offset)
+        else:
+            ids = _sqlite_ids(cursor, account_ids, query, limit, offset)
+    rows = {
+        row[0]: row
+        for row in Transaction.objects.using(db.alias).filter(pk__in=ids).values_list(*SEARCH_FIELDS)
+    }
+    return [rows[pk] for pk in ids if pk in rows]
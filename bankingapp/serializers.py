@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .authentication import StaffClaimRefreshToken
 from .models import Customer, BankAccount, Transaction
 
 class CustomerSerializer(serializers.ModelSerializer):
@@ -11,10 +13,45 @@ class BankAccountSerializer(serializers.ModelSerializer):
         model = BankAccount
         fields = '__all__'
 
+class StaffClaimTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = StaffClaimRefreshToken
+
 class TransactionSerializer(serializers.ModelSerializer):
     sender_account = serializers.CharField(source='sender.account_number', read_only=True)
     receiver_account = serializers.CharField(source='receiver.account_number', read_only=True)
 
     class Meta:
         model = Transaction
-        fields = ['id', 'transaction_type', 'amount', 'sender_account', 'receiver_account', 'created_at']
\ No newline at end of file
+        fields = ['id', 'transaction_type', 'amount', 'sender_account', 'receiver_account', 'created_at']
+
+def transaction_rows(rows):
+    """
+    Render ``history.ROW_FIELDS`` tuples exactly as
+    ``TransactionSerializer(many=True).data`` would render the same rows.
+
+    The serializer's own amount and created_at fields do the formatting, and a
+    missing counterpart omits its key just as the serializer does.
+    """
+    fields = TransactionSerializer().fields
+    amount = fields['amount'].to_representation
+    # Look the current timezone up once per page instead of once per row.
+    fields['created_at'].timezone = fields['created_at'].default_timezone()
+    created_at = fields['created_at'].to_representation
+    data = []
+    for pk, transaction_type, value, sender_account, receiver_account, created in rows:
+        row = {'id': pk, 'transaction_type': transaction_type, 'amount': amount(value)}
+        if sender_account is not None:
+            row['sender_account'] = sender_account
+        if receiver_account is not None:
+            row['receiver_account'] = receiver_account
+        row['created_at'] = created_at(created)
+        data.append(row)
+    return data
+
+
+def search_rows(rows):
+    """``transaction_rows()`` for ``search.SEARCH_FIELDS`` tuples, with the matched description."""
+    data = transaction_rows(row[:-1] for row in rows)
+    for row, values in zip(data, rows):
+        row['description'] = values[-1]
+    return data
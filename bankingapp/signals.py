@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .account_cache import account_cache
+from .models import BankAccount
+
+
+@receiver(pre_save, sender=BankAccount)
+def invalidate_renamed_account(sender, instance, update_fields=None, **kwargs):
+    # A save can change account_number itself, so drop the old key as well.
+    if update_fields is not None and "account_number" not in update_fields:
+        return
+    if instance.pk:
+        old_number = (
+            BankAccount.objects.filter(pk=instance.pk)
+            .values_list("account_number", flat=True)
+            .first()
+        )
+        if old_number and old_number != instance.account_number:
+            account_cache.invalidate(old_number)
+
+
+@receiver(post_save, sender=BankAccount)
+@receiver(post_delete, sender=BankAccount)
+def invalidate_account(sender, instance, **kwargs):
+    account_cache.invalidate(instance.account_number)
@@ -0,0 +1,139 @@
+"""
+Monthly account statements, built from the Transaction ledger.
+
+``write_statements(lo, hi, ...)`` renders every account with a primary key in
+``[lo, hi)``. The opening balance is the ledger total before the period (two
+GROUP BY queries for the whole range); the period's rows for all accounts in
+the range then come from one UNION ALL query ordered by account and
+``(created_at, id)``, streamed from a server-side cursor, so each account's
+statement is written as soon as its last row has been read.
+
+Balances are derived from the ledger, not ``BankAccount.balance``, so direct
+balance edits (UpdateBalanceView) do not show up here; see reconcile_balances.
+Archived months are read from the archive files, and their net totals count
+towards opening balances; see bankingapp/archive.py.
+"""
+
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import F, IntegerField, Sum, Value
+from django.utils import timezone
+
+from . import archive, history
+from .models import BankAccount, Transaction
+
+ZERO = Decimal("0.00")
+ROW_FIELDS = ("account", "created_at", "id", "transaction_type", "amount", "sign", "counterpart", "description")
+
+
+def month_bounds(month):
+    """``"2024-05"`` -> aware ``(start, end)`` datetimes of that month."""
+    start = datetime.strptime(month, "%Y-%m")
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def opening_balances(lo, hi, start):
+    """Ledger balance of each account in ``[lo, hi)`` just before ``start``."""
+    through = archive.archived_through()
+    earlier = archive.live(Transaction.objects.filter(created_at__lt=start), through)
+    balances = defaultdict(lambda: ZERO)
+    if through is not None:
+        balances.update(archive.net_before(lo, hi, start))
+    for account_id, total in (
+        earlier.filter(receiver_id__gte=lo, receiver_id__lt=hi)
+        .values_list("receiver_id").annotate(total=Sum("amount")).order_by()
+    ):
+        balances[account_id] += total
+    for account_id, total in (
+        earlier.filter(sender_id__gte=lo, sender_id__lt=hi)
+        .values_list("sender_id").annotate(total=Sum("amount")).order_by()
+    ):
+        balances[account_id] -= total
+    return balances
+
+
+def period_rows(lo, hi, start, end, chunk_size=2000):
+    """Stream ``ROW_FIELDS`` tuples for every leg in the period, grouped by account, oldest first."""
+    through = archive.archived_through()
+    if through is not None and start < through:
+        return archive.statement_rows(lo, hi, start)
+    period = history.in_period(Transaction.objects.all(), start, end)
+    sent = period.filter(sender_id__gte=lo, sender_id__lt=hi).annotate(
+        account=F("sender_id"), sign=Value(-1, IntegerField()), counterpart=F("receiver__account_number"),
+    )
+    received = period.filter(receiver_id__gte=lo, receiver_id__lt=hi).annotate(
+        account=F("receiver_id"), sign=Value(1, IntegerField()), counterpart=F("sender__account_number"),
+    )
+    rows = sent.values_list(*ROW_FIELDS).order_by().union(
+        received.values_list(*ROW_FIELDS).order_by(), all=True
+    ).order_by("account", "created_at", "id")
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def _default(obj):
+    # Decimals stay exact strings; datetimes are ISO 8601.
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)
+
+
+def write_statement(path, statement):
+    # Write then rename, so a crash never leaves a truncated statement behind.
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(statement, f, indent=2, default=_default)
+    os.replace(tmp, path)
+
+
+def write_statements(lo, hi, month, output_dir):
+    """Write one JSON statement per account in ``[lo, hi)``; returns ``(accounts, rows)``."""
+    start, end = month_bounds(month)
+    accounts = dict(
+        BankAccount.objects.filter(pk__gte=lo, pk__lt=hi).values_list("pk", "account_number")
+    )
+    opening = opening_balances(lo, hi, start)
+    rows = period_rows(lo, hi, start, end)
+
+    written = count = 0
+    pending = next(rows, None)
+    for account_id in sorted(accounts):
+        # SQLite sums come back with arbitrary scale.
+        balance = opening[account_id].quantize(ZERO)
+        statement = {
+            "account_number": accounts[account_id],
+            "period_start": start,
+            "period_end": end,
+            "opening_balance": balance,
+            "closing_balance": None,
+            "totals": {},
+            "transactions": [],
+        }
+        # Rows for deleted accounts (ids with no BankAccount) are skipped.
+        while pending is not None and pending[0] < account_id:
+            pending = next(rows, None)
+        while pending is not None and pending[0] == account_id:
+            _, created_at, pk, transaction_type, amount, sign, counterpart, description = pending
+            balance += sign * amount
+            totals = statement["totals"].setdefault(transaction_type, {"in": ZERO, "out": ZERO, "count": 0})
+            totals["in" if sign > 0 else "out"] += amount
+            totals["count"] += 1
+            statement["transactions"].append({
+                "id": pk,
+                "created_at": created_at,
+                "transaction_type": transaction_type,
+                "amount": sign * amount,
+                "counterpart": counterpart,
+                "description": description,
+                "balance": balance,
+            })
+            count += 1
+            pending = next(rows, None)
+        statement["closing_balance"] = balance
+        write_statement(os.path.join(output_dir, f"{accounts[account_id]}.json"), statement)
+        written += 1
+    return written, count
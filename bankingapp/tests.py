@@ -1,3 +1,1273 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from benchmarks.run import compare, scenarios
+from benchmarks.seed import seed
+
+from . import (
+    archive, async_views, history, ledger, partitions, reconciliation, rollups, routers, search, statements,
+)
+from .account_cache import AccountCache, account_cache
+from .account_numbers import AccountNumberAllocator, allocator, is_valid, open_account
+from .authentication import StatelessJWTAuthentication, revoked_tokens
+from .dataset import explicit_timestamps
+from .db_pool import ConnectionPool, PoolTimeout
+from .metrics import registry
+from .middleware import QueryMetricsMiddleware
+from .models import (
+    AccountNumberCounter, ArchivedMonth, BalanceSlot, BankAccount, IdempotencyKey, LedgerTotal, Transaction,
+    TransactionRollup,
+)
+from .parsers import ORJSONParser
+from .renderers import ORJSONRenderer
+from .serializers import TransactionSerializer, transaction_rows
+from .views import DepositMoneyView, TransferView
+from .viewsets import TransactionViewSet
+
+
+class BankingTestCase(APITestCase):
+    """Users with funded accounts, and balance assertions."""
+
+    def setUp(self):
+        # Rolled-back tests can reuse primary keys; never serve a stale id.
+        account_cache.clear()
+
+    def make_user(self, username, password=None):
+        return User.objects.create_user(username=username, email=f"{username}@example.com", password=password)
+
+    def make_account(self, user, balance="0.00", **fields):
+        fields.setdefault("account_type", "CHECKING")
+        return open_account(user=user, balance=Decimal(balance), **fields)
+
+    def record(self, sender, receiver, amount, created_at, transaction_type="TRANSFER", description=None):
+        """A Transaction row as the ledger would write it, at ``created_at``."""
+        row = Transaction.objects.create(
+            sender=sender, receiver=receiver, amount=Decimal(amount),
+            transaction_type=transaction_type, description=description,
+        )
+        Transaction.objects.filter(pk=row.pk).update(created_at=created_at)
+        row.created_at = created_at
+        return row
+
+    def assertBalance(self, account, expected):
+        self.assertEqual(ledger.total_balance(account.pk), Decimal(expected))
+
+
+class LedgerTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.bob = self.make_user("bob")
+        self.checking = self.make_account(self.alice, "100.00")
+        self.other = self.make_account(self.bob, "5.00")
+
+    def test_transfer_moves_money_and_records_it(self):
+        posting = ledger.transfer(self.checking.account_number, self.other.account_number, "40.25", user=self.alice)
+        self.assertEqual(posting.sender_balance, Decimal("59.75"))
+        self.assertBalance(self.checking, "59.75")
+        self.assertBalance(self.other, "45.25")
+        record = Transaction.objects.get()
+        self.assertEqual(
+            (record.sender_id, record.receiver_id, record.amount, record.transaction_type),
+            (self.checking.pk, self.other.pk, Decimal("40.25"), "TRANSFER"),
+        )
+
+    def test_overdraft_is_rejected_without_side_effects(self):
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.transfer(self.checking.account_number, self.other.account_number, "100.01", user=self.alice)
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.withdraw(self.other.account_number, "5.01", user=self.bob)
+        self.assertBalance(self.checking, "100.00")
+        self.assertBalance(self.other, "5.00")
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_invalid_amounts(self):
+        for amount in ("0", "-1", "1.005", "abc", None, "NaN", "1e30", "1" * 29, "10000000000.00"):
+            with self.subTest(amount=amount), self.assertRaises(ledger.InvalidAmount):
+                ledger.deposit(self.checking.account_number, amount, user=self.alice)
+        self.assertEqual(ledger.to_amount("9999999999.99"), ledger.MAX_AMOUNT)
+        self.assertEqual(ledger.to_amount("1.500"), Decimal("1.5"))
+
+    def test_transfer_views_reject_oversized_amounts(self):
+        body = {
+            "sender_account": self.checking.account_number,
+            "receiver_account": self.other.account_number,
+            "amount": "1e30",
+        }
+        self.client.force_authenticate(self.alice)
+        response = self.client.post(reverse("send-money"), body, format="json")
+        self.assertEqual((response.status_code, response.json()), (400, {"error": "Amount cannot exceed 9999999999.99."}))
+        # TransferView is not routed; call it directly.
+        request = APIRequestFactory().post("/", body, format="json")
+        force_authenticate(request, self.alice)
+        response = TransferView.as_view()(request)
+        self.assertEqual((response.status_code, response.data), (400, {"error": "Amount cannot exceed 9999999999.99."}))
+        self.assertBalance(self.checking, "100.00")
+
+    def test_sender_must_belong_to_user(self):
+        with self.assertRaises(BankAccount.DoesNotExist):
+            ledger.transfer(self.other.account_number, self.checking.account_number, "1.00", user=self.alice)
+        self.assertBalance(self.other, "5.00")
+
+    def test_send_money_view_reports_overdraft(self):
+        self.client.force_authenticate(self.alice)
+        response = self.client.post(reverse("send-money"), {
+            "sender_account": self.checking.account_number,
+            "receiver_account": self.other.account_number,
+            "amount": "500.00",
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Insufficient balance"})
+
+    def test_deposit_and_withdraw_views(self):
+        self.client.force_authenticate(self.alice)
+        response = self.client.post(reverse("deposit-money"), {
+            "account_number": self.checking.account_number, "amount": "20.00",
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(str(response.json()["new_balance"])), Decimal("120.00"))
+        response = self.client.post(reverse("withdraw-money"), {
+            "account_number": self.checking.account_number, "amount": "120.00",
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertBalance(self.checking, "0.00")
+
+
+class BatchTransferTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.source = self.make_account(self.alice, "50.00")
+        self.target = self.make_account(self.make_user("bob"))
+        self.client.force_authenticate(self.alice)
+
+    def batch(self, mode, *amounts):
+        transfers = [
+            {"sender_account": self.source.account_number, "receiver_account": self.target.account_number, "amount": amount}
+            for amount in amounts
+        ]
+        return self.client.post(reverse("batch-transfer"), {"transfers": transfers, "mode": mode}, format="json")
+
+    def test_rejected_atomic_batch_counts_unapplied_items_separately(self):
+        response = self.batch("atomic", "10.00", "100.00", "5.00")
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertEqual((body["applied"], body["succeeded"], body["failed"], body["not_applied"]), (False, 0, 1, 2))
+        self.assertEqual([result["status"] for result in body["results"]], ["not_applied", "failed", "not_applied"])
+        self.assertBalance(self.source, "50.00")
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_best_effort_batch_applies_valid_items(self):
+        response = self.batch("best_effort", "10.00", "100.00", "40.00")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["applied"], body["succeeded"], body["failed"], body["not_applied"]), (True, 2, 1, 0))
+        self.assertBalance(self.source, "0.00")
+        self.assertBalance(self.target, "50.00")
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_unparseable_amounts_fail_only_their_item(self):
+        response = self.batch("best_effort", "10.00", "1e30", "1" * 29, "abc")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["applied"], body["succeeded"], body["failed"], body["not_applied"]), (True, 1, 3, 0))
+        self.assertEqual(body["results"][1], {"index": 1, "status": "failed", "error": "Amount cannot exceed 9999999999.99."})
+        self.assertEqual(body["results"][3]["error"], "Invalid amount.")
+        self.assertBalance(self.source, "40.00")
+
+        response = self.batch("atomic", "10.00", "1e30")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result["status"] for result in response.json()["results"]], ["not_applied", "failed"])
+
+
+class HistoryPaginationTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.account = self.make_account(self.alice)
+        other = self.make_account(self.make_user("bob"))
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.rows = []
+        for i in range(12):
+            # Pairs of rows share a timestamp, so pages must break ties on id.
+            moment = start + timedelta(hours=i // 2)
+            sender, receiver = [(self.account, other), (other, self.account), (self.account, self.account)][i % 3]
+            self.rows.append(self.record(sender, receiver, f"{i + 1}.00", moment))
+        self.record(other, other, "99.00", start)
+        self.client.force_authenticate(self.alice)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row["id"] for row in response.json()["results"]]
+            url = response.json()["next"]
+        return ids
+
+    def test_pages_walk_history_newest_first_without_gaps_or_repeats(self):
+        url = reverse("account-transactions", args=[self.account.account_number]) + "?page_size=5"
+        expected = [row.pk for row in sorted(self.rows, key=lambda row: (row.created_at, row.pk), reverse=True)]
+        self.assertEqual(self.walk(url), expected)
+
+    def test_invalid_cursor(self):
+        url = reverse("account-transactions", args=[self.account.account_number])
+        self.assertEqual(self.client.get(url, {"cursor": "not-a-cursor"}).status_code, 404)
+
+
+class ExportTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.account = self.make_account(self.alice)
+        self.other = self.make_account(self.make_user("bob"))
+        start = datetime(2024, 3, 1, tzinfo=timezone.utc)
+        self.deposit = self.record(None, self.account, "10.00", start, "DEPOSIT", "pay, day")
+        self.sent = self.record(self.account, self.other, "2.50", start + timedelta(days=40))
+        self.client.force_authenticate(self.alice)
+
+    def export(self, account, **params):
+        url = reverse("account-transactions-export", args=[account.account_number])
+        return self.client.get(url, params)
+
+    def test_csv_oldest_first(self):
+        response = self.export(self.account)
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,created_at,transaction_type,amount,sender_account,receiver_account,description")
+        self.assertEqual(lines[1], f'{self.deposit.pk},2024-03-01T00:00:00+00:00,DEPOSIT,10.00,,{self.account.account_number},"pay, day"')
+        self.assertEqual(len(lines), 3)
+
+    def test_ndjson_with_date_bounds(self):
+        response = self.export(self.account, file_type="ndjson", start="2024-04-01")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["id"] for row in rows], [self.sent.pk])
+        self.assertEqual(rows[0]["amount"], "2.50")
+
+    def test_other_users_account_and_bad_parameters(self):
+        self.assertEqual(self.export(self.other).status_code, 404)
+        self.assertEqual(self.export(self.account, file_type="xml").status_code, 400)
+        self.assertEqual(self.export(self.account, start="yesterday").status_code, 400)
+
+
+class AccountCacheTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.account = self.make_account(self.make_user("alice"))
+
+    def test_second_lookup_is_served_from_memory(self):
+        ref = account_cache.get(self.account.account_number)
+        with self.assertNumQueries(0):
+            self.assertEqual(account_cache.get(self.account.account_number), ref)
+        self.assertEqual(ref.id, self.account.pk)
+
+    def test_saves_and_deletes_invalidate(self):
+        account_cache.get(self.account.account_number)
+        old_number = self.account.account_number
+        self.account.account_number = "0000000000"
+        self.account.save()
+        with self.assertRaises(BankAccount.DoesNotExist):
+            account_cache.get(old_number)
+        account_cache.get("0000000000")
+        self.account.delete()
+        with self.assertRaises(BankAccount.DoesNotExist):
+            account_cache.get("0000000000")
+
+    def test_entries_expire_and_are_evicted_least_recently_used_first(self):
+        cache = AccountCache(max_size=1, ttl=0)
+        cache.get(self.account.account_number)
+        with self.assertNumQueries(1):
+            cache.get(self.account.account_number)
+        cache = AccountCache(max_size=1, ttl=60)
+        other = self.make_account(self.account.user)
+        cache.get(self.account.account_number)
+        cache.get(other.account_number)
+        self.assertEqual(cache.stats()["size"], 1)
+        with self.assertNumQueries(1):
+            cache.get(self.account.account_number)
+
+
+class StatelessAuthenticationTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        revoked_tokens.reset()
+        self.alice = self.make_user("alice", password="test-password")
+        response = self.client.post(reverse("signin"), {"username": "alice", "password": "test-password"}, format="json")
+        self.tokens = response.json()
+
+    def authenticate(self, access):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {access}")
+        return StatelessJWTAuthentication().authenticate(request)
+
+    def test_authenticates_from_claims_without_queries(self):
+        self.authenticate(self.tokens["access"])  # Loads the revocation list.
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(self.tokens["access"])
+        self.assertEqual(user.id, self.alice.pk)
+
+    def test_sign_out_revokes_the_access_token(self):
+        self.assertIsNotNone(self.authenticate(self.tokens["access"]))
+        response = self.client.post(
+            reverse("signout"), {"refresh_token": self.tokens["refresh"]},
+            format="json", HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}",
+        )
+        self.assertEqual(response.status_code, 200)
+        revoked_tokens.reset()  # Skip the refresh interval.
+        with self.assertRaises(InvalidToken):
+            self.authenticate(self.tokens["access"])
+
+    def test_rows_that_commit_below_the_high_water_mark_are_picked_up(self):
+        expires_at = django_timezone.now() + timedelta(hours=1)
+        outstanding = [
+            OutstandingToken.objects.create(user=self.alice, jti=f"jti-{i}", token="x", expires_at=expires_at)
+            for i in range(3)
+        ]
+        late_id = BlacklistedToken.objects.create(token=outstanding[0]).pk
+        BlacklistedToken.objects.create(token=outstanding[1])
+        BlacklistedToken.objects.filter(pk=late_id).delete()  # Not committed yet.
+        self.assertNotIn("jti-0", revoked_tokens)
+        BlacklistedToken.objects.create(pk=late_id, token=outstanding[0])
+        revoked_tokens._next_refresh = 0.0  # Skip the refresh interval.
+        self.assertIn("jti-0", revoked_tokens)
+        self.assertIn("jti-1", revoked_tokens)
+
+    def test_access_tokens_carry_the_staff_flag(self):
+        staff = User.objects.create_user(username="carol", password="test-password", is_staff=True)
+        self.assertFalse(self.authenticate(self.tokens["access"])[0].is_staff)
+        for name in ("signin", "token_obtain_pair"):
+            with self.subTest(name):
+                response = self.client.post(
+                    reverse(name), {"username": "carol", "password": "test-password"}, format="json"
+                )
+                user, _ = self.authenticate(response.json()["access"])
+                self.assertEqual(user.id, staff.pk)
+                self.assertTrue(user.is_staff)
+
+
+class PurgeExpiredTokensTests(BankingTestCase):
+    def test_deletes_only_expired_tokens_in_batches(self):
+        user = self.make_user("alice")
+        now = django_timezone.now()
+        expired = [
+            OutstandingToken.objects.create(user=user, jti=f"old-{i}", token="x", expires_at=now - timedelta(hours=2))
+            for i in range(5)
+        ]
+        current = OutstandingToken.objects.create(user=user, jti="new", token="x", expires_at=now + timedelta(hours=1))
+        BlacklistedToken.objects.create(token=expired[0])
+        BlacklistedToken.objects.create(token=current)
+
+        call_command("purge_expired_tokens", "--batch-size", "2", "--dry-run", stdout=io.StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 6)
+        call_command("purge_expired_tokens", "--batch-size", "2", stdout=io.StringIO())
+        self.assertEqual(list(OutstandingToken.objects.values_list("jti", flat=True)), ["new"])
+        self.assertEqual(BlacklistedToken.objects.get().token_id, current.pk)
+
+
+class AccountOwnershipTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.bob = self.make_user("bob")
+        self.alices = self.make_account(self.alice)
+        self.bobs = self.make_account(self.bob)
+        self.record(self.bobs, self.alices, "3.00", datetime(2024, 5, 1, tzinfo=timezone.utc))
+        self.record(None, self.bobs, "9.00", datetime(2024, 5, 2, tzinfo=timezone.utc), "DEPOSIT")
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.alice)}"}
+
+    def test_history_of_another_users_account_is_not_found(self):
+        for name in ("account-transactions", "async-account-transactions"):
+            with self.subTest(name):
+                response = self.client.get(reverse(name, args=[self.bobs.account_number]), **self.headers)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {"error": "Account not found"})
+                response = self.client.get(reverse(name, args=["0000000000"]), **self.headers)
+                self.assertEqual(response.status_code, 404)
+
+    def test_queryset_for_another_users_account_is_empty(self):
+        for number in (self.bobs.account_number, "0000000000"):
+            with self.subTest(number):
+                view = TransactionViewSet(kwargs={"accountNumber": number}, request=mock.Mock(user=self.alice))
+                self.assertFalse(view.get_queryset().exists())
+        view = TransactionViewSet(kwargs={"accountNumber": self.alices.account_number}, request=mock.Mock(user=self.alice))
+        self.assertEqual(view.get_queryset().count(), 1)
+
+    def test_async_history_matches_the_sync_view(self):
+        url_args = [self.alices.account_number]
+        sync = self.client.get(reverse("account-transactions", args=url_args), **self.headers)
+        async_ = self.client.get(reverse("async-account-transactions", args=url_args), **self.headers)
+        self.assertEqual(async_.status_code, 200)
+        self.assertEqual(async_.content, sync.content)
+        self.assertEqual(len(async_.json()["results"]), 1)
+
+    def test_async_views_require_a_token(self):
+        response = self.client.get(reverse("async-user-accounts"))
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get(reverse("async-user-accounts"), **self.headers)
+        self.assertEqual([row["account_number"] for row in response.json()], [self.alices.account_number])
+
+    def test_staff_can_read_any_account(self):
+        self.alice.is_staff = True
+        self.alice.save()
+        response = self.client.get(reverse("async-account-transactions", args=[self.bobs.account_number]), **self.headers)
+        self.assertEqual(len(response.json()["results"]), 2)
+
+
+class IdempotencyTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.account = self.make_account(self.alice, "10.00")
+        self.client.force_authenticate(self.alice)
+
+    def deposit(self, key, amount="5.00"):
+        return self.client.post(
+            reverse("deposit-money"), {"account_number": self.account.account_number, "amount": amount},
+            format="json", HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay_returns_the_stored_response_without_posting_again(self):
+        first = self.deposit("key-1")
+        replay = self.deposit("key-1")
+        self.assertEqual(replay.status_code, first.status_code)
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertBalance(self.account, "15.00")
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_key_reused_for_a_different_request(self):
+        self.deposit("key-1")
+        self.assertEqual(self.deposit("key-1", amount="6.00").status_code, 422)
+        self.assertBalance(self.account, "15.00")
+
+    def test_abandoned_in_progress_key_is_reclaimed_after_its_lease(self):
+        self.deposit("key-1")
+        # As if the worker had been killed before storing its response.
+        abandoned = IdempotencyKey.objects.filter(key="key-1")
+        abandoned.update(status_code=None, response_body=None)
+        with override_settings(IDEMPOTENCY_WAIT_SECONDS=0):
+            self.assertEqual(self.deposit("key-1").status_code, 409)
+        abandoned.update(started_at=django_timezone.now() - timedelta(seconds=121))
+        response = self.deposit("key-1")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(abandoned.get().status_code, 200)
+        self.assertBalance(self.account, "20.00")
+
+    def test_replay_is_encoded_like_the_first_response(self):
+        with mock.patch.object(DepositMoneyView, "renderer_classes", [ORJSONRenderer]):
+            first = self.deposit("key-1")
+            replay = self.deposit("key-1")
+        self.assertEqual(first.json()["new_balance"], "15.00")
+        self.assertEqual(replay.json(), first.json())
+
+    def test_keys_are_per_user(self):
+        self.deposit("key-1")
+        bob = self.make_user("bob")
+        bobs = self.make_account(bob)
+        self.client.force_authenticate(bob)
+        response = self.client.post(
+            reverse("deposit-money"), {"account_number": bobs.account_number, "amount": "5.00"},
+            format="json", HTTP_IDEMPOTENCY_KEY="key-1",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertBalance(bobs, "5.00")
+
+
+class BalanceSlotTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.merchant = self.make_account(self.alice, "1.00")
+        self.payer = self.make_account(self.make_user("bob"), "100.00")
+        call_command("shard_account", self.merchant.account_number, "--slots", "4", stdout=io.StringIO())
+
+    def pay(self, amount):
+        ledger.transfer(self.payer.account_number, self.merchant.account_number, amount)
+
+    def test_credits_land_in_slots_and_debits_sweep_them(self):
+        for _ in range(6):
+            self.pay("2.00")
+        self.merchant.refresh_from_db()
+        self.assertEqual(self.merchant.balance, Decimal("1.00"))
+        self.assertBalance(self.merchant, "13.00")
+        ledger.withdraw(self.merchant.account_number, "12.50", user=self.alice)
+        self.assertBalance(self.merchant, "0.50")
+        self.assertFalse(BalanceSlot.objects.filter(account=self.merchant, balance__gt=0).exists())
+
+    def test_resharding_keeps_every_credit(self):
+        for _ in range(8):
+            self.pay("1.25")
+        call_command("shard_account", self.merchant.account_number, "--slots", "1", stdout=io.StringIO())
+        self.assertEqual(BalanceSlot.objects.filter(account=self.merchant).count(), 1)
+        self.assertBalance(self.merchant, "11.00")
+        self.pay("1.00")
+        call_command("shard_account", self.merchant.account_number, "--slots", "0", stdout=io.StringIO())
+        self.merchant.refresh_from_db()
+        self.assertEqual((self.merchant.balance, self.merchant.balance_slots), (Decimal("12.00"), 0))
+        self.assertFalse(BalanceSlot.objects.filter(account=self.merchant).exists())
+
+    def test_slot_count_is_read_from_the_row_not_the_cache(self):
+        # Another process shards the account; this one's cache is never told.
+        account = self.make_account(self.alice, "1.00")
+        ledger.resolve_account(account.account_number)
+        BalanceSlot.objects.bulk_create([BalanceSlot(account=account, slot=0, balance=Decimal("5.00"))])
+        BankAccount.objects.filter(pk=account.pk).update(balance_slots=1)
+        ledger.withdraw(account.account_number, "6.00", user=self.alice)
+        self.assertBalance(account, "0.00")
+        ledger.transfer(self.payer.account_number, account.account_number, "2.00")
+        account.refresh_from_db()
+        self.assertEqual(account.balance, Decimal("0.00"))
+        self.assertBalance(account, "2.00")
+
+    def test_consolidate_balance_slots(self):
+        self.pay("3.00")
+        call_command("consolidate_balance_slots", stdout=io.StringIO())
+        self.merchant.refresh_from_db()
+        self.assertEqual(self.merchant.balance, Decimal("4.00"))
+
+
+class AccountNumberTests(BankingTestCase):
+    def test_numbers_are_unique_and_carry_a_check_digit(self):
+        numbers = [allocator.next() for _ in range(250)]
+        self.assertEqual(len(set(numbers)), 250)
+        self.assertTrue(all(is_valid(number) for number in numbers))
+
+    def test_rolled_back_signup_does_not_lead_to_duplicate_numbers(self):
+        first, second = AccountNumberAllocator(block_size=10), AccountNumberAllocator(block_size=10)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            first.next()
+            raise IntegrityError("signup failed")
+        numbers = [first.next(), second.next(), first.next(), second.next()]
+        self.assertEqual(len(set(numbers)), 4)
+
+    def test_signup_opens_an_account_with_a_valid_number(self):
+        self.make_user("alice")
+        response = self.client.post(reverse("signup"), {
+            "username": "bob", "email": "bob@example.com", "password": "test-password",
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        numbers = set(BankAccount.objects.values_list("account_number", flat=True))
+        self.assertEqual(len(numbers), 1)
+        self.assertTrue(all(is_valid(number) for number in numbers))
+
+
+class AccountNumberBlockTests(TransactionTestCase):
+    def test_reserved_block_survives_the_callers_rollback(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            start, end = AccountNumberAllocator(block_size=10).reserve_block()
+            raise IntegrityError("signup failed")
+        self.assertEqual(AccountNumberCounter.objects.get().next_value, end)
+        self.assertEqual(AccountNumberAllocator(block_size=10).reserve_block(), (end, end + 10))
+
+
+
+class BenchmarkSuiteTests(BankingTestCase):
+    """The endpoint benchmarks still drive working routes, and regressions are caught."""
+
+    def test_every_scenario_succeeds_against_seeded_data(self):
+        users = seed(users=3, history=10)
+        folded, mismatched = reconciliation.reconcile_range(0, 100, reconciliation.new_mark(0))
+        self.assertEqual((folded, mismatched), (3, []))
+        for name, build in scenarios(users).items():
+            with self.subTest(name):
+                method, url_name, kwargs, body, user = build(0)
+                headers = {"Authorization": f"Bearer {user['access']}"} if user else {}
+                url = reverse(url_name, kwargs=kwargs)
+                if method == "post":
+                    response = self.client.post(url, data=body, format="json", headers=headers)
+                else:
+                    response = self.client.get(url, headers=headers)
+                self.assertLess(response.status_code, 400, response.content)
+
+    def test_compare_flags_regressions(self):
+        def result(rps, p95, queries):
+            return {"throughput_rps": rps, "p95_ms": p95, "queries_per_request": queries}
+
+        baseline = {"results": {
+            "slower": result(100, 10, 3), "more-queries": result(100, 10, 3), "steady": result(100, 10, 3),
+        }}
+        current = {"results": {
+            "slower": result(80, 10, 3), "more-queries": result(100, 10, 4), "steady": result(95, 10.5, 3.4),
+            "new": result(1, 1000, 50),
+        }}
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(compare(current, baseline, threshold=10), ["slower", "more-queries"])
+
+
+class GenerateDatasetTests(TransactionTestCase):
+    # Reserves its account numbers on a connection of its own.
+
+    def generate(self, *args):
+        out = io.StringIO()
+        call_command(
+            "generate_dataset", "--users", "6", "--accounts", "10", "--transactions", "60", "--merchants", "2",
+            "--days", "30", "--workers", "1", "--batch-size", "4", *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_generates_a_consistent_dataset(self):
+        self.assertIn("Generated 6 users, 10 accounts (2 merchants) and 68 transactions", self.generate())
+        self.assertEqual((User.objects.count(), BankAccount.objects.count(), Transaction.objects.count()), (6, 10, 68))
+        numbers = list(BankAccount.objects.values_list("account_number", flat=True))
+        self.assertTrue(all(is_valid(number) for number in numbers))
+        self.assertEqual(len(set(numbers)), 10)
+        self.assertFalse(User.objects.filter(bankaccount=None).exists())
+        # Balances are the ledger totals.
+        folded, mismatched = reconciliation.reconcile_range(0, 100, reconciliation.new_mark(0))
+        self.assertEqual((folded, mismatched), (10, []))
+
+    def test_a_second_run_adds_to_existing_data(self):
+        self.generate()
+        self.generate("--seed", "1")
+        self.assertEqual((User.objects.count(), BankAccount.objects.count()), (12, 20))
+        self.assertEqual(len(set(BankAccount.objects.values_list("account_number", flat=True))), 20)
+        # New rows get ids after the generated ones.
+        self.assertGreater(open_account(user=User.objects.first(), account_type="CHECKING").pk, 20)
+
+
+class QueryMetricsTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.alice = self.make_user("alice")
+        self.account = self.make_account(self.alice)
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.alice)}"}
+
+    def test_middleware_keeps_the_asgi_chain_async(self):
+        with self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
+        middleware = QueryMetricsMiddleware(async_views.user_bank_accounts)
+        self.assertTrue(iscoroutinefunction(middleware))
+
+    @override_settings(QUERY_METRICS_SAMPLE_RATE=1.0)
+    def test_async_view_queries_are_counted(self):
+        self.client.get(reverse("async-user-accounts"), **self.headers)
+        stats = registry.routes["async-user-accounts"]
+        self.assertEqual(stats.duration.count, 1)
+        self.assertGreaterEqual(stats.queries.sum, 2)  # The user, then the accounts.
+
+    def test_queries_on_other_connections_are_counted(self):
+        middleware = QueryMetricsMiddleware(lambda request: self.query_on_another_connection())
+        middleware.sample_rate = 1.0
+        request = APIRequestFactory().get("/")
+        middleware(request)
+        self.assertEqual(registry.routes["unresolved"].queries.sum, 1)
+
+    @staticmethod
+    def query_on_another_connection():
+        # Stands in for a replica alias: a separate connection of its own.
+        replica = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            with replica.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        finally:
+            replica.close()
+        return HttpResponse()
+
+
+class ORJSONTests(TestCase):
+    def test_renderer_matches_drf_for_a_history_page(self):
+        created = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+        data = {"next": None, "results": transaction_rows([(1, "DEPOSIT", Decimal("70.00"), None, "1000000008", created)])}
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+        self.assertEqual(ORJSONRenderer().render({"amount": Decimal("0.10")}), b'{"amount":"0.10"}')
+
+    def test_parser(self):
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(b'{"amount": "1.50"}')), {"amount": "1.50"})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"amount": NaN}'))
+
+
+class TransactionRowsTests(BankingTestCase):
+    """``transaction_rows(page_values(...))`` must render exactly what TransactionSerializer does."""
+
+    def setUp(self):
+        super().setUp()
+        user = self.make_user("alice")
+        self.account = self.make_account(user)
+        other = self.make_account(user, account_type="SAVINGS")
+        closed = self.make_account(user, account_type="SAVINGS")
+        start = datetime(2024, 2, 29, 23, 59, 59, 999999, tzinfo=timezone.utc)
+        shapes = [
+            (None, self.account, "DEPOSIT", None),
+            (self.account, None, "WITHDRAWAL", ""),
+            (self.account, other, "TRANSFER", None),
+            (other, self.account, "TRANSFER", "rent"),
+            (closed, self.account, "TRANSFER", None),
+            (self.account, self.account, "TRANSFER", None),
+        ]
+        for i in range(30):
+            sender, receiver, transaction_type, description = shapes[i % len(shapes)]
+            amount = ["0.01", "1.10", "70.00", "9999999999.99"][i % 4]
+            self.record(sender, receiver, amount, start + timedelta(microseconds=i // 2), transaction_type, description)
+        # SET_NULL leaves these transfers without a sender.
+        closed.delete()
+
+    def test_every_row_shape_renders_like_the_serializer(self):
+        expected = TransactionSerializer(history.page(self.account.pk, 100), many=True).data
+        actual = transaction_rows(history.page_values(self.account.pk, 100))
+        self.assertEqual(len(actual), 30)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+        types = {row["transaction_type"] for row in actual}
+        self.assertEqual(types, {"DEPOSIT", "WITHDRAWAL", "TRANSFER"})
+        self.assertTrue(any("sender_account" not in row for row in actual))
+        self.assertTrue(any("receiver_account" not in row for row in actual))
+
+    def test_pages_match_page_by_page(self):
+        cursor = None
+        while True:
+            objects = history.page(self.account.pk, 8, cursor)
+            rows = history.page_values(self.account.pk, 8, cursor)
+            self.assertEqual(transaction_rows(rows), [dict(row) for row in TransactionSerializer(objects, many=True).data])
+            if len(rows) < 8:
+                break
+            cursor = (rows[-1][-1], rows[-1][0])
+
+
+class StatementTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.bob = self.make_user("bob")
+        self.checking = self.make_account(self.alice)
+        self.savings = self.make_account(self.alice, account_type="SAVINGS")
+        self.other = self.make_account(self.bob)
+        self.record(None, self.checking, "100.00", datetime(2024, 2, 10, tzinfo=timezone.utc), "DEPOSIT")
+        self.record(self.checking, self.other, "30.00", datetime(2024, 3, 5, tzinfo=timezone.utc), "TRANSFER", "rent")
+        self.record(self.checking, None, "20.00", datetime(2024, 3, 1, tzinfo=timezone.utc), "WITHDRAWAL")
+        self.record(self.other, self.checking, "5.50", datetime(2024, 3, 31, 23, 59, tzinfo=timezone.utc))
+        self.record(None, self.checking, "1.00", datetime(2024, 4, 1, tzinfo=timezone.utc), "DEPOSIT")
+        self.output_dir = self.enterContext(tempfile.TemporaryDirectory())
+
+    def generate(self, *args):
+        out = io.StringIO()
+        call_command("generate_statements", "2024-03", "--output-dir", self.output_dir, "--workers", "1",
+                     *args, stdout=out)
+        return out.getvalue()
+
+    def statement(self, account):
+        with open(os.path.join(self.output_dir, "2024-03", f"{account.account_number}.json")) as f:
+            return json.load(f)
+
+    def test_month_bounds(self):
+        self.assertEqual(
+            statements.month_bounds("2024-12"),
+            (datetime(2024, 12, 1, tzinfo=timezone.utc), datetime(2025, 1, 1, tzinfo=timezone.utc)),
+        )
+        with self.assertRaises(ValueError):
+            statements.month_bounds("2024-13")
+
+    def test_statement_balances_and_rows(self):
+        self.generate()
+        statement = self.statement(self.checking)
+        self.assertEqual(statement["opening_balance"], "100.00")
+        self.assertEqual(statement["closing_balance"], "55.50")
+        self.assertEqual(
+            [(row["transaction_type"], row["amount"], row["balance"]) for row in statement["transactions"]],
+            [("WITHDRAWAL", "-20.00", "80.00"), ("TRANSFER", "-30.00", "50.00"), ("TRANSFER", "5.50", "55.50")],
+        )
+        self.assertEqual(statement["transactions"][1]["counterpart"], self.other.account_number)
+        self.assertEqual(statement["transactions"][1]["description"], "rent")
+        self.assertEqual(statement["totals"]["TRANSFER"], {"in": "5.50", "out": "30.00", "count": 2})
+
+        other = self.statement(self.other)
+        self.assertEqual((other["opening_balance"], other["closing_balance"]), ("0.00", "24.50"))
+        empty = self.statement(self.savings)
+        self.assertEqual((empty["opening_balance"], empty["closing_balance"], empty["transactions"]), ("0.00", "0.00", []))
+
+    def test_rerun_resumes_from_the_checkpoint(self):
+        self.assertIn("Wrote 3 statements (5 rows)", self.generate())
+        output = self.generate()
+        self.assertIn("Resuming: 1 ranges already written, 0 to go.", output)
+        self.assertIn("Wrote 0 statements", output)
+        self.assertIn("Wrote 3 statements", self.generate("--restart"))
+
+    def test_rejects_a_bad_month(self):
+        with self.assertRaises(CommandError):
+            call_command("generate_statements", "March", "--output-dir", self.output_dir)
+
+
+class ReconciliationTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.bob = self.make_user("bob")
+        self.checking = self.make_account(self.alice)
+        self.other = self.make_account(self.bob, balance_slots=4)
+        ledger.deposit(self.checking.account_number, "100.00")
+        ledger.transfer(self.checking.account_number, self.other.account_number, "40.00")
+        ledger.withdraw(self.other.account_number, "15.00")
+        Transaction.objects.update(created_at=django_timezone.now() - timedelta(hours=1))
+
+    def reconcile(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("reconcile_balances", "--workers", "1", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_folds_the_ledger_into_totals(self):
+        out, _ = self.reconcile("--lag", "0")
+        self.assertIn("Folded 2 accounts", out)
+        self.assertIn("no discrepancies", out)
+        totals = dict(LedgerTotal.objects.values_list("account_id", "total"))
+        self.assertEqual(totals, {self.checking.pk: Decimal("60.00"), self.other.pk: Decimal("25.00")})
+        newest = Transaction.objects.order_by(*history.NEWEST_FIRST).first()
+        self.assertEqual(LedgerTotal.objects.get(pk=self.checking.pk).through_id, newest.pk)
+
+    def test_later_runs_fold_only_new_transactions(self):
+        self.reconcile("--lag", "0")
+        ledger.transfer(self.other.account_number, self.checking.account_number, "5.00")
+        # Too new to fold: it is only counted in the tail, and still matches.
+        out, _ = self.reconcile("--lag", "600")
+        self.assertIn("Folded 0 accounts", out)
+        self.assertEqual(LedgerTotal.objects.get(pk=self.checking.pk).total, Decimal("60.00"))
+
+        out, _ = self.reconcile("--lag", "0")
+        self.assertIn("Folded 2 accounts", out)
+        self.assertIn("no discrepancies", out)
+        self.assertEqual(LedgerTotal.objects.get(pk=self.checking.pk).total, Decimal("65.00"))
+        self.assertEqual(LedgerTotal.objects.get(pk=self.other.pk).total, Decimal("20.00"))
+
+    def test_reports_balances_that_disagree_with_the_ledger(self):
+        BankAccount.objects.filter(pk=self.checking.pk).update(balance=Decimal("61.00"))
+        report = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "report.csv")
+        _, err = self.reconcile("--lag", "0", "--report", report)
+        self.assertIn("1 discrepancies", err)
+        with open(report) as f:
+            self.assertEqual(f.read().splitlines()[1], f"{self.checking.account_number},61.00,60.00,1.00")
+        with self.assertRaises(SystemExit):
+            self.reconcile("--lag", "0", "--report", report, "--fail-on-discrepancy")
+
+
+class RollupTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.bob = self.make_user("bob")
+        self.checking = self.make_account(self.alice)
+        self.other = self.make_account(self.bob)
+        self.record(None, self.checking, "100.00", datetime(2024, 3, 1, 9, tzinfo=timezone.utc), "DEPOSIT")
+        self.record(self.checking, self.other, "30.00", datetime(2024, 3, 1, 10, tzinfo=timezone.utc))
+        self.record(self.checking, self.checking, "7.00", datetime(2024, 3, 15, tzinfo=timezone.utc))
+        self.record(self.other, self.checking, "2.50", datetime(2024, 4, 2, tzinfo=timezone.utc))
+        self.record(self.checking, None, "10.00", datetime(2024, 4, 3, tzinfo=timezone.utc), "WITHDRAWAL")
+
+    def summary(self, account, **params):
+        self.client.force_authenticate(self.alice)
+        return self.client.get(reverse("account-summary", args=[account.account_number]), params)
+
+    def test_update_rollups_folds_in_batches(self):
+        out = io.StringIO()
+        call_command("update_rollups", "--batch-size", "2", "--lag", "0", stdout=out)
+        self.assertIn("in 3 batches", out.getvalue())
+        self.assertEqual(rollups.current_mark()[1], Transaction.objects.order_by(*history.NEWEST_FIRST).first().pk)
+        march = TransactionRollup.objects.get(
+            account=self.checking, period=TransactionRollup.MONTH, period_start=date(2024, 3, 1), transaction_type="TRANSFER",
+        )
+        self.assertEqual((march.inflow, march.outflow, march.count), (Decimal("7.00"), Decimal("37.00"), 2))
+
+        call_command("update_rollups", "--lag", "0", stdout=out)
+        self.assertEqual(march.count, TransactionRollup.objects.get(pk=march.pk).count)
+
+    def test_summary_is_the_same_before_and_after_folding(self):
+        expected = [
+            {"period_start": "2024-03-01", "transaction_type": "DEPOSIT", "inflow": "100.00", "outflow": "0.00", "count": 1},
+            {"period_start": "2024-03-01", "transaction_type": "TRANSFER", "inflow": "7.00", "outflow": "37.00", "count": 2},
+            {"period_start": "2024-04-01", "transaction_type": "TRANSFER", "inflow": "2.50", "outflow": "0.00", "count": 1},
+            {"period_start": "2024-04-01", "transaction_type": "WITHDRAWAL", "inflow": "0.00", "outflow": "10.00", "count": 1},
+        ]
+        self.assertEqual(self.summary(self.checking).json()["results"], expected)
+        # Fold part of the history, so the rest comes from the tail.
+        rollups.fold_batch(3, 0)
+        self.assertEqual(self.summary(self.checking).json()["results"], expected)
+        call_command("update_rollups", "--lag", "0", stdout=io.StringIO())
+        self.assertEqual(self.summary(self.checking).json()["results"], expected)
+
+        days = self.summary(self.checking, period="day", start="2024-03-01", end="2024-03-01").json()["results"]
+        self.assertEqual([(row["transaction_type"], row["count"]) for row in days], [("DEPOSIT", 1), ("TRANSFER", 1)])
+
+    def test_summary_rejects_bad_parameters_and_other_accounts(self):
+        self.assertEqual(self.summary(self.checking, period="week").status_code, 400)
+        self.assertEqual(self.summary(self.checking, start="soon").status_code, 400)
+        self.assertEqual(self.summary(self.other).status_code, 404)
+
+
+class ReplicaRoutingTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = self.make_user("alice")
+        self.factory = APIRequestFactory()
+
+    def read(self):
+        class View:
+            @routers.replica_reads
+            def get(self, request):
+                return routers.ReplicaRouter().db_for_read(BankAccount)
+
+        request = self.factory.get("/")
+        request.user = self.user
+        return View().get(request)
+
+    def test_reads_go_to_a_replica_until_the_user_moves_money(self):
+        self.assertEqual(self.read(), "default")
+        with mock.patch.object(routers, "replica_aliases", return_value=["replica1"]):
+            self.assertEqual(self.read(), "replica1")
+
+            class View:
+                @routers.pins_primary
+                def post(self, request):
+                    return HttpResponse(status=201)
+
+            request = self.factory.post("/")
+            request.user = self.user
+            View().post(request)
+            self.assertTrue(routers.is_pinned(self.user.id))
+            self.assertEqual(self.read(), "default")
+        self.assertEqual(routers.ReplicaRouter().db_for_write(BankAccount), "default")
+
+    def test_replicas_require_a_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            routers.check_pin_cache()
+        dummy = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+        with override_settings(CACHES=dummy), self.assertRaises(ImproperlyConfigured):
+            routers.check_pin_cache()
+        shared = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "cache"}}
+        with override_settings(CACHES=shared):
+            routers.check_pin_cache()
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def make_pool(self, **options):
+        self.closed = []
+        opened = iter(range(1, 100))
+        return ConnectionPool("test", connect=lambda: next(opened), close=self.closed.append, **options)
+
+    def test_reuses_the_most_recently_returned_connection(self):
+        pool = self.make_pool()
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first)
+        pool.putconn(second)
+        self.assertEqual(pool.getconn(), second)
+        stats = pool.stats()
+        self.assertEqual((stats["size"], stats["idle"], stats["in_use"]), (2, 1, 1))
+        self.assertEqual((stats["opened"], stats["checkouts"]), (2, 3))
+
+    def test_waits_for_a_free_connection_then_times_out(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        conn = pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+
+        timer = threading.Timer(0.01, pool.putconn, [conn])
+        timer.start()
+        pool.timeout = 5
+        self.assertEqual(pool.getconn(), conn)
+        timer.join()
+        stats = pool.stats()
+        self.assertEqual((stats["waits"], stats["timeouts"], stats["opened"]), (2, 1, 1))
+
+    def test_failed_connect_frees_its_slot(self):
+        pool = ConnectionPool("test", connect=mock.Mock(side_effect=[OSError, "conn"]), close=None, max_size=1)
+        with self.assertRaises(OSError):
+            pool.getconn()
+        self.assertEqual(pool.getconn(), "conn")
+
+    def test_discards_dead_and_idle_connections(self):
+        pool = self.make_pool(check=lambda conn: conn != 1, check_after=0)
+        first = pool.getconn()
+        pool.putconn(first)
+        # The idle connection fails its check, so a new one is opened.
+        self.assertEqual(pool.getconn(), 2)
+        self.assertEqual(self.closed, [1])
+        self.assertEqual(pool.stats()["discarded"], 1)
+
+        pool = self.make_pool(min_size=1, max_idle=0)
+        conns = [pool.getconn() for _ in range(3)]
+        for conn in conns:
+            pool.putconn(conn)
+        # Only the newest idle connection is kept, down to min_size.
+        self.assertEqual(self.closed, [1, 2])
+        self.assertEqual(pool.stats()["size"], 1)
+
+
+class PartitionTests(SimpleTestCase):
+    def test_month_arithmetic(self):
+        self.assertEqual(
+            partitions.month_start(datetime(2024, 2, 29, 23, 59, tzinfo=timezone.utc)),
+            datetime(2024, 2, 1, tzinfo=timezone.utc),
+        )
+        start = datetime(2024, 11, 1, tzinfo=timezone.utc)
+        self.assertEqual(partitions.add_months(start, 2), datetime(2025, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(partitions.add_months(start, -11), datetime(2023, 12, 1, tzinfo=timezone.utc))
+        self.assertEqual(partitions.add_months(start, 0), start)
+
+    def test_partition_names(self):
+        name = partitions.partition_name(datetime(2024, 3, 1, tzinfo=timezone.utc))
+        self.assertEqual(name, "bankingapp_transaction_p202403")
+        self.assertEqual(partitions.PARTITION_NAME.match(name).groups(), ("2024", "03"))
+        # The legacy partition is never matched, so it is never dropped by month.
+        self.assertIsNone(partitions.PARTITION_NAME.match(partitions.LEGACY))
+
+    def test_needs_postgresql(self):
+        self.assertFalse(partitions.is_partitioned(connections[DEFAULT_DB_ALIAS]))
+        with self.assertRaisesMessage(CommandError, "needs PostgreSQL"):
+            call_command("transaction_partitions")
+
+
+class ArchiveTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        archive.manifest.clear()
+        self.addCleanup(archive.manifest.clear)
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(TRANSACTION_ARCHIVE_DIR=self.directory, TRANSACTION_ARCHIVE_TTL=0))
+        self.alice = self.make_user("alice")
+        self.account = self.make_account(self.alice)
+        self.other = self.make_account(self.make_user("bob"))
+        for i in range(24):
+            moment = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(days=5 * i, hours=i % 2)
+            sender, receiver, transaction_type, description = [
+                (None, self.account, "DEPOSIT", "payroll"),
+                (self.account, self.other, "TRANSFER", "café ☕"),
+                (self.other, self.account, "TRANSFER", None),
+                (self.account, self.account, "TRANSFER", ""),
+                (self.account, None, "WITHDRAWAL", None),
+            ][i % 5]
+            self.record(sender, receiver, f"{i + 1}.25", moment, transaction_type, description)
+        self.client.force_authenticate(self.alice)
+
+    def history(self):
+        url = reverse("account-transactions", args=[self.account.account_number]) + "?page_size=4"
+        rows = []
+        while url:
+            response = self.client.get(url).json()
+            rows += response["results"]
+            url = response["next"]
+        return rows
+
+    def export(self, **params):
+        response = self.client.get(reverse("account-transactions-export", args=[self.account.account_number]), params)
+        return b"".join(response.streaming_content)
+
+    def statements(self, month):
+        output_dir = self.enterContext(tempfile.TemporaryDirectory())
+        call_command("generate_statements", month, "--output-dir", output_dir, "--workers", "1", stdout=io.StringIO())
+        with open(os.path.join(output_dir, month, f"{self.account.account_number}.json")) as f:
+            return json.load(f)
+
+    def views(self):
+        return (
+            self.history(),
+            self.client.get(reverse("account-transactions", args=[self.account.account_number]),
+                            {"transaction_type": "TRANSFER", "min_amount": "5"}).json(),
+            self.export(),
+            self.export(file_type="ndjson", start="2024-02-10", end="2024-03-20"),
+            self.statements("2024-02"),
+            self.statements("2024-04"),
+            self.client.get(reverse("account-summary", args=[self.account.account_number])).json(),
+        )
+
+    def archive(self, before):
+        out = io.StringIO()
+        call_command("update_rollups", "--lag", "0", stdout=out)
+        call_command("reconcile_balances", "--lag", "0", "--workers", "1", stdout=out, stderr=out)
+        call_command("archive_transactions", "--before", before, stdout=out)
+        return out.getvalue()
+
+    def test_block_round_trip(self):
+        created = datetime(2024, 2, 29, 23, 59, 59, 999999, tzinfo=timezone.utc)
+        legs = [
+            (1, created, "DEPOSIT", Decimal("9999999999.99"), 1, None, "1000000008", "payroll"),
+            (2, created, "TRANSFER", Decimal("0.01"), -1, "1000000008", "1000000016", "café ☕"),
+            (3, created, "WITHDRAWAL", Decimal("5.00"), -1, "1000000008", None, ""),
+            (4, created, "TRANSFER", Decimal("1.00"), 0, None, None, None),
+        ]
+        self.assertEqual(archive.decode_block(archive.encode_block(legs)), legs)
+
+    def test_reads_are_unchanged_by_archiving(self):
+        before = self.views()
+        output = self.archive("2024-03")
+        self.assertIn("Archived 2024-01", output)
+        self.assertIn("Archived 2024-02", output)
+        self.assertFalse(Transaction.objects.filter(created_at__lt=datetime(2024, 3, 1, tzinfo=timezone.utc)).exists())
+        self.assertEqual(sorted(os.listdir(self.directory)), [
+            "transactions-2024-01.dat", "transactions-2024-01.idx", "transactions-2024-02.dat", "transactions-2024-02.idx",
+        ])
+        self.assertEqual(self.views(), before)
+
+    def test_refuses_months_not_folded_into_rollups(self):
+        with self.assertRaisesMessage(CommandError, "run update_rollups first"):
+            call_command("archive_transactions", "--before", "2024-03", stdout=io.StringIO())
+        self.assertFalse(ArchivedMonth.objects.exists())
+
+
+class SearchTests(BankingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user("alice")
+        self.bob = self.make_user("bob")
+        self.checking = self.make_account(self.alice)
+        self.savings = self.make_account(self.alice, account_type="SAVINGS")
+        self.other = self.make_account(self.bob)
+        moment = datetime(2024, 3, 1, tzinfo=timezone.utc)
+        self.mine = self.record(None, self.checking, "1.00", moment, "DEPOSIT", "Coffee refund")
+        self.shared = self.record(self.other, self.savings, "2.00", moment, "TRANSFER", "coffee beans")
+        self.theirs = [self.record(None, self.other, "3.00", moment, "DEPOSIT", "coffee") for _ in range(5)]
+        self.record(self.checking, None, "4.00", moment, "WITHDRAWAL", "rent")
+
+    def search(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get(reverse("search-transactions"), params)
+
+    def ids(self, user, **params):
+        response = self.search(user, **params)
+        self.assertEqual(response.status_code, 200)
+        return {row["id"] for row in response.json()["results"]}
+
+    def test_results_are_scoped_to_the_caller(self):
+        self.assertEqual(self.ids(self.alice, q="coffees"), {self.mine.pk, self.shared.pk})
+        self.assertEqual(self.ids(self.bob, q="coffee"), {self.shared.pk, *(row.pk for row in self.theirs)})
+        self.assertEqual(self.ids(self.alice, q="coffee", account=self.savings.account_number), {self.shared.pk})
+        self.assertEqual(self.ids(self.alice, q='"coffee beans"'), {self.shared.pk})
+        self.assertEqual(self.search(self.alice, q="coffee", account=self.other.account_number).status_code, 404)
+        self.assertEqual(self.search(self.alice, q="  ").status_code, 400)
+
+    def test_search_runs_on_the_database_picked_by_the_router(self):
+        # "replica1" stands in for a replica; only the router can name it.
+        token = routers._use_replica.set(True)
+        try:
+            with override_settings(DATABASE_ROUTERS=["bankingapp.routers.ReplicaRouter"]), \
+                    mock.patch.object(routers, "replica_aliases", return_value=["replica1"]), \
+                    mock.patch.object(search, "connections", {"replica1": connections[DEFAULT_DB_ALIAS]}):
+                rows = search.search([self.savings.pk], "beans", 10)
+        finally:
+            routers._use_replica.reset(token)
+        self.assertEqual([row[0] for row in rows], [self.shared.pk])
+
+    def test_index_follows_changes_to_the_row(self):
+        Transaction.objects.filter(pk=self.mine.pk).update(description="Tea refund")
+        self.assertEqual(self.ids(self.alice, q="coffee"), {self.shared.pk})
+        self.assertEqual(self.ids(self.alice, q="tea"), {self.mine.pk})
+        # Deleting Bob's account nulls the sender; Alice still finds her side.
+        self.other.delete()
+        self.assertEqual(self.ids(self.alice, q="beans"), {self.shared.pk})
+        Transaction.objects.filter(pk=self.shared.pk).delete()
+        self.assertEqual(self.ids(self.alice, q="beans"), set())
+
+
+class HistoryFilterIndexTests(BankingTestCase):
+    """Every common history filter is served by an index meant for it, with the right rows."""
+
+    # (filter, query parameters, index kinds either UNION ALL branch may search)
+    CASES = [
+        ("none", {}, "created"),
+        ("date", {"start": "2024-03-01", "end": "2024-03-31"}, "created"),
+        ("type", {"transaction_type": "WITHDRAWAL"}, "type"),
+        ("type+date", {"transaction_type": "DEPOSIT", "start": "2024-06-01", "end": "2024-06-30"}, "type"),
+        # One-sided: walking the keyset index until a page fills is as good
+        # when the bound is not selective; SQLite without STAT4 always walks.
+        ("amount", {"min_amount": "9900"}, "amount|created"),
+        ("amount-range", {"min_amount": "100", "max_amount": "120"}, "amount"),
+        ("type+amount", {"transaction_type": "TRANSFER", "min_amount": "9950"}, "type|amount"),
+    ]
+    PAGE_SIZE = 50
+
+    def setUp(self):
+        super().setUp()
+        rng = random.Random(0)
+        user = self.make_user("alice")
+        self.account = self.make_account(user)
+        others = [self.make_account(user, account_type="SAVINGS") for _ in range(20)]
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        records = []
+        for i in range(6000):
+            kind = rng.random()
+            if i >= 3000:
+                sender, receiver = rng.sample(others, 2)
+                fields = {"sender": sender, "receiver": receiver, "transaction_type": "TRANSFER"}
+            elif kind < 0.2:
+                fields = {"receiver": self.account, "transaction_type": "DEPOSIT"}
+            elif kind < 0.3:
+                fields = {"sender": self.account, "transaction_type": "WITHDRAWAL"}
+            elif kind < 0.65:
+                fields = {"sender": self.account, "receiver": rng.choice(others), "transaction_type": "TRANSFER"}
+            else:
+                fields = {"sender": rng.choice(others), "receiver": self.account, "transaction_type": "TRANSFER"}
+            records.append(Transaction(
+                amount=Decimal(rng.randint(100, 1_000_000)) / 100,
+                created_at=start + timedelta(seconds=rng.randrange(366 * 24 * 3600)),
+                **fields,
+            ))
+        with explicit_timestamps(Transaction):
+            Transaction.objects.bulk_create(records, batch_size=2000)
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def index_names(self):
+        names = {"created": set(), "type": set(), "amount": set()}
+        for index in Transaction._meta.indexes:
+            if index.fields[0] in ("sender", "receiver"):
+                kind = {"-created_at": "created", "transaction_type": "type", "amount": "amount"}[index.fields[1]]
+                names[kind].add(index.name)
+        return names
+
+    def plan_indexes(self, plan):
+        """Index names searched by a SQLite or PostgreSQL plan, and whether it scans the table."""
+        used = re.findall(r"USING (?:COVERING )?INDEX (\w+)", plan)
+        used += re.findall(r"(?:Index Scan|Index Only Scan|Bitmap Index Scan)(?: Backward)? (?:using|on) (\w+)", plan)
+        full_scan = bool(re.search(r"^\W*SCAN bankingapp_transaction\b|Seq Scan on bankingapp_transaction\b", plan, re.M))
+        return used, full_scan
+
+    def walk(self, filters):
+        rows, cursor = [], None
+        while True:
+            page = history.page_values(self.account.pk, self.PAGE_SIZE + 1, cursor, filters=filters)
+            rows += page[:self.PAGE_SIZE]
+            if len(page) <= self.PAGE_SIZE:
+                return rows
+            cursor = (page[self.PAGE_SIZE - 1][-1], page[self.PAGE_SIZE - 1][0])
+
+    def test_filters_use_their_indexes(self):
+        names = self.index_names()
+        everything = self.walk(None)
+        for label, params, expected in self.CASES:
+            with self.subTest(label):
+                filters = history.HistoryFilter.from_params(params)
+                queryset = filters.apply(Transaction.objects.all()) if filters else None
+                plan = history.page_keys_queryset(self.account.pk, self.PAGE_SIZE + 1, None, queryset).explain()
+                used, full_scan = self.plan_indexes(plan)
+                allowed = set().union(*(names[kind] for kind in expected.split("|")))
+                self.assertGreaterEqual(len(used), 2, plan)
+                self.assertLessEqual(set(used), allowed, plan)
+                self.assertFalse(full_scan, plan)
+
+                wanted = [row for row in everything if filters is None or filters.matches(row[1], row[2], row[-1])]
+                self.assertTrue(wanted)
+                self.assertEqual(self.walk(filters), wanted)
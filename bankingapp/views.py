@@ -1,14 +1,30 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, BasePermission, IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.db import transaction as db_transaction
 from django.db import transaction
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from decimal import Decimal
-from .models import BankAccount, Transaction
+import csv
+import hmac
+import io
+import json
+from .models import BalanceSlot, BankAccount, Transaction
+from . import history, ledger, rollups, search
+from .account_numbers import open_account
+from .authentication import RevocableAccessToken, StaffClaimRefreshToken
+from .idempotency import idempotent
+from .metrics import registry
+from .pagination import PagePagination
+from .routers import pins_primary, replica_reads
+from .serializers import search_rows
 
 # Signup
 class SignUpView(APIView):
@@ -25,15 +41,13 @@ class SignUpView(APIView):
         if User.objects.filter(username=username).exists():
             return Response({"error": "Username already exists"}, status=status.HTTP_400_BAD_REQUEST)
 
-        user = User.objects.create_user(username=username, email=email, password=password)
-        account_number = f"{user.id:06d}{BankAccount.objects.count() + 1:04d}"
-
-        BankAccount.objects.create(
-            user=user,
-            account_number=account_number,
-            account_type="CHECKING",
-            balance=0.00,
-        )
+        with db_transaction.atomic():
+            user = User.objects.create_user(username=username, email=email, password=password)
+            open_account(
+                user=user,
+                account_type="CHECKING",
+                balance=0.00,
+            )
 
         return Response({"message": "User and bank account created successfully"}, status=status.HTTP_201_CREATED)
 
@@ -47,7 +61,7 @@ class SignInView(APIView):
 
         user = authenticate(username=username, password=password)
         if user:
-            refresh = RefreshToken.for_user(user)
+            refresh = StaffClaimRefreshToken.for_user(user)
             return Response({
                 "refresh": str(refresh),
                 "access": str(refresh.access_token),
@@ -66,6 +80,17 @@ class SignOutView(APIView):
 
             token = RefreshToken(refresh_token)
             token.blacklist()
+
+            # Also revoke the presented access token so stateless
+            # authentication stops accepting it once its revocation list refreshes.
+            authenticator = JWTAuthentication()
+            header = authenticator.get_header(request)
+            raw_access = authenticator.get_raw_token(header) if header else None
+            if raw_access:
+                try:
+                    RevocableAccessToken(raw_access).blacklist()
+                except TokenError:
+                    pass  # Already expired or not an access token; nothing to revoke.
             return Response({"message": "Signout successful"}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -73,9 +98,10 @@ class SignOutView(APIView):
 class UpdateBalanceView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @pins_primary
     def patch(self, request, account_id):
         try:
-            account = BankAccount.objects.get(account_number=account_id, user=request.user)
+            account = BankAccount.objects.get(account_number=account_id, user_id=request.user.id)
         except BankAccount.DoesNotExist:
             return Response({"error": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -83,8 +109,11 @@ class UpdateBalanceView(APIView):
         if new_balance is None or new_balance < 0:
             return Response({"error": "Invalid balance amount"}, status=status.HTTP_400_BAD_REQUEST)
 
-        account.balance = new_balance
-        account.save()
+        with db_transaction.atomic():
+            account.balance = new_balance
+            account.save()
+            # An outright balance also replaces anything parked in balance slots.
+            BalanceSlot.objects.filter(account=account).update(balance=Decimal("0.00"))
 
         return Response({
             "message": "Balance updated successfully",
@@ -101,21 +130,156 @@ from .models import BankAccount
 class UserBankAccountsView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @replica_reads
     def get(self, request):
-        accounts = BankAccount.objects.filter(user=request.user)
+        accounts = BankAccount.objects.filter(user_id=request.user.id).with_total_balance()
         account_data = [
             {
                 "account_number": acc.account_number,
-                "balance": acc.balance,
+                "balance": acc.total_balance,
                 "account_type": acc.account_type,
             }
             for acc in accounts
         ]
         return Response(account_data, status=status.HTTP_200_OK)
 
+class ExportTransactionsView(APIView):
+    permission_classes = [IsAuthenticated]
+    CONTENT_TYPES = {
+        "csv": "text/csv",
+        "ndjson": "application/x-ndjson",
+    }
+
+    def get(self, request, accountNumber):
+        """
+        Stream an account's full history as CSV or NDJSON, oldest first.
+
+        Query parameters: ``file_type`` (csv or ndjson, default csv) and
+        optional ``start``/``end`` dates or datetimes.
+        """
+        file_type = request.query_params.get("file_type", "csv")
+        if file_type not in self.CONTENT_TYPES:
+            return Response({"error": "file_type must be 'csv' or 'ndjson'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = history.parse_bound(request.query_params.get("start"))
+            end = history.parse_bound(request.query_params.get("end"), end=True)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        accounts = BankAccount.objects.filter(account_number=accountNumber)
+        if not request.user.is_staff:
+            accounts = accounts.filter(user_id=request.user.id)
+        account_id = accounts.values_list("pk", flat=True).first()
+        if account_id is None:
+            return Response({"error": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        rows = history.export_rows(account_id, start, end)
+        encode = self.csv_lines if file_type == "csv" else self.ndjson_lines
+        response = StreamingHttpResponse(encode(rows), content_type=self.CONTENT_TYPES[file_type])
+        response["Content-Disposition"] = f'attachment; filename="{accountNumber}-transactions.{file_type}"'
+        return response
+
+    @staticmethod
+    def csv_lines(rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def flush():
+            line = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return line
+
+        writer.writerow(["id", "created_at", "transaction_type", "amount", "sender_account", "receiver_account", "description"])
+        yield flush()
+        for pk, created_at, transaction_type, amount, sender, receiver, description in rows:
+            writer.writerow([pk, created_at.isoformat(), transaction_type, amount, sender or "", receiver or "", description or ""])
+            yield flush()
+
+    @staticmethod
+    def ndjson_lines(rows):
+        for pk, created_at, transaction_type, amount, sender, receiver, description in rows:
+            yield json.dumps({
+                "id": pk,
+                "created_at": created_at.isoformat(),
+                "transaction_type": transaction_type,
+                "amount": str(amount),
+                "sender_account": sender,
+                "receiver_account": receiver,
+                "description": description,
+            }) + "\n"
+
+
+class AccountSummaryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, accountNumber):
+        """
+        Inflow, outflow and transaction count per transaction type for each
+        day or month, read from the rollup tables.
+
+        Query parameters: ``period`` (day or month, default month) and optional
+        ``start``/``end`` dates; both bounds are whole days and inclusive.
+        """
+        period = request.query_params.get("period", "month")
+        if period not in ("day", "month"):
+            return Response({"error": "period must be 'day' or 'month'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = history.parse_bound(request.query_params.get("start"))
+            end = history.parse_bound(request.query_params.get("end"), end=True)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        accounts = BankAccount.objects.filter(account_number=accountNumber)
+        if not request.user.is_staff:
+            accounts = accounts.filter(user_id=request.user.id)
+        account_id = accounts.values_list("pk", flat=True).first()
+        if account_id is None:
+            return Response({"error": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        results = rollups.summary(
+            account_id,
+            period,
+            start.date() if start else None,
+            end.date() if end else None,
+        )
+        return Response({"account_number": accountNumber, "period": period, "results": results})
+
+
+class TransactionSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @replica_reads
+    def get(self, request):
+        """
+        Search the descriptions of the caller's transactions, best match first.
+
+        Query parameters: ``q`` (required), optional ``account`` to search a
+        single one of the caller's accounts, and ``page``/``page_size``.
+        """
+        query = request.query_params.get("q", "").strip()
+        if not search.terms(query):
+            return Response({"error": "q is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        accounts = BankAccount.objects.filter(user_id=request.user.id)
+        account_number = request.query_params.get("account")
+        if account_number:
+            accounts = accounts.filter(account_number=account_number)
+        account_ids = list(accounts.values_list("pk", flat=True))
+        if account_number and not account_ids:
+            return Response({"error": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        paginator = PagePagination()
+        offset, page_size = paginator.start(request)
+        rows = search.search(account_ids, query, page_size + 1, offset)
+        return paginator.get_paginated_response(search_rows(rows[:page_size]), len(rows) > page_size)
+
+
 class TransferView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @pins_primary
+    @idempotent
     def post(self, request):
         """
         Transfer money between two accounts.
@@ -128,39 +292,15 @@ class TransferView(APIView):
             return Response({"error": "All fields (sender_account, receiver_account, amount) are required."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            amount = Decimal(amount)
-            if amount <= 0:
-                return Response({"error": "Amount must be greater than zero."}, status=status.HTTP_400_BAD_REQUEST)
-        except:
-            return Response({"error": "Invalid amount."}, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            sender_account = BankAccount.objects.get(account_number=sender_account_number, customer__user=request.user)
-            receiver_account = BankAccount.objects.get(account_number=receiver_account_number)
-
-            if sender_account.balance < amount:
-                return Response({"error": "Insufficient balance in sender's account."}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Perform the transfer atomically
-            with db_transaction.atomic():
-                sender_account.balance -= amount
-                sender_account.save()
-
-                receiver_account.balance += amount
-                receiver_account.save()
-
-                # Record the transaction
-                Transaction.objects.create(
-                    sender=sender_account,
-                    receiver=receiver_account,
-                    amount=amount,
-                    transaction_type=Transaction.TransactionType.TRANSFER
-                )
-
+            ledger.transfer(sender_account_number, receiver_account_number, amount, user=request.user)
             return Response({"message": "Transfer successful."}, status=status.HTTP_200_OK)
 
         except BankAccount.DoesNotExist:
             return Response({"error": "Invalid sender or receiver account."}, status=status.HTTP_404_NOT_FOUND)
+        except ledger.InsufficientFunds:
+            return Response({"error": "Insufficient balance in sender's account."}, status=status.HTTP_400_BAD_REQUEST)
+        except ledger.LedgerError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -168,63 +308,81 @@ class TransferView(APIView):
 class SendMoneyView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @pins_primary
+    @idempotent
     def post(self, request):
         sender_account_number = request.data.get("sender_account")
         receiver_account_number = request.data.get("receiver_account")
         amount = request.data.get("amount")
 
         try:
-            sender_account = BankAccount.objects.get(account_number=sender_account_number, user=request.user)
-            receiver_account = BankAccount.objects.get(account_number=receiver_account_number)
+            ledger.transfer(sender_account_number, receiver_account_number, amount, user=request.user)
+            return Response({"message": "Transfer successful"})
+        except BankAccount.DoesNotExist:
+            return Response({"error": "Invalid account number"}, status=404)
+        except ledger.InsufficientFunds:
+            return Response({"error": "Insufficient balance"}, status=400)
+        except Exception as e:
+            return Response({"error": str(e)}, status=400)
 
-            if sender_account.balance < Decimal(amount):
-                return Response({"error": "Insufficient balance"}, status=400)
 
-            with db_transaction.atomic():
-                sender_account.balance -= Decimal(amount)
-                sender_account.save()
+# Batch send
+class BatchTransferView(APIView):
+    permission_classes = [IsAuthenticated]
+    MAX_TRANSFERS_PER_BATCH = 1000
 
-                receiver_account.balance += Decimal(amount)
-                receiver_account.save()
+    @pins_primary
+    @idempotent
+    def post(self, request):
+        """
+        Apply a list of transfers in one database transaction.
 
+        ``mode`` is ``"atomic"`` (default, all-or-nothing) or ``"best_effort"``
+        (apply what can be applied). Every item gets a result in ``results``.
+        """
+        transfers = request.data.get("transfers")
+        mode = request.data.get("mode", "atomic")
 
-                Transaction.objects.create(
-                    sender=sender_account,
-                    receiver=receiver_account,
-                    amount=Decimal(amount),
-                    transaction_type="TRANSFER"
-                )
+        if not isinstance(transfers, list) or not transfers:
+            return Response({"error": "transfers must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(transfers) > self.MAX_TRANSFERS_PER_BATCH:
+            return Response(
+                {"error": f"A batch can contain at most {self.MAX_TRANSFERS_PER_BATCH} transfers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if mode not in ("atomic", "best_effort"):
+            return Response({"error": "mode must be 'atomic' or 'best_effort'."}, status=status.HTTP_400_BAD_REQUEST)
 
-            return Response({"message": "Transfer successful"})
-        except BankAccount.DoesNotExist:
-            return Response({"error": "Invalid account number"}, status=404)
-        except Exception as e:
-            return Response({"error": str(e)}, status=400)
+        applied, results = ledger.batch_transfer(transfers, request.user, atomic=mode == "atomic")
+        counts = {"ok": 0, "failed": 0, "not_applied": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        return Response(
+            {
+                "applied": applied,
+                "succeeded": counts["ok"],
+                "failed": counts["failed"],
+                # Valid items of a rejected atomic batch.
+                "not_applied": counts["not_applied"],
+                "results": results,
+            },
+            status=status.HTTP_200_OK if applied else status.HTTP_400_BAD_REQUEST,
+        )
 
 
 # Deposit
 class DepositMoneyView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @pins_primary
+    @idempotent
     def post(self, request):
         account_number = request.data.get("account_number")
         amount = request.data.get("amount")
 
         try:
-            account = BankAccount.objects.get(account_number=account_number, user=request.user)
-            with db_transaction.atomic():
-                account.balance += Decimal(amount)
-                account.save()
-
-                # Create transaction record with type "DEPOSIT"
-                Transaction.objects.create(
-                    sender=None,
-                    receiver=account,
-                    amount=Decimal(amount),
-                    transaction_type="DEPOSIT"
-                )
-
-            return Response({"message": "Deposit successful", "new_balance": account.balance})
+            posting = ledger.deposit(account_number, amount, user=request.user)
+            return Response({"message": "Deposit successful", "new_balance": posting.receiver_balance})
         except BankAccount.DoesNotExist:
             return Response({"error": "Account not found"}, status=404)
         except Exception as e:
@@ -236,29 +394,19 @@ from rest_framework import status
 class WithdrawMoneyView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @pins_primary
+    @idempotent
     def post(self, request):
         account_number = request.data.get("account_number")
         amount = request.data.get("amount")
 
         try:
-            account = BankAccount.objects.get(account_number=account_number, user=request.user)
-            if account.balance < Decimal(amount):
-                return Response({"error": "Insufficient funds"}, status=400)
-
-            with transaction.atomic():
-                account.balance -= Decimal(amount)
-                account.save()
-
-                Transaction.objects.create(
-                    sender=account,
-                    receiver=None,
-                    amount=Decimal(amount),
-                    transaction_type="WITHDRAWAL"
-                )
-
-            return Response({"message": "Withdrawal successful", "new_balance": account.balance})
+            posting = ledger.withdraw(account_number, amount, user=request.user)
+            return Response({"message": "Withdrawal successful", "new_balance": posting.sender_balance})
         except BankAccount.DoesNotExist:
             return Response({"error": "Account not found"}, status=404)
+        except ledger.InsufficientFunds:
+            return Response({"error": "Insufficient funds"}, status=400)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
@@ -269,6 +417,7 @@ class CreateBankAccountView(APIView):
     permission_classes = [IsAuthenticated]
     MAX_ACCOUNTS_PER_USER = 3
 
+    @pins_primary
     def post(self, request):
         account_type = request.data.get("account_type")
         initial_balance = request.data.get("initial_balance", 0)
@@ -289,16 +438,15 @@ class CreateBankAccountView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        user_account_count = BankAccount.objects.filter(user=request.user).count()
+        user_account_count = BankAccount.objects.filter(user_id=request.user.id).count()
         if user_account_count >= self.MAX_ACCOUNTS_PER_USER:
             return Response(
                 {"error": f"Sorry, We limit 3 Accounts per User."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        account = BankAccount.objects.create(
-            user=request.user,
-            account_number=f"ACC-{request.user.id}-{user_account_count + 1}",
+        account = open_account(
+            user_id=request.user.id,
             account_type=account_type,
             balance=initial_balance,
         )
@@ -320,9 +468,10 @@ class CreateBankAccountView(APIView):
 class DeleteBankAccountView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @pins_primary
     def delete(self, request, account_id):
         try:
-            account = BankAccount.objects.get(account_number=account_id, user=request.user)
+            account = BankAccount.objects.get(account_number=account_id, user_id=request.user.id)
         except BankAccount.DoesNotExist:
             return Response({"error": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -331,3 +480,22 @@ class DeleteBankAccountView(APIView):
 # Protected Data View
 
 
+class HasMetricsToken(BasePermission):
+    """
+    Allow scrapes that send ``Authorization: Bearer <METRICS_TOKEN>``. With no
+    token configured the endpoint is only open when DEBUG is on.
+    """
+
+    def has_permission(self, request, view):
+        token = getattr(settings, "METRICS_TOKEN", "")
+        if not token:
+            return settings.DEBUG
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+
+
+class MetricsView(APIView):
+    authentication_classes = []
+    permission_classes = [HasMetricsToken]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,30 +1,79 @@
 from rest_framework import viewsets
 from .models import Customer, BankAccount, Transaction
-from .serializers import CustomerSerializer, BankAccountSerializer, TransactionSerializer
-from rest_framework import permissions
+from .serializers import CustomerSerializer, BankAccountSerializer, TransactionSerializer, transaction_rows
+from rest_framework import permissions, status
+from rest_framework.response import Response
 from django.db.models import Q
+from . import history
+from .pagination import KeysetPagination
+from .routers import replica_reads
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class ReplicaReadMixin:
+    """Serve the viewset's GET actions from a read replica; see bankingapp/routers.py."""
+
+    @replica_reads
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @replica_reads
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+class CustomerViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
 
 
-class BankAccountViewSet(viewsets.ModelViewSet):
+class BankAccountViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = BankAccount.objects.all()
     serializer_class = BankAccountSerializer
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         account_number = self.kwargs.get('accountNumber')
-        print(f"Fetching transactions for account: {account_number}")  # Debug
         if account_number:
+            account_id = history.resolve_account(account_number, self.request.user)
+            if account_id is None:
+                # Unknown or someone else's account; filtering on None would
+                # match every deposit and withdrawal (sender/receiver IS NULL).
+                return Transaction.objects.none()
             return Transaction.objects.filter(
-                Q(sender__account_number=account_number) |
-                Q(receiver__account_number=account_number)
-            ).select_related('sender', 'receiver').order_by('-created_at')
-        return Transaction.objects.none()
\ No newline at end of file
+                Q(sender_id=account_id) | Q(receiver_id=account_id)
+            ).select_related('sender', 'receiver').order_by(*history.NEWEST_FIRST)
+        return Transaction.objects.none()
+
+    @replica_reads
+    def list(self, request, *args, **kwargs):
+        """
+        One page of the account's history, newest first. Optional query
+        parameters: ``transaction_type``, ``min_amount``/``max_amount``
+        (inclusive) and ``start``/``end`` dates or datetimes.
+        """
+        try:
+            filters = history.HistoryFilter.from_params(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        account_number = self.kwargs.get('accountNumber')
+        account_id = history.resolve_account(account_number, request.user) if account_number else None
+        paginator = self.paginator
+        cursor, page_size = paginator.start(request)
+        if account_number and account_id is None:
+            return Response({"error": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
+        if account_id is None:
+            return paginator.get_paginated_response([])
+
+        # Flat tuples rendered by transaction_rows(), which matches
+        # TransactionSerializer without per-row model instances.
+        rows = history.page_values(account_id, page_size + 1, cursor, filters=filters)
+        last = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = (rows[-1][-1], rows[-1][0])
+        return paginator.get_paginated_response(transaction_rows(rows), last)
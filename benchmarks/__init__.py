@@ -0,0 +1,10 @@
+"""
+In-process load tests and microbenchmarks for the banking API.
+
+Everything runs against a throwaway test database created from the
+configured DATABASE_URL (SQLite or a local Postgres), never the real one.
+Entry points:
+
+    python -m benchmarks.run          # endpoint throughput/latency/query counts
+    python -m benchmarks.asgi_vs_wsgi # sync vs async read endpoints
+"""
@@ -0,0 +1,119 @@
+"""
+Side-by-side benchmark of the sync (WSGI) and async (ASGI) read endpoints.
+
+Runs against a throwaway test database, seeds one account with a history,
+then drives ``/api/user-accounts/`` and ``/api/user-accounts/<n>/`` through
+the sync views on a thread pool and their ``/api/async/`` twins on one event
+loop, at the same concurrency. ``--db-latency-ms`` adds a sleep to every SQL
+statement to imitate a slow or remote database, which is where async views
+are supposed to pay off.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.asgi_vs_wsgi --requests 500 --concurrency 50
+
+Note that Django 4.2's async ORM still runs each query through
+``sync_to_async`` on a single shared thread, so the async path frees the
+worker while waiting but does not run queries in parallel.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import setup_django, summarize, test_database  # noqa: E402
+
+
+def run_sync(url, headers, total, concurrency):
+    from django.db import connection
+    from django.test import Client
+
+    def one(_):
+        client = Client()
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.content
+        connection.close()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(total)))
+    return latencies, time.perf_counter() - start
+
+
+def run_async(url, headers, total, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        gate = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def one():
+            async with gate:
+                start = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                assert response.status_code == 200, response.content
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(total)))
+        return latencies, time.perf_counter() - start
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--history", type=int, default=500, help="Transactions to seed.")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from bankingapp.models import BankAccount, Transaction
+
+    def slow_query(execute, sql, params, many, context):
+        time.sleep(args.db_latency_ms / 1000)
+        return execute(sql, params, many, context)
+
+    def add_latency(sender, connection, **kwargs):
+        connection.execute_wrappers.append(slow_query)
+
+    with test_database():
+        user = User.objects.create_user("bench", password="bench-password")
+        account = BankAccount.objects.create(user=user, account_number="BENCH0001", account_type="CHECKING")
+        Transaction.objects.bulk_create(
+            Transaction(receiver=account, amount=1, transaction_type="DEPOSIT") for _ in range(args.history)
+        )
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+
+        if args.db_latency_ms:
+            connection_created.connect(add_latency)
+            for conn in connections.all():
+                conn.execute_wrappers.append(slow_query)
+
+        routes = [
+            ("/api/user-accounts/", "/api/async/user-accounts/"),
+            (f"/api/user-accounts/{account.account_number}/", f"/api/async/user-accounts/{account.account_number}/"),
+        ]
+        try:
+            for sync_url, async_url in routes:
+                for label, runner_func, url in (("wsgi", run_sync, sync_url), ("asgi", run_async, async_url)):
+                    latencies, elapsed = runner_func(url, headers, args.requests, args.concurrency)
+                    print({"endpoint": sync_url, "path": label, **summarize(latencies, elapsed)})
+        finally:
+            connection_created.disconnect(add_latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "banking.settings")
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Create the test database for the configured backend and drop it afterwards."""
+    from django.conf import settings
+    from django.test.runner import DiscoverRunner
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    database = settings.DATABASES["default"]
+    if database["ENGINE"].endswith("sqlite3") and not database.get("TEST", {}).get("NAME"):
+        # The default in-memory test database uses shared-cache table locks,
+        # which fail concurrent writers instead of making them wait.
+        database.setdefault("TEST", {})["NAME"] = os.path.join(tempfile.gettempdir(), "bankingapp-bench.sqlite3")
+    # 4xx responses are expected under load (e.g. insufficient funds); keep the output readable.
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+
+
+class QueryCounter:
+    """An execute_wrapper that counts statements per thread."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.local.count = getattr(self.local, "count", 0) + 1
+        return execute(sql, params, many, context)
+
+    def take(self):
+        count = getattr(self.local, "count", 0)
+        self.local.count = 0
+        return count
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(latencies, elapsed, errors=0, queries=None):
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+    if queries is not None:
+        summary["queries_per_request"] = round(statistics.mean(queries), 2)
+    return summary
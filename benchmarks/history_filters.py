@@ -0,0 +1,126 @@
+"""
+Benchmark for the filtered transaction history.
+
+Seeds one large account (plus background traffic from other accounts) with a
+year of deposits, withdrawals and transfers, runs ANALYZE, and for each
+common filter combination times the first page of
+``history.page_values(..., filters=...)`` and prints the indexes its plan
+searches. That each combination is served by an index meant for it, and
+returns the right rows, is asserted by HistoryFilterIndexTests in
+bankingapp/tests.py.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.history_filters --history 20000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentile, setup_django, test_database  # noqa: E402
+
+CASES = [
+    ("none", {}),
+    ("date", {"start": "2024-03-01", "end": "2024-03-31"}),
+    ("type", {"transaction_type": "WITHDRAWAL"}),
+    ("type+date", {"transaction_type": "DEPOSIT", "start": "2024-06-01", "end": "2024-06-30"}),
+    ("amount", {"min_amount": "9900"}),
+    ("amount-range", {"min_amount": "100", "max_amount": "101"}),
+    ("type+amount", {"transaction_type": "TRANSFER", "min_amount": "9950"}),
+]
+
+
+def seed_history(count, background, rng):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from bankingapp.account_numbers import open_account
+    from bankingapp.dataset import explicit_timestamps
+    from bankingapp.models import Transaction
+
+    user = User.objects.create_user("filters", password="bench-password")
+    account = open_account(user=user, account_type="CHECKING")
+    others = [open_account(user=user, account_type="SAVINGS") for _ in range(20)]
+    start = timezone.make_aware(timezone.datetime(2024, 1, 1))
+
+    def moment():
+        return start + timedelta(seconds=rng.randrange(366 * 24 * 3600))
+
+    def amount():
+        return Decimal(rng.randint(100, 1_000_000)) / 100
+
+    records = []
+    for i in range(count):
+        kind = rng.random()
+        if kind < 0.2:
+            fields = {"receiver": account, "transaction_type": "DEPOSIT"}
+        elif kind < 0.3:
+            fields = {"sender": account, "transaction_type": "WITHDRAWAL"}
+        elif kind < 0.65:
+            fields = {"sender": account, "receiver": rng.choice(others), "transaction_type": "TRANSFER"}
+        else:
+            fields = {"sender": rng.choice(others), "receiver": account, "transaction_type": "TRANSFER"}
+        records.append(Transaction(amount=amount(), created_at=moment(), **fields))
+    for i in range(background):
+        sender, receiver = rng.sample(others, 2)
+        records.append(Transaction(sender=sender, receiver=receiver, transaction_type="TRANSFER",
+                                   amount=amount(), created_at=moment()))
+    with explicit_timestamps(Transaction):
+        Transaction.objects.bulk_create(records, batch_size=2000)
+    return account.pk
+
+
+def plan_indexes(plan):
+    """Index names searched by a SQLite or PostgreSQL plan."""
+    used = re.findall(r"USING (?:COVERING )?INDEX (\w+)", plan)
+    used += re.findall(r"(?:Index Scan|Index Only Scan|Bitmap Index Scan)(?: Backward)? (?:using|on) (\w+)", plan)
+    return sorted(set(used))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--history", type=int, default=20000, help="Rows in the filtered account's history.")
+    parser.add_argument("--background", type=int, default=20000, help="Rows between other accounts.")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    from bankingapp import history
+    from bankingapp.models import Transaction
+
+    with test_database():
+        account_id = seed_history(args.history, args.background, random.Random(args.seed))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        for label, params in CASES:
+            filters = history.HistoryFilter.from_params(params)
+            queryset = filters.apply(Transaction.objects.all()) if filters else None
+            plan = history.page_keys_queryset(account_id, args.page_size + 1, None, queryset).explain()
+
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                rows = history.page_values(account_id, args.page_size + 1, None, filters=filters)
+                samples.append(time.perf_counter() - start)
+
+            print({
+                "filter": label,
+                "indexes": plan_indexes(plan),
+                "rows": len(rows),
+                "first_page_p50_ms": round(percentile(samples, 50) * 1000, 2),
+            })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Encoding cost of a large transaction history page: DRF's stdlib JSONRenderer
+against ``bankingapp.renderers.ORJSONRenderer``.
+
+Builds ``--rows`` TransactionSerializer rows in memory (no database), then
+times rendering the ``{"next", "results"}`` page with each renderer, plus a
+page of raw Decimal balances like UserBankAccountsView returns.
+
+    python -m benchmarks.json_renderers --rows 5000 --repeat 50
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentile, setup_django  # noqa: E402
+
+
+def transaction_page(rows):
+    from django.utils import timezone
+
+    from bankingapp.models import BankAccount, Transaction
+    from bankingapp.serializers import TransactionSerializer
+
+    mine = BankAccount(id=1, account_number="1000000008")
+    other = BankAccount(id=2, account_number="1000000016")
+    now = timezone.now()
+    transactions = []
+    for i in range(rows):
+        sender, receiver = (mine, other) if i % 3 else (None, mine)
+        transactions.append(Transaction(
+            id=rows - i,
+            sender=sender,
+            receiver=receiver,
+            amount=Decimal(i % 5000) + Decimal("0.25"),
+            transaction_type="TRANSFER" if sender else "DEPOSIT",
+            created_at=now - timedelta(minutes=i),
+        ))
+    return {"next": "https://bank.example/api/user-accounts/1000000008/?cursor=abc",
+            "results": TransactionSerializer(transactions, many=True).data}
+
+
+def balance_page(rows):
+    return [
+        {"account_number": f"{i:010d}", "balance": Decimal(i) + Decimal("0.10"), "account_type": "CHECKING"}
+        for i in range(rows)
+    ]
+
+
+def time_render(renderer, data, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = renderer.render(data)
+        samples.append(time.perf_counter() - start)
+    return samples, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+
+    from bankingapp.renderers import ORJSONRenderer
+
+    for name, data in (("transactions", transaction_page(args.rows)), ("balances", balance_page(args.rows))):
+        baseline = None
+        for label, renderer in (("stdlib", JSONRenderer()), ("orjson", ORJSONRenderer())):
+            samples, size = time_render(renderer, data, args.repeat)
+            p50 = percentile(samples, 50)
+            baseline = baseline or p50
+            print({
+                "page": name,
+                "renderer": label,
+                "rows": args.rows,
+                "bytes": size,
+                "p50_ms": round(p50 * 1000, 3),
+                "p95_ms": round(percentile(samples, 95) * 1000, 3),
+                "us_per_row": round(p50 * 1e6 / args.rows, 3),
+                "speedup": round(baseline / p50, 1),
+            })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Drive the real URL routes in-process and report per-endpoint throughput,
+p50/p95/p99 latency and SQL queries per request.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.run --concurrency 8 --output bench.json
+    python -m benchmarks.run --compare bench.json      # exit status 1 on regressions
+
+Results are JSON so two releases can be diffed with --compare.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import QueryCounter, setup_django, summarize, test_database
+from benchmarks.seed import PASSWORD, seed
+
+
+def scenarios(users):
+    """Each scenario maps a request index to ``(method, url name, url kwargs, body, user)``."""
+    def pick(i):
+        return users[i % len(users)]
+
+    def other(i):
+        return users[(i + 1) % len(users)]
+
+    return {
+        "signin": lambda i: ("post", "signin", {}, {"username": pick(i)["username"], "password": PASSWORD}, None),
+        "user-accounts": lambda i: ("get", "user-accounts", {}, None, pick(i)),
+        "send-money": lambda i: ("post", "send-money", {}, {
+            "sender_account": pick(i)["account_number"],
+            "receiver_account": other(i)["account_number"],
+            "amount": "1.00",
+        }, pick(i)),
+        "deposit-money": lambda i: ("post", "deposit-money", {}, {
+            "account_number": pick(i)["account_number"], "amount": "1.00",
+        }, pick(i)),
+        "withdraw-money": lambda i: ("post", "withdraw-money", {}, {
+            "account_number": pick(i)["account_number"], "amount": "1.00",
+        }, pick(i)),
+        "account-transactions": lambda i: ("get", "account-transactions", {
+            "accountNumber": pick(i)["account_number"],
+        }, None, pick(i)),
+    }
+
+
+def run_scenario(build, total, concurrency, counter):
+    from django.db import connection
+    from django.test import Client
+    from django.urls import reverse
+
+    def one(i):
+        method, name, kwargs, body, user = build(i)
+        headers = {"Authorization": f"Bearer {user['access']}"} if user else {}
+        client = Client()
+        with connection.execute_wrapper(counter):
+            counter.take()
+            start = time.perf_counter()
+            response = getattr(client, method)(
+                reverse(name, kwargs=kwargs), data=body, content_type="application/json", headers=headers
+            ) if method == "post" else client.get(reverse(name, kwargs=kwargs), headers=headers)
+            elapsed = time.perf_counter() - start
+        return elapsed, counter.take(), response.status_code >= 400
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    return summarize(
+        [latency for latency, _, _ in samples],
+        elapsed,
+        errors=sum(1 for _, _, failed in samples if failed),
+        queries=[queries for _, queries, _ in samples],
+    )
+
+
+def compare(current, baseline, threshold):
+    """Print the change per endpoint and return the names that regressed by more than ``threshold`` percent."""
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        changes = {
+            "throughput_rps": (result["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"] * 100
+            if before["throughput_rps"] else 0.0,
+            "p95_ms": (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0,
+        }
+        # Half a query of slack absorbs cache warm-up differences between runs.
+        more_queries = result.get("queries_per_request", 0) > before.get("queries_per_request", 0) + 0.5
+        regressed = changes["throughput_rps"] < -threshold or changes["p95_ms"] > threshold or more_queries
+        print(
+            f"{name:22} rps {changes['throughput_rps']:+6.1f}%  p95 {changes['p95_ms']:+6.1f}%  "
+            f"queries {before.get('queries_per_request')} -> {result.get('queries_per_request')}"
+            + ("  REGRESSION" if regressed else "")
+        )
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the banking API endpoints in-process.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--history", type=int, default=2000, help="Seeded transfers.")
+    parser.add_argument("--only", nargs="*", help="Endpoints to run (default: all).")
+    parser.add_argument("--output", help="Write results JSON here.")
+    parser.add_argument("--compare", help="Baseline results JSON to diff against.")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent change that counts as a regression.")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from django.db import connection
+
+    with test_database():
+        users = seed(users=args.users, history=args.history, rng=random.Random(0))
+        counter = QueryCounter()
+        results = {}
+        for name, build in scenarios(users).items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = run_scenario(build, args.requests, args.concurrency, counter)
+            print(json.dumps({"endpoint": name, **results[name]}))
+        report = {
+            "meta": {
+                "database": connection.vendor,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "users": args.users,
+                "history": args.history,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            "results": results,
+        }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
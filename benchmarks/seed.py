@@ -0,0 +1,59 @@
+"""Seed a realistic-looking dataset for the endpoint benchmarks."""
+
+import random
+from decimal import Decimal
+
+PASSWORD = "bench-password-1"
+
+
+def seed(users=20, history=200, opening_balance=Decimal("1000000.00"), rng=None):
+    """
+    Create ``users`` users, each with one well-funded checking account, and
+    ``history`` transfers between random pairs of them. Returns a list of
+    ``{"username", "account_number", "access"}`` dicts.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from bankingapp.account_numbers import allocator
+    from bankingapp.models import BankAccount, Transaction
+
+    rng = rng or random.Random(0)
+    # Hash once; hashing per user would dominate seeding time.
+    password = make_password(PASSWORD)
+    created = User.objects.bulk_create(
+        User(username=f"bench{i}", email=f"bench{i}@example.com", password=password) for i in range(users)
+    )
+    created = list(User.objects.filter(username__in=[u.username for u in created]).order_by("pk"))
+    BankAccount.objects.bulk_create(
+        BankAccount(user=user, account_number=allocator.next(), account_type="CHECKING", balance=opening_balance)
+        for user in created
+    )
+    accounts = list(BankAccount.objects.filter(user__in=created).order_by("user_id"))
+
+    # Opening deposits, so balances agree with the ledger.
+    records = [
+        Transaction(receiver=account, transaction_type="DEPOSIT", amount=opening_balance)
+        for account in accounts
+    ]
+    # Skewed like production: a few accounts see most of the traffic.
+    weights = [1 / (rank + 1) for rank in range(len(accounts))]
+    net = {account.pk: Decimal("0.00") for account in accounts}
+    for _ in range(history):
+        sender, receiver = rng.choices(accounts, weights=weights, k=2)
+        if sender.pk == receiver.pk:
+            continue
+        amount = Decimal(rng.randint(1, 5000)) / 100
+        net[sender.pk] -= amount
+        net[receiver.pk] += amount
+        records.append(Transaction(sender=sender, receiver=receiver, transaction_type="TRANSFER", amount=amount))
+    Transaction.objects.bulk_create(records, batch_size=1000)
+    for account in accounts:
+        account.balance = opening_balance + net[account.pk]
+    BankAccount.objects.bulk_update(accounts, ["balance"], batch_size=1000)
+
+    return [
+        {"username": user.username, "account_number": account.account_number, "access": str(AccessToken.for_user(user))}
+        for user, account in zip(created, accounts)
+    ]
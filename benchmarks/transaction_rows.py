@@ -0,0 +1,122 @@
+"""
+Per-row benchmark for the transaction list read path.
+
+Seeds one account with every kind of history row (deposits, withdrawals,
+transfers both ways, a transfer to itself, and transfers whose counterpart
+account was deleted), then times walking the whole history page by page
+through ``TransactionSerializer(history.page(...), many=True).data`` and
+through ``transaction_rows(history.page_values(...))``. That both render the
+same output is asserted by TransactionRowsTests in bankingapp/tests.py.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.transaction_rows --history 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentile, setup_django, test_database  # noqa: E402
+
+
+def seed_history(count, rng):
+    from django.contrib.auth.models import User
+
+    from bankingapp.account_numbers import open_account
+    from bankingapp.models import Transaction
+
+    user = User.objects.create_user("rows", password="bench-password")
+    account = open_account(user=user, account_type="CHECKING")
+    other = open_account(user=user, account_type="SAVINGS")
+    closed = open_account(user=user, account_type="SAVINGS")
+
+    records = []
+    for i in range(count):
+        amount = Decimal(rng.randint(1, 10_000_000)) / 100
+        kind = i % 6
+        if kind == 0:
+            records.append(Transaction(receiver=account, transaction_type="DEPOSIT", amount=amount))
+        elif kind == 1:
+            records.append(Transaction(sender=account, transaction_type="WITHDRAWAL", amount=amount))
+        elif kind == 2:
+            records.append(Transaction(sender=account, receiver=other, transaction_type="TRANSFER", amount=amount))
+        elif kind == 3:
+            records.append(Transaction(sender=other, receiver=account, transaction_type="TRANSFER", amount=amount,
+                                       description="rent"))
+        elif kind == 4:
+            records.append(Transaction(sender=closed, receiver=account, transaction_type="TRANSFER", amount=amount))
+        else:
+            records.append(Transaction(sender=account, receiver=account, transaction_type="TRANSFER", amount=amount))
+    Transaction.objects.bulk_create(records, batch_size=1000)
+    # SET_NULL leaves these transfers without a sender.
+    closed.delete()
+    return account.pk
+
+
+def walk(fetch, account_id, page_size):
+    """Yield every page of the account's history through ``fetch``."""
+    cursor = None
+    while True:
+        rows, last = fetch(account_id, page_size, cursor)
+        yield rows
+        if last is None:
+            return
+        cursor = last
+
+
+def serializer_page(account_id, page_size, cursor):
+    from bankingapp import history
+    from bankingapp.serializers import TransactionSerializer
+
+    rows = history.page(account_id, page_size + 1, cursor)
+    last = (rows[page_size - 1].created_at, rows[page_size - 1].pk) if len(rows) > page_size else None
+    return TransactionSerializer(rows[:page_size], many=True).data, last
+
+
+def values_page(account_id, page_size, cursor):
+    from bankingapp import history
+    from bankingapp.serializers import transaction_rows
+
+    rows = history.page_values(account_id, page_size + 1, cursor)
+    last = (rows[page_size - 1][-1], rows[page_size - 1][0]) if len(rows) > page_size else None
+    return transaction_rows(rows[:page_size]), last
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--history", type=int, default=3000)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    setup_django()
+
+    with test_database():
+        account_id = seed_history(args.history, random.Random(args.seed))
+
+        baseline = None
+        for label, fetch in (("serializer", serializer_page), ("values", values_page)):
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                for _ in walk(fetch, account_id, args.page_size):
+                    pass
+                samples.append(time.perf_counter() - start)
+            p50 = percentile(samples, 50)
+            baseline = baseline or p50
+            print({
+                "path": label,
+                "rows": args.history,
+                "p50_ms": round(p50 * 1000, 2),
+                "us_per_row": round(p50 * 1e6 / args.history, 2),
+                "speedup": round(baseline / p50, 1),
+            })
+
+
+if __name__ == "__main__":
+    main()